@@ -0,0 +1,152 @@
+"""Estadisticas incrementales de tickets
+
+Revision ID: 5a8f3e1c7b92
+Revises: d93a5c27e1f4
+Create Date: 2026-10-17 23:46:12
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a8f3e1c7b92'
+down_revision: Union[str, Sequence[str], None] = 'd93a5c27e1f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRIGGERS_SQL = """
+CREATE OR REPLACE FUNCTION tickets_set_resolved_at() RETURNS trigger AS $$
+BEGIN
+    IF NEW.status IN ('resolved', 'closed') THEN
+        NEW.resolved_at := COALESCE(
+            NEW.resolved_at,
+            CASE WHEN TG_OP = 'UPDATE' THEN OLD.resolved_at END,
+            now()
+        );
+    ELSE
+        NEW.resolved_at := NULL;
+    END IF;
+    RETURN NEW;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION tickets_maintain_stats() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE ticket_stats SET count = count - 1
+         WHERE status = COALESCE(OLD.status, '') AND priority = COALESCE(OLD.priority, '')
+           AND category = COALESCE(OLD.category, '') AND assigned_id = COALESCE(OLD.assigned_id, 0);
+        IF OLD.status IN ('open', 'in_progress') THEN
+            UPDATE ticket_open_days SET count = count - 1 WHERE created_day = OLD.created_at::date;
+        END IF;
+        IF OLD.resolved_at IS NOT NULL THEN
+            UPDATE ticket_resolution_stats
+               SET resolved_count = resolved_count - 1,
+                   total_seconds = total_seconds - EXTRACT(EPOCH FROM OLD.resolved_at - OLD.created_at)
+             WHERE category = COALESCE(OLD.category, '');
+        END IF;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO ticket_stats AS s (status, priority, category, assigned_id, count)
+        VALUES (COALESCE(NEW.status, ''), COALESCE(NEW.priority, ''), COALESCE(NEW.category, ''),
+                COALESCE(NEW.assigned_id, 0), 1)
+        ON CONFLICT (status, priority, category, assigned_id) DO UPDATE SET count = s.count + 1;
+        IF NEW.status IN ('open', 'in_progress') THEN
+            INSERT INTO ticket_open_days AS d (created_day, count) VALUES (NEW.created_at::date, 1)
+            ON CONFLICT (created_day) DO UPDATE SET count = d.count + 1;
+        END IF;
+        IF NEW.resolved_at IS NOT NULL THEN
+            INSERT INTO ticket_resolution_stats AS r (category, resolved_count, total_seconds)
+            VALUES (COALESCE(NEW.category, ''), 1, EXTRACT(EPOCH FROM NEW.resolved_at - NEW.created_at))
+            ON CONFLICT (category) DO UPDATE
+               SET resolved_count = r.resolved_count + 1, total_seconds = r.total_seconds + EXCLUDED.total_seconds;
+        END IF;
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION ticket_stats_rebuild() RETURNS void AS $$
+BEGIN
+    DELETE FROM ticket_stats;
+    DELETE FROM ticket_open_days;
+    DELETE FROM ticket_resolution_stats;
+    INSERT INTO ticket_stats (status, priority, category, assigned_id, count)
+    SELECT COALESCE(status, ''), COALESCE(priority, ''), COALESCE(category, ''), COALESCE(assigned_id, 0), count(*)
+      FROM tickets GROUP BY 1, 2, 3, 4;
+    INSERT INTO ticket_open_days (created_day, count)
+    SELECT created_at::date, count(*) FROM tickets WHERE status IN ('open', 'in_progress') GROUP BY 1;
+    INSERT INTO ticket_resolution_stats (category, resolved_count, total_seconds)
+    SELECT COALESCE(category, ''), count(*), sum(EXTRACT(EPOCH FROM resolved_at - created_at))
+      FROM tickets WHERE resolved_at IS NOT NULL GROUP BY 1;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION ticket_stats_truncate() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM ticket_stats;
+    DELETE FROM ticket_open_days;
+    DELETE FROM ticket_resolution_stats;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER tickets_set_resolved_at BEFORE INSERT OR UPDATE OF status, resolved_at ON tickets
+    FOR EACH ROW EXECUTE FUNCTION tickets_set_resolved_at();
+CREATE OR REPLACE TRIGGER tickets_stats_insert_delete AFTER INSERT OR DELETE ON tickets
+    FOR EACH ROW EXECUTE FUNCTION tickets_maintain_stats();
+CREATE OR REPLACE TRIGGER tickets_stats_update AFTER UPDATE OF status, priority, category, assigned_id, created_at, resolved_at ON tickets
+    FOR EACH ROW EXECUTE FUNCTION tickets_maintain_stats();
+CREATE OR REPLACE TRIGGER tickets_stats_truncate AFTER TRUNCATE ON tickets
+    FOR EACH STATEMENT EXECUTE FUNCTION ticket_stats_truncate();
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('tickets', sa.Column('resolved_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_table('ticket_stats',
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('priority', sa.String(), nullable=False),
+    sa.Column('category', sa.String(), nullable=False),
+    sa.Column('assigned_id', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('status', 'priority', 'category', 'assigned_id')
+    )
+    op.create_table('ticket_open_days',
+    sa.Column('created_day', sa.Date(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('created_day')
+    )
+    op.create_table('ticket_resolution_stats',
+    sa.Column('category', sa.String(), nullable=False),
+    sa.Column('resolved_count', sa.Integer(), nullable=False),
+    sa.Column('total_seconds', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('category')
+    )
+
+    # Nadie escribe tickets mientras armamos el resumen inicial
+    op.execute("LOCK TABLE tickets IN SHARE ROW EXCLUSIVE MODE")
+    # Para lo ya resuelto no tenemos la fecha real: la mejor aproximación es la última modificación
+    op.execute(
+        "UPDATE tickets SET resolved_at = COALESCE(updated_at, created_at) "
+        "WHERE status IN ('resolved', 'closed')"
+    )
+    op.execute(TRIGGERS_SQL)
+    op.execute("SELECT ticket_stats_rebuild()")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS tickets_stats_truncate ON tickets")
+    op.execute("DROP TRIGGER IF EXISTS tickets_stats_update ON tickets")
+    op.execute("DROP TRIGGER IF EXISTS tickets_stats_insert_delete ON tickets")
+    op.execute("DROP TRIGGER IF EXISTS tickets_set_resolved_at ON tickets")
+    op.execute("DROP FUNCTION IF EXISTS ticket_stats_truncate()")
+    op.execute("DROP FUNCTION IF EXISTS ticket_stats_rebuild()")
+    op.execute("DROP FUNCTION IF EXISTS tickets_maintain_stats()")
+    op.execute("DROP FUNCTION IF EXISTS tickets_set_resolved_at()")
+    op.drop_table('ticket_resolution_stats')
+    op.drop_table('ticket_open_days')
+    op.drop_table('ticket_stats')
+    op.drop_column('tickets', 'resolved_at')
@@ -0,0 +1,50 @@
+"""Indices para consultas de tickets
+
+Revision ID: 7c2e4b1a9d30
+Revises: 221e88a56548
+Create Date: 2026-10-17 23:26:41
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2e4b1a9d30'
+down_revision: Union[str, Sequence[str], None] = '221e88a56548'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Claves foráneas usadas en los JOIN de /tickets y /services_options
+    op.create_index(op.f('ix_tickets_service_id'), 'tickets', ['service_id'], unique=False)
+    op.create_index(op.f('ix_client_services_client_id'), 'client_services', ['client_id'], unique=False)
+    op.create_index(op.f('ix_client_services_plan_id'), 'client_services', ['plan_id'], unique=False)
+    op.create_index(op.f('ix_service_sheets_ticket_id'), 'service_sheets', ['ticket_id'], unique=False)
+
+    # Filtros por rango de fechas
+    op.create_index(op.f('ix_tickets_created_at'), 'tickets', ['created_at'], unique=False)
+
+    # Bandeja filtrada por estado, paginada por ID descendente
+    op.create_index('ix_tickets_status_id', 'tickets', ['status', sa.text('id DESC')], unique=False)
+
+    # Tickets pendientes por técnico ordenados por fecha (parcial: lo cerrado no ocupa lugar)
+    op.create_index(
+        'ix_tickets_assigned_open_created', 'tickets', ['assigned_id', 'created_at'], unique=False,
+        postgresql_where=sa.text("status IN ('open', 'in_progress')"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tickets_assigned_open_created', table_name='tickets')
+    op.drop_index('ix_tickets_status_id', table_name='tickets')
+    op.drop_index(op.f('ix_tickets_created_at'), table_name='tickets')
+    op.drop_index(op.f('ix_service_sheets_ticket_id'), table_name='service_sheets')
+    op.drop_index(op.f('ix_client_services_plan_id'), table_name='client_services')
+    op.drop_index(op.f('ix_client_services_client_id'), table_name='client_services')
+    op.drop_index(op.f('ix_tickets_service_id'), table_name='tickets')
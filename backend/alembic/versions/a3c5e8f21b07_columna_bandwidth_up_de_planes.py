@@ -0,0 +1,31 @@
+"""Columna bandwidth_up de planes
+
+Revision ID: a3c5e8f21b07
+Revises: f4a9c2d81e37
+Create Date: 2026-10-18 00:35:06
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c5e8f21b07'
+down_revision: Union[str, Sequence[str], None] = 'f4a9c2d81e37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Estaba en el modelo pero en ninguna migración: las bases existentes la tienen por create_all.
+    # Ahora que la app ya no crea tablas, una base nueva tiene que recibirla desde acá.
+    op.execute('ALTER TABLE plans ADD COLUMN IF NOT EXISTS bandwidth_up INTEGER')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Nada: la columna es anterior a esta migración en las bases creadas con create_all
+    pass
@@ -0,0 +1,239 @@
+"""Incidentes: tickets agrupados por caja NAP y subred
+
+Revision ID: a8c5e1d7f360
+Revises: f3b9d2e6a741
+Create Date: 2026-10-18 01:24:10
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8c5e1d7f360'
+down_revision: Union[str, Sequence[str], None] = 'f3b9d2e6a741'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Correlación de incidentes, primera versión (por fila; la reemplaza c3f8a6d1e947)
+INCIDENTS_DDL = r"""
+CREATE OR REPLACE FUNCTION nap_box_key(value text) RETURNS text AS $$
+    SELECT NULLIF(regexp_replace(
+        regexp_replace(upper(btrim(value)), '[\s,/-]+(P|PTO|PUERTO|PORT)\.?\s*\d+$', ''),
+        '[^A-Z0-9]', '', 'g'), '')
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION client_services_set_subnet() RETURNS trigger AS $$
+DECLARE
+    parts text[] := regexp_match(NEW.ip_address, '^\s*(\d{1,3})\.(\d{1,3})\.(\d{1,3})\.(\d{1,3})\s*$');
+BEGIN
+    IF parts IS NULL OR GREATEST(parts[1]::int, parts[2]::int, parts[3]::int, parts[4]::int) > 255 THEN
+        NEW.subnet := NULL;
+    ELSE
+        NEW.subnet := format('%s.%s.%s.0/24', parts[1]::int, parts[2]::int, parts[3]::int);
+    END IF;
+    RETURN NEW;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER client_services_set_subnet BEFORE INSERT OR UPDATE OF ip_address ON client_services
+    FOR EACH ROW EXECUTE FUNCTION client_services_set_subnet();
+
+CREATE OR REPLACE FUNCTION service_sheets_set_nap_box() RETURNS trigger AS $$
+BEGIN
+    UPDATE client_services s SET nap_box = nap_box_key(NEW.nap_box_data), updated_at = now()
+      FROM tickets t
+     WHERE t.id = NEW.ticket_id AND s.id = t.service_id AND s.nap_box IS DISTINCT FROM nap_box_key(NEW.nap_box_data);
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER service_sheets_set_nap_box AFTER INSERT OR UPDATE OF nap_box_data ON service_sheets
+    FOR EACH ROW WHEN (nap_box_key(NEW.nap_box_data) IS NOT NULL) EXECUTE FUNCTION service_sheets_set_nap_box();
+
+CREATE OR REPLACE FUNCTION incident_attach(ticket_id integer, service_id integer, created_at timestamptz) RETURNS void AS $$
+DECLARE
+    keys record;
+    incident integer;
+BEGIN
+    FOR keys IN
+        SELECT k.kind, k.key FROM client_services s, LATERAL (VALUES ('nap', s.nap_box), ('subnet', s.subnet)) AS k (kind, key)
+         WHERE s.id = incident_attach.service_id AND k.key IS NOT NULL
+    LOOP
+        -- El incidente de esa clave quedó quieto: es otro corte
+        UPDATE incidents SET status = 'closed', closed_at = now()
+         WHERE kind = keys.kind AND key = keys.key AND status = 'open'
+           AND last_ticket_at < incident_attach.created_at - interval '4 hours';
+        INSERT INTO incidents AS i (kind, key, status, opened_at, last_ticket_at, tickets_count, open_count)
+        VALUES (keys.kind, keys.key, 'open', incident_attach.created_at, incident_attach.created_at, 1, 1)
+        ON CONFLICT (kind, key) WHERE status = 'open' DO UPDATE
+           SET tickets_count = i.tickets_count + 1, open_count = i.open_count + 1,
+               last_ticket_at = greatest(i.last_ticket_at, EXCLUDED.last_ticket_at)
+        RETURNING id INTO incident;
+        INSERT INTO incident_tickets (incident_id, ticket_id) VALUES (incident, incident_attach.ticket_id);
+    END LOOP;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION tickets_correlate() RETURNS trigger AS $$
+BEGIN
+    PERFORM incident_attach(NEW.id, NEW.service_id, NEW.created_at);
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+-- Tickets que se resuelven (o se reabren) o se borran: el contador de pendientes de sus incidentes
+CREATE OR REPLACE FUNCTION tickets_incident_status() RETURNS trigger AS $$
+DECLARE
+    was_open boolean := COALESCE(OLD.status IN ('open', 'in_progress'), false);
+    is_open boolean := false;
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        is_open := COALESCE(NEW.status IN ('open', 'in_progress'), false);
+    END IF;
+    IF was_open <> is_open THEN
+        UPDATE incidents i
+           SET open_count = i.open_count + CASE WHEN is_open THEN 1 ELSE -1 END,
+               status = CASE WHEN i.open_count + CASE WHEN is_open THEN 1 ELSE -1 END = 0 THEN 'closed' ELSE i.status END,
+               closed_at = CASE WHEN i.open_count + CASE WHEN is_open THEN 1 ELSE -1 END = 0 THEN COALESCE(i.closed_at, now()) ELSE i.closed_at END
+          FROM incident_tickets m
+         WHERE m.ticket_id = OLD.id AND i.id = m.incident_id;
+    END IF;
+    IF TG_OP = 'DELETE' THEN
+        UPDATE incidents i SET tickets_count = i.tickets_count - 1
+          FROM incident_tickets m
+         WHERE m.ticket_id = OLD.id AND i.id = m.incident_id;
+        DELETE FROM incident_tickets WHERE ticket_id = OLD.id;
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+-- Lo mismo que hacen los triggers ticket por ticket, pero de una vez sobre lo pendiente: por clave,
+-- un incidente nuevo cada vez que pasan más de 4 horas entre dos tickets; el último sigue abierto
+CREATE OR REPLACE FUNCTION incidents_rebuild() RETURNS integer AS $$
+DECLARE
+    attached integer;
+BEGIN
+    DELETE FROM incident_tickets;
+    DELETE FROM incidents;
+    WITH keyed AS (
+        SELECT t.id AS ticket_id, t.created_at, k.kind, k.key,
+               CASE WHEN t.created_at - lag(t.created_at) OVER w > interval '4 hours' THEN 1 ELSE 0 END AS starts
+          FROM tickets t
+          JOIN client_services s ON s.id = t.service_id
+         CROSS JOIN LATERAL (VALUES ('nap', s.nap_box), ('subnet', s.subnet)) AS k (kind, key)
+         WHERE t.status IN ('open', 'in_progress') AND k.key IS NOT NULL
+        WINDOW w AS (PARTITION BY k.kind, k.key ORDER BY t.created_at, t.id)
+    ), numbered AS (
+        SELECT *, sum(starts) OVER (PARTITION BY kind, key ORDER BY created_at, ticket_id) AS run FROM keyed
+    ), grouped AS MATERIALIZED (
+        SELECT nextval(pg_get_serial_sequence('incidents', 'id')) AS id, kind, key, run,
+               run = max(run) OVER (PARTITION BY kind, key) AS latest,
+               min(created_at) AS opened_at, max(created_at) AS last_ticket_at, count(*) AS tickets
+          FROM numbered
+         GROUP BY kind, key, run
+    ), created AS (
+        INSERT INTO incidents (id, kind, key, status, opened_at, last_ticket_at, closed_at, tickets_count, open_count)
+        SELECT id, kind, key, CASE WHEN latest THEN 'open' ELSE 'closed' END, opened_at, last_ticket_at,
+               CASE WHEN NOT latest THEN now() END, tickets, tickets
+          FROM grouped
+    )
+    INSERT INTO incident_tickets (incident_id, ticket_id)
+    SELECT g.id, n.ticket_id FROM numbered n JOIN grouped g USING (kind, key, run);
+    GET DIAGNOSTICS attached = ROW_COUNT;
+    RETURN attached;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION incidents_truncate() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM incident_tickets;
+    DELETE FROM incidents;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER tickets_correlate AFTER INSERT ON tickets
+    FOR EACH ROW WHEN (NEW.service_id IS NOT NULL AND NEW.status IN ('open', 'in_progress'))
+    EXECUTE FUNCTION tickets_correlate();
+CREATE OR REPLACE TRIGGER tickets_incident_status AFTER UPDATE OF status OR DELETE ON tickets
+    FOR EACH ROW EXECUTE FUNCTION tickets_incident_status();
+CREATE OR REPLACE TRIGGER tickets_incidents_truncate AFTER TRUNCATE ON tickets
+    FOR EACH STATEMENT EXECUTE FUNCTION incidents_truncate();
+"""
+
+# Caja NAP de la última planilla de cada servicio que la tenga cargada
+BACKFILL_NAP_BOX = """
+UPDATE client_services s SET nap_box = latest.nap_box
+  FROM (
+    SELECT DISTINCT ON (t.service_id) t.service_id, nap_box_key(h.nap_box_data) AS nap_box
+      FROM service_sheets h
+      JOIN tickets t ON t.id = h.ticket_id
+     WHERE nap_box_key(h.nap_box_data) IS NOT NULL AND t.service_id IS NOT NULL
+     ORDER BY t.service_id, h.created_at DESC
+  ) latest
+ WHERE s.id = latest.service_id
+"""
+
+TRIGGERS = (
+    ("tickets_correlate", "tickets"),
+    ("tickets_incident_status", "tickets"),
+    ("tickets_incidents_truncate", "tickets"),
+    ("service_sheets_set_nap_box", "service_sheets"),
+    ("client_services_set_subnet", "client_services"),
+)
+FUNCTIONS = (
+    "incidents_truncate()", "incidents_rebuild()", "tickets_incident_status()", "tickets_correlate()",
+    "incident_attach(integer, integer, timestamptz)", "service_sheets_set_nap_box()",
+    "client_services_set_subnet()", "nap_box_key(text)",
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('client_services', sa.Column('nap_box', sa.String(), nullable=True))
+    op.add_column('client_services', sa.Column('subnet', sa.String(), nullable=True))
+    op.create_index(op.f('ix_client_services_nap_box'), 'client_services', ['nap_box'], unique=False)
+    op.create_index(op.f('ix_client_services_subnet'), 'client_services', ['subnet'], unique=False)
+
+    op.create_table('incidents',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('opened_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('last_ticket_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('closed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('tickets_count', sa.Integer(), nullable=False),
+    sa.Column('open_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_incidents_open_key', 'incidents', ['kind', 'key'], unique=True, postgresql_where=sa.text("status = 'open'"))
+    op.create_index('ix_incidents_status_id', 'incidents', ['status', sa.text('id DESC')], unique=False)
+    op.create_table('incident_tickets',
+    sa.Column('incident_id', sa.Integer(), nullable=False),
+    sa.Column('ticket_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['incident_id'], ['incidents.id'], ),
+    sa.PrimaryKeyConstraint('incident_id', 'ticket_id')
+    )
+    op.create_index(op.f('ix_incident_tickets_ticket_id'), 'incident_tickets', ['ticket_id'], unique=False)
+
+    op.execute(INCIDENTS_DDL)
+    # El trigger de client_services calcula la subred; la caja NAP sale de las planillas
+    op.execute("UPDATE client_services SET ip_address = ip_address WHERE ip_address IS NOT NULL")
+    op.execute(BACKFILL_NAP_BOX)
+    # Incidentes de lo que ya está pendiente, como si los tickets entraran de nuevo en orden
+    op.execute("SELECT incidents_rebuild()")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for trigger, table in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger} ON {table}")
+    for function in FUNCTIONS:
+        op.execute(f"DROP FUNCTION IF EXISTS {function}")
+    op.drop_index(op.f('ix_incident_tickets_ticket_id'), table_name='incident_tickets')
+    op.drop_table('incident_tickets')
+    op.drop_index('ix_incidents_status_id', table_name='incidents')
+    op.drop_index('ix_incidents_open_key', table_name='incidents', postgresql_where=sa.text("status = 'open'"))
+    op.drop_table('incidents')
+    op.drop_index(op.f('ix_client_services_subnet'), table_name='client_services')
+    op.drop_index(op.f('ix_client_services_nap_box'), table_name='client_services')
+    op.drop_column('client_services', 'subnet')
+    op.drop_column('client_services', 'nap_box')
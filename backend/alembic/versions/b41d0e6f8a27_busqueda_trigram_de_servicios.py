@@ -0,0 +1,43 @@
+"""Busqueda trigram de servicios
+
+Revision ID: b41d0e6f8a27
+Revises: 7c2e4b1a9d30
+Create Date: 2026-10-17 23:29:46
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41d0e6f8a27'
+down_revision: Union[str, Sequence[str], None] = '7c2e4b1a9d30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (nombre del índice, tabla, columna)
+TRGM_INDEXES = [
+    ('ix_clients_name_trgm', 'clients', 'name'),
+    ('ix_client_services_ip_address_trgm', 'client_services', 'ip_address'),
+    ('ix_client_services_mac_address_trgm', 'client_services', 'mac_address'),
+    ('ix_client_services_installation_address_trgm', 'client_services', 'installation_address'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRGM_INDEXES:
+        op.create_index(
+            name, table, [column], unique=False,
+            postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'},
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _ in reversed(TRGM_INDEXES):
+        op.drop_index(name, table_name=table)
+    # La extensión queda instalada: puede estar en uso por otros objetos
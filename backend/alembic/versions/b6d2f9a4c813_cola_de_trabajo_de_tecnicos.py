@@ -0,0 +1,74 @@
+"""Cola de trabajo de tecnicos
+
+Revision ID: b6d2f9a4c813
+Revises: a3c5e8f21b07
+Create Date: 2026-10-18 00:40:33
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d2f9a4c813'
+down_revision: Union[str, Sequence[str], None] = 'a3c5e8f21b07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Igual que PRIORITY_RANK_SQL en models.py
+PRIORITY_RANK_SQL = "CASE priority WHEN 'critical' THEN 4 WHEN 'high' THEN 3 WHEN 'medium' THEN 2 WHEN 'low' THEN 1 ELSE 0 END"
+
+# latitude/longitude de client_services a partir de geolocation
+GEOLOCATION_DDL = r"""
+CREATE OR REPLACE FUNCTION client_services_parse_geolocation() RETURNS trigger AS $$
+DECLARE
+    parts text[] := regexp_match(NEW.geolocation, '^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$');
+BEGIN
+    IF parts IS NULL OR abs(parts[1]::float8) > 90 OR abs(parts[2]::float8) > 180 THEN
+        NEW.latitude := NULL;
+        NEW.longitude := NULL;
+    ELSE
+        NEW.latitude := parts[1]::float8;
+        NEW.longitude := parts[2]::float8;
+    END IF;
+    RETURN NEW;
+END $$ LANGUAGE plpgsql;
+
+CREATE TRIGGER client_services_parse_geolocation BEFORE INSERT OR UPDATE OF geolocation ON client_services
+    FOR EACH ROW EXECUTE FUNCTION client_services_parse_geolocation();
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Reescribe tickets para calcular la columna (lock exclusivo); se propaga a cada partición
+    op.execute(f"ALTER TABLE tickets ADD COLUMN priority_rank SMALLINT GENERATED ALWAYS AS ({PRIORITY_RANK_SQL}) STORED")
+    op.execute(
+        "CREATE INDEX ix_tickets_queue ON tickets (assigned_id, priority_rank DESC, created_at) "
+        "WHERE status IN ('open', 'in_progress')"
+    )
+
+    op.add_column('client_services', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('client_services', sa.Column('longitude', sa.Float(), nullable=True))
+    op.execute(GEOLOCATION_DDL)
+    # Dispara el trigger en los servicios que ya existen
+    op.execute("UPDATE client_services SET geolocation = geolocation WHERE geolocation IS NOT NULL")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS client_services_parse_geolocation ON client_services")
+    op.execute("DROP FUNCTION IF EXISTS client_services_parse_geolocation()")
+    op.drop_column('client_services', 'longitude')
+    op.drop_column('client_services', 'latitude')
+
+    op.execute("DROP INDEX IF EXISTS ix_tickets_queue")
+    op.execute("ALTER TABLE tickets DROP COLUMN priority_rank")
+    # Meses archivados (partitions.py archive): que sigan teniendo las columnas del padre
+    archived = op.get_bind().execute(sa.text(
+        "SELECT tablename FROM pg_tables WHERE schemaname = 'archive' AND tablename ~ '^tickets_y[0-9]{4}m[0-9]{2}$'"
+    )).scalars().all()
+    for name in archived:
+        op.execute(f'ALTER TABLE archive."{name}" DROP COLUMN IF EXISTS priority_rank')
@@ -0,0 +1,186 @@
+"""Partición DEFAULT de tickets y planillas, incidentes con rango de fechas de sus tickets
+
+Revision ID: b9e4d7a2c615
+Revises: a8c5e1d7f360
+Create Date: 2026-10-18 01:49:16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9e4d7a2c615'
+down_revision: Union[str, Sequence[str], None] = 'a8c5e1d7f360'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PARTITIONED_TABLES = ('tickets', 'service_sheets')
+
+# create_monthly_partitions con partición DEFAULT (ver partitions.py)
+PARTITION_FUNCTION = """
+CREATE OR REPLACE FUNCTION create_monthly_partitions(parent text, from_month timestamptz, to_month timestamptz)
+RETURNS integer AS $$
+DECLARE
+    month timestamp := date_trunc('month', from_month AT TIME ZONE 'UTC');
+    created integer := 0;
+    partition text;
+    lower_bound timestamptz;
+    upper_bound timestamptz;
+    fallback text;
+    key_column text;
+    columns text;
+    stray boolean;
+BEGIN
+    SELECT c.relname INTO fallback
+      FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partdefid
+     WHERE p.partrelid = to_regclass(parent);
+    SELECT a.attname INTO key_column
+      FROM pg_partitioned_table p JOIN pg_attribute a ON a.attrelid = p.partrelid AND a.attnum = p.partattrs[0]
+     WHERE p.partrelid = to_regclass(parent);
+    -- Columnas que se pueden copiar (las generadas se recalculan solas)
+    SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) INTO columns
+      FROM pg_attribute
+     WHERE attrelid = to_regclass(parent) AND attnum > 0 AND NOT attisdropped AND attgenerated = '';
+    WHILE month <= to_month AT TIME ZONE 'UTC' LOOP
+        partition := format('%s_y%sm%s', parent, to_char(month, 'YYYY'), to_char(month, 'MM'));
+        lower_bound := month AT TIME ZONE 'UTC';
+        upper_bound := (month + interval '1 month') AT TIME ZONE 'UTC';
+        IF to_regclass(partition) IS NULL THEN
+            stray := false;
+            IF fallback IS NOT NULL THEN
+                EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE %I >= %L AND %I < %L)',
+                               fallback, key_column, lower_bound, key_column, upper_bound) INTO stray;
+            END IF;
+            IF stray THEN
+                EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', parent, fallback);
+                -- Tabla suelta (sin los triggers del padre): mover las filas no las cuenta de nuevo
+                EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING CONSTRAINTS)',
+                               partition, parent);
+                EXECUTE format('INSERT INTO %I (%s) SELECT %s FROM %I WHERE %I >= %L AND %I < %L',
+                               partition, columns, columns, fallback, key_column, lower_bound, key_column, upper_bound);
+                EXECUTE format('DELETE FROM %I WHERE %I >= %L AND %I < %L',
+                               fallback, key_column, lower_bound, key_column, upper_bound);
+                EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                               parent, partition, lower_bound, upper_bound);
+                EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I DEFAULT', parent, fallback);
+            ELSE
+                EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                               partition, parent, lower_bound, upper_bound);
+            END IF;
+            created := created + 1;
+        END IF;
+        month := month + interval '1 month';
+    END LOOP;
+    RETURN created;
+END $$ LANGUAGE plpgsql;
+"""
+
+# incident_attach: opened_at baja si llega un ticket más viejo (c3f8a6d1e947 la pasa a tickets_correlate)
+INCIDENT_ATTACH = """
+CREATE OR REPLACE FUNCTION incident_attach(ticket_id integer, service_id integer, created_at timestamptz) RETURNS void AS $$
+DECLARE
+    keys record;
+    incident integer;
+BEGIN
+    FOR keys IN
+        SELECT k.kind, k.key FROM client_services s, LATERAL (VALUES ('nap', s.nap_box), ('subnet', s.subnet)) AS k (kind, key)
+         WHERE s.id = incident_attach.service_id AND k.key IS NOT NULL
+    LOOP
+        -- El incidente de esa clave quedó quieto: es otro corte
+        UPDATE incidents SET status = 'closed', closed_at = now()
+         WHERE kind = keys.kind AND key = keys.key AND status = 'open'
+           AND last_ticket_at < incident_attach.created_at - interval '4 hours';
+        INSERT INTO incidents AS i (kind, key, status, opened_at, last_ticket_at, tickets_count, open_count)
+        VALUES (keys.kind, keys.key, 'open', incident_attach.created_at, incident_attach.created_at, 1, 1)
+        ON CONFLICT (kind, key) WHERE status = 'open' DO UPDATE
+           SET tickets_count = i.tickets_count + 1, open_count = i.open_count + 1,
+               opened_at = least(i.opened_at, EXCLUDED.opened_at),
+               last_ticket_at = greatest(i.last_ticket_at, EXCLUDED.last_ticket_at)
+        RETURNING id INTO incident;
+        INSERT INTO incident_tickets (incident_id, ticket_id) VALUES (incident, incident_attach.ticket_id);
+    END LOOP;
+END $$ LANGUAGE plpgsql;
+"""
+
+# Para downgrade: las versiones de e2b7f90c4d16 y a8c5e1d7f360
+OLD_PARTITION_FUNCTION = """
+CREATE OR REPLACE FUNCTION create_monthly_partitions(parent text, from_month timestamptz, to_month timestamptz)
+RETURNS integer AS $$
+DECLARE
+    month timestamp := date_trunc('month', from_month AT TIME ZONE 'UTC');
+    created integer := 0;
+    partition text;
+BEGIN
+    WHILE month <= to_month AT TIME ZONE 'UTC' LOOP
+        partition := format('%s_y%sm%s', parent, to_char(month, 'YYYY'), to_char(month, 'MM'));
+        IF to_regclass(partition) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                           partition, parent, month AT TIME ZONE 'UTC', (month + interval '1 month') AT TIME ZONE 'UTC');
+            created := created + 1;
+        END IF;
+        month := month + interval '1 month';
+    END LOOP;
+    RETURN created;
+END $$ LANGUAGE plpgsql;
+"""
+
+OLD_INCIDENT_ATTACH = """
+CREATE OR REPLACE FUNCTION incident_attach(ticket_id integer, service_id integer, created_at timestamptz) RETURNS void AS $$
+DECLARE
+    keys record;
+    incident integer;
+BEGIN
+    FOR keys IN
+        SELECT k.kind, k.key FROM client_services s, LATERAL (VALUES ('nap', s.nap_box), ('subnet', s.subnet)) AS k (kind, key)
+         WHERE s.id = incident_attach.service_id AND k.key IS NOT NULL
+    LOOP
+        -- El incidente de esa clave quedó quieto: es otro corte
+        UPDATE incidents SET status = 'closed', closed_at = now()
+         WHERE kind = keys.kind AND key = keys.key AND status = 'open'
+           AND last_ticket_at < incident_attach.created_at - interval '4 hours';
+        INSERT INTO incidents AS i (kind, key, status, opened_at, last_ticket_at, tickets_count, open_count)
+        VALUES (keys.kind, keys.key, 'open', incident_attach.created_at, incident_attach.created_at, 1, 1)
+        ON CONFLICT (kind, key) WHERE status = 'open' DO UPDATE
+           SET tickets_count = i.tickets_count + 1, open_count = i.open_count + 1,
+               last_ticket_at = greatest(i.last_ticket_at, EXCLUDED.last_ticket_at)
+        RETURNING id INTO incident;
+        INSERT INTO incident_tickets (incident_id, ticket_id) VALUES (incident, incident_attach.ticket_id);
+    END LOOP;
+END $$ LANGUAGE plpgsql;
+"""
+
+# Incidentes armados con tickets fuera de orden: que opened_at/last_ticket_at cubran a todos sus tickets
+WIDEN_INCIDENT_RANGES = """
+UPDATE incidents i
+   SET opened_at = least(i.opened_at, r.first_at), last_ticket_at = greatest(i.last_ticket_at, r.last_at)
+  FROM (SELECT m.incident_id, min(t.created_at) AS first_at, max(t.created_at) AS last_at
+          FROM incident_tickets m JOIN tickets t ON t.id = m.ticket_id
+         GROUP BY m.incident_id) r
+ WHERE r.incident_id = i.id AND (r.first_at < i.opened_at OR r.last_at > i.last_ticket_at)
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(PARTITION_FUNCTION)
+    # Red de seguridad: una fila sin su mes cae acá en vez de fallar el INSERT
+    for table in PARTITIONED_TABLES:
+        op.execute(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+    op.execute(INCIDENT_ATTACH)
+    op.execute(WIDEN_INCIDENT_RANGES)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(OLD_INCIDENT_ATTACH)
+    for table in PARTITIONED_TABLES:
+        # Lo que haya en la DEFAULT pasa a su mes (la función nueva lo mueve) antes de borrarla
+        op.execute(
+            f"SELECT create_monthly_partitions('{table}', min(created_at), max(created_at)) "
+            f"FROM {table}_default HAVING count(*) > 0"
+        )
+        op.execute(f"DROP TABLE {table}_default")
+    op.execute(OLD_PARTITION_FUNCTION)
@@ -0,0 +1,600 @@
+"""Triggers de tickets por sentencia (estadísticas, log de sync e incidentes)
+
+Revision ID: c3f8a6d1e947
+Revises: b9e4d7a2c615
+Create Date: 2026-10-18 02:02:39
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f8a6d1e947'
+down_revision: Union[str, Sequence[str], None] = 'b9e4d7a2c615'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Tablas que registra el log de /sync (ver SyncChange en models.py)
+SYNC_TABLES = ("tickets", "clients", "client_services", "service_sheets")
+
+# Resumen de GET /tickets/stats (ver ticket_stats.py)
+TRIGGERS_DDL = """
+CREATE OR REPLACE FUNCTION tickets_set_resolved_at() RETURNS trigger AS $$
+BEGIN
+    IF NEW.status IN ('resolved', 'closed') THEN
+        NEW.resolved_at := COALESCE(
+            NEW.resolved_at,
+            CASE WHEN TG_OP = 'UPDATE' THEN OLD.resolved_at END,
+            now()
+        );
+    ELSE
+        NEW.resolved_at := NULL;
+    END IF;
+    RETURN NEW;
+END $$ LANGUAGE plpgsql;
+
+-- Una vez por sentencia (no por fila): las filas que salen (old_tickets) restan y las que entran
+-- (new_tickets) suman, agrupadas por clave. Un UPDATE que no toca estas columnas se cancela solo.
+CREATE OR REPLACE FUNCTION tickets_maintain_stats() RETURNS trigger AS $$
+DECLARE
+    gone tickets[];
+    came tickets[];
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        SELECT array_agg(o) INTO gone FROM old_tickets o;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        SELECT array_agg(n) INTO came FROM new_tickets n;
+    END IF;
+
+    WITH delta AS (
+        SELECT t.*, -1 AS sign FROM unnest(gone) t
+        UNION ALL
+        SELECT t.*, 1 AS sign FROM unnest(came) t
+    ), by_key AS (
+        INSERT INTO ticket_stats AS s (status, priority, category, assigned_id, count)
+        SELECT COALESCE(status, ''), COALESCE(priority, ''), COALESCE(category, ''), COALESCE(assigned_id, 0), sum(sign)
+          FROM delta
+         GROUP BY 1, 2, 3, 4 HAVING sum(sign) <> 0
+         ORDER BY 1, 2, 3, 4 -- Mismo orden en todas las transacciones: sin deadlocks entre lotes
+        ON CONFLICT (status, priority, category, assigned_id) DO UPDATE SET count = s.count + EXCLUDED.count
+    ), by_day AS (
+        INSERT INTO ticket_open_days AS d (created_day, count)
+        SELECT created_at::date, sum(sign)
+          FROM delta WHERE status IN ('open', 'in_progress')
+         GROUP BY 1 HAVING sum(sign) <> 0
+         ORDER BY 1
+        ON CONFLICT (created_day) DO UPDATE SET count = d.count + EXCLUDED.count
+    )
+    INSERT INTO ticket_resolution_stats AS r (category, resolved_count, total_seconds)
+    SELECT COALESCE(category, ''), sum(sign), sum(sign * EXTRACT(EPOCH FROM resolved_at - created_at))
+      FROM delta WHERE resolved_at IS NOT NULL
+     GROUP BY 1 HAVING sum(sign) <> 0 OR sum(sign * EXTRACT(EPOCH FROM resolved_at - created_at)) <> 0
+     ORDER BY 1
+    ON CONFLICT (category) DO UPDATE
+       SET resolved_count = r.resolved_count + EXCLUDED.resolved_count,
+           total_seconds = r.total_seconds + EXCLUDED.total_seconds;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION ticket_stats_rebuild() RETURNS void AS $$
+BEGIN
+    DELETE FROM ticket_stats;
+    DELETE FROM ticket_open_days;
+    DELETE FROM ticket_resolution_stats;
+    INSERT INTO ticket_stats (status, priority, category, assigned_id, count)
+    SELECT COALESCE(status, ''), COALESCE(priority, ''), COALESCE(category, ''), COALESCE(assigned_id, 0), count(*)
+      FROM tickets GROUP BY 1, 2, 3, 4;
+    INSERT INTO ticket_open_days (created_day, count)
+    SELECT created_at::date, count(*) FROM tickets WHERE status IN ('open', 'in_progress') GROUP BY 1;
+    INSERT INTO ticket_resolution_stats (category, resolved_count, total_seconds)
+    SELECT COALESCE(category, ''), count(*), sum(EXTRACT(EPOCH FROM resolved_at - created_at))
+      FROM tickets WHERE resolved_at IS NOT NULL GROUP BY 1;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION ticket_stats_truncate() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM ticket_stats;
+    DELETE FROM ticket_open_days;
+    DELETE FROM ticket_resolution_stats;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER tickets_set_resolved_at BEFORE INSERT OR UPDATE OF status, resolved_at ON tickets
+    FOR EACH ROW EXECUTE FUNCTION tickets_set_resolved_at();
+CREATE OR REPLACE TRIGGER tickets_stats_insert AFTER INSERT ON tickets
+    REFERENCING NEW TABLE AS new_tickets FOR EACH STATEMENT EXECUTE FUNCTION tickets_maintain_stats();
+CREATE OR REPLACE TRIGGER tickets_stats_update AFTER UPDATE ON tickets
+    REFERENCING OLD TABLE AS old_tickets NEW TABLE AS new_tickets FOR EACH STATEMENT EXECUTE FUNCTION tickets_maintain_stats();
+CREATE OR REPLACE TRIGGER tickets_stats_delete AFTER DELETE ON tickets
+    REFERENCING OLD TABLE AS old_tickets FOR EACH STATEMENT EXECUTE FUNCTION tickets_maintain_stats();
+CREATE OR REPLACE TRIGGER tickets_stats_truncate AFTER TRUNCATE ON tickets
+    FOR EACH STATEMENT EXECUTE FUNCTION ticket_stats_truncate();
+"""
+
+# Log de cambios de GET /sync (ver sync.py)
+SYNC_CHANGES_DDL = """
+CREATE OR REPLACE FUNCTION sync_log_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO sync_changes (txid, entity, entity_id, op)
+        SELECT pg_current_xact_id()::text::bigint, TG_ARGV[0], id, TG_OP FROM old_rows ORDER BY id;
+    ELSE
+        INSERT INTO sync_changes (txid, entity, entity_id, op)
+        SELECT pg_current_xact_id()::text::bigint, TG_ARGV[0], id, TG_OP FROM new_rows ORDER BY id;
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+""" + "".join(
+    f"CREATE OR REPLACE TRIGGER {table}_sync_log_{action.lower()} AFTER {action} ON {table}\n"
+    f"    REFERENCING {rows} FOR EACH STATEMENT EXECUTE FUNCTION sync_log_change('{table}');\n"
+    for table in SYNC_TABLES
+    for action, rows in (("INSERT", "NEW TABLE AS new_rows"), ("UPDATE", "NEW TABLE AS new_rows"), ("DELETE", "OLD TABLE AS old_rows"))
+)
+
+# Correlación de incidentes (ver incidents.py)
+INCIDENTS_DDL = r"""
+CREATE OR REPLACE FUNCTION nap_box_key(value text) RETURNS text AS $$
+    SELECT NULLIF(regexp_replace(
+        regexp_replace(upper(btrim(value)), '[\s,/-]+(P|PTO|PUERTO|PORT)\.?\s*\d+$', ''),
+        '[^A-Z0-9]', '', 'g'), '')
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION client_services_set_subnet() RETURNS trigger AS $$
+DECLARE
+    parts text[] := regexp_match(NEW.ip_address, '^\s*(\d{1,3})\.(\d{1,3})\.(\d{1,3})\.(\d{1,3})\s*$');
+BEGIN
+    IF parts IS NULL OR GREATEST(parts[1]::int, parts[2]::int, parts[3]::int, parts[4]::int) > 255 THEN
+        NEW.subnet := NULL;
+    ELSE
+        NEW.subnet := format('%s.%s.%s.0/24', parts[1]::int, parts[2]::int, parts[3]::int);
+    END IF;
+    RETURN NEW;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER client_services_set_subnet BEFORE INSERT OR UPDATE OF ip_address ON client_services
+    FOR EACH ROW EXECUTE FUNCTION client_services_set_subnet();
+
+CREATE OR REPLACE FUNCTION service_sheets_set_nap_box() RETURNS trigger AS $$
+BEGIN
+    UPDATE client_services s SET nap_box = nap_box_key(NEW.nap_box_data), updated_at = now()
+      FROM tickets t
+     WHERE t.id = NEW.ticket_id AND s.id = t.service_id AND s.nap_box IS DISTINCT FROM nap_box_key(NEW.nap_box_data);
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER service_sheets_set_nap_box AFTER INSERT OR UPDATE OF nap_box_data ON service_sheets
+    FOR EACH ROW WHEN (nap_box_key(NEW.nap_box_data) IS NOT NULL) EXECUTE FUNCTION service_sheets_set_nap_box();
+
+-- Tickets nuevos de la sentencia (un alta o un lote entero): por clave, en orden de creación, los
+-- que llegan a menos de 4 horas del más reciente (del lote o del incidente abierto) se suman a ese
+-- incidente; un hueco de más de 4 horas cierra el incidente y abre otro.
+-- El planificador estima unas pocas filas para new_tickets: las consultas evitan joins entre
+-- conjuntos grandes (van por índice o juntan los tickets de cada grupo en un array).
+CREATE OR REPLACE FUNCTION tickets_correlate() RETURNS trigger AS $$
+BEGIN
+    -- Una transacción a la vez por clave (en 256 grupos, siempre en el mismo orden): nadie más abre
+    -- el incidente de una de estas claves hasta el commit. Después, los incidentes abiertos de las
+    -- claves quedan bloqueados contra los cambios de estado (tickets_incident_status)
+    PERFORM pg_advisory_xact_lock(hashtext('incidents'), bucket)
+       FROM (SELECT DISTINCT hashtext(k.kind || ':' || k.key) & 255 AS bucket
+               FROM new_tickets n
+               JOIN client_services s ON s.id = n.service_id
+              CROSS JOIN LATERAL (VALUES ('nap', s.nap_box), ('subnet', s.subnet)) AS k (kind, key)
+              WHERE n.status IN ('open', 'in_progress') AND k.key IS NOT NULL) b
+      ORDER BY bucket;
+    PERFORM 1
+       FROM new_tickets n
+       JOIN client_services s ON s.id = n.service_id
+      CROSS JOIN LATERAL (VALUES ('nap', s.nap_box), ('subnet', s.subnet)) AS k (kind, key)
+       JOIN incidents i ON i.kind = k.kind AND i.key = k.key AND i.status = 'open'
+      WHERE n.status IN ('open', 'in_progress')
+      ORDER BY i.id
+        FOR UPDATE OF i;
+
+    WITH keyed AS (
+        SELECT n.id AS ticket_id, n.created_at, k.kind, k.key
+          FROM new_tickets n
+          JOIN client_services s ON s.id = n.service_id
+         CROSS JOIN LATERAL (VALUES ('nap', s.nap_box), ('subnet', s.subnet)) AS k (kind, key)
+         WHERE n.status IN ('open', 'in_progress') AND k.key IS NOT NULL
+    ), flagged AS (
+        SELECT k.*, c.id AS current_id,
+               CASE WHEN k.created_at - GREATEST(lag(k.created_at) OVER w, c.last_ticket_at) <= interval '4 hours'
+                    THEN 0 ELSE 1 END AS starts
+          FROM keyed k
+          LEFT JOIN incidents c ON c.kind = k.kind AND c.key = k.key AND c.status = 'open'
+        WINDOW w AS (PARTITION BY k.kind, k.key ORDER BY k.created_at, k.ticket_id)
+    ), numbered AS (
+        -- run 0: se suma al incidente abierto; 1, 2, ...: incidentes nuevos
+        SELECT *, sum(starts) OVER (PARTITION BY kind, key ORDER BY created_at, ticket_id) AS run FROM flagged
+    ), grouped AS MATERIALIZED (
+        SELECT CASE WHEN run = 0 THEN current_id ELSE nextval(pg_get_serial_sequence('incidents', 'id')) END AS id,
+               kind, key, run, current_id, run = max(run) OVER (PARTITION BY kind, key) AS latest,
+               min(created_at) AS opened_at, max(created_at) AS last_ticket_at, count(*) AS tickets,
+               array_agg(ticket_id) AS ticket_ids
+          FROM numbered
+         GROUP BY kind, key, run, current_id
+    ), touched AS (
+        -- El incidente que ya estaba abierto suma sus tickets y se cierra si detrás vino otro corte
+        UPDATE incidents i
+           SET tickets_count = i.tickets_count + u.tickets, open_count = i.open_count + u.tickets,
+               opened_at = least(i.opened_at, u.opened_at), last_ticket_at = greatest(i.last_ticket_at, u.last_ticket_at),
+               status = CASE WHEN u.superseded THEN 'closed' ELSE i.status END,
+               closed_at = CASE WHEN u.superseded THEN now() ELSE i.closed_at END
+          FROM (SELECT current_id, bool_or(run > 0) AS superseded,
+                       COALESCE(sum(tickets) FILTER (WHERE run = 0), 0) AS tickets,
+                       min(opened_at) FILTER (WHERE run = 0) AS opened_at,
+                       max(last_ticket_at) FILTER (WHERE run = 0) AS last_ticket_at
+                  FROM grouped WHERE current_id IS NOT NULL GROUP BY current_id) u
+         WHERE i.id = u.current_id
+        RETURNING i.id
+    ), created AS (
+        -- Recién después de cerrar el anterior (lee touched): un solo incidente abierto por clave
+        INSERT INTO incidents (id, kind, key, status, opened_at, last_ticket_at, closed_at, tickets_count, open_count)
+        SELECT id, kind, key, CASE WHEN latest THEN 'open' ELSE 'closed' END, opened_at, last_ticket_at,
+               CASE WHEN NOT latest THEN now() END, tickets, tickets
+          FROM grouped
+         WHERE run > 0 AND (SELECT count(*) FROM touched) >= 0
+    )
+    INSERT INTO incident_tickets (incident_id, ticket_id)
+    SELECT id, unnest(ticket_ids) FROM grouped;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+-- Tickets que se resuelven (o se reabren) o se borran: el contador de pendientes de sus incidentes
+CREATE OR REPLACE FUNCTION tickets_incident_status() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        UPDATE incidents i
+           SET open_count = i.open_count + c.delta,
+               status = CASE WHEN i.open_count + c.delta = 0 THEN 'closed' ELSE i.status END,
+               closed_at = CASE WHEN i.open_count + c.delta = 0 THEN COALESCE(i.closed_at, now()) ELSE i.closed_at END
+          FROM (SELECT m.incident_id, sum(CASE WHEN n.status IN ('open', 'in_progress') THEN 1 ELSE -1 END) AS delta
+                  FROM old_tickets o
+                  JOIN new_tickets n ON n.id = o.id
+                  JOIN incident_tickets m ON m.ticket_id = o.id
+                 WHERE COALESCE(o.status IN ('open', 'in_progress'), false) <> COALESCE(n.status IN ('open', 'in_progress'), false)
+                 GROUP BY m.incident_id) c
+         WHERE i.id = c.incident_id AND c.delta <> 0;
+    ELSE
+        WITH gone AS (
+            DELETE FROM incident_tickets m USING old_tickets o
+             WHERE m.ticket_id = o.id
+            RETURNING m.incident_id, COALESCE(o.status IN ('open', 'in_progress'), false) AS was_open
+        )
+        UPDATE incidents i
+           SET tickets_count = i.tickets_count - g.tickets, open_count = i.open_count - g.pending,
+               status = CASE WHEN g.pending > 0 AND i.open_count - g.pending = 0 THEN 'closed' ELSE i.status END,
+               closed_at = CASE WHEN g.pending > 0 AND i.open_count - g.pending = 0 THEN COALESCE(i.closed_at, now()) ELSE i.closed_at END
+          FROM (SELECT incident_id, count(*) AS tickets, count(*) FILTER (WHERE was_open) AS pending
+                  FROM gone GROUP BY incident_id) g
+         WHERE i.id = g.incident_id;
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+-- Lo mismo que hacen los triggers ticket por ticket, pero de una vez sobre lo pendiente: por clave,
+-- un incidente nuevo cada vez que pasan más de 4 horas entre dos tickets; el último sigue abierto
+CREATE OR REPLACE FUNCTION incidents_rebuild() RETURNS integer AS $$
+DECLARE
+    attached integer;
+BEGIN
+    DELETE FROM incident_tickets;
+    DELETE FROM incidents;
+    WITH keyed AS (
+        SELECT t.id AS ticket_id, t.created_at, k.kind, k.key,
+               CASE WHEN t.created_at - lag(t.created_at) OVER w > interval '4 hours' THEN 1 ELSE 0 END AS starts
+          FROM tickets t
+          JOIN client_services s ON s.id = t.service_id
+         CROSS JOIN LATERAL (VALUES ('nap', s.nap_box), ('subnet', s.subnet)) AS k (kind, key)
+         WHERE t.status IN ('open', 'in_progress') AND k.key IS NOT NULL
+        WINDOW w AS (PARTITION BY k.kind, k.key ORDER BY t.created_at, t.id)
+    ), numbered AS (
+        SELECT *, sum(starts) OVER (PARTITION BY kind, key ORDER BY created_at, ticket_id) AS run FROM keyed
+    ), grouped AS MATERIALIZED (
+        SELECT nextval(pg_get_serial_sequence('incidents', 'id')) AS id, kind, key, run,
+               run = max(run) OVER (PARTITION BY kind, key) AS latest,
+               min(created_at) AS opened_at, max(created_at) AS last_ticket_at, count(*) AS tickets
+          FROM numbered
+         GROUP BY kind, key, run
+    ), created AS (
+        INSERT INTO incidents (id, kind, key, status, opened_at, last_ticket_at, closed_at, tickets_count, open_count)
+        SELECT id, kind, key, CASE WHEN latest THEN 'open' ELSE 'closed' END, opened_at, last_ticket_at,
+               CASE WHEN NOT latest THEN now() END, tickets, tickets
+          FROM grouped
+    )
+    INSERT INTO incident_tickets (incident_id, ticket_id)
+    SELECT g.id, n.ticket_id FROM numbered n JOIN grouped g USING (kind, key, run);
+    GET DIAGNOSTICS attached = ROW_COUNT;
+    RETURN attached;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION incidents_truncate() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM incident_tickets;
+    DELETE FROM incidents;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER tickets_correlate AFTER INSERT ON tickets
+    REFERENCING NEW TABLE AS new_tickets FOR EACH STATEMENT EXECUTE FUNCTION tickets_correlate();
+CREATE OR REPLACE TRIGGER tickets_incident_status AFTER UPDATE ON tickets
+    REFERENCING OLD TABLE AS old_tickets NEW TABLE AS new_tickets FOR EACH STATEMENT EXECUTE FUNCTION tickets_incident_status();
+CREATE OR REPLACE TRIGGER tickets_incident_delete AFTER DELETE ON tickets
+    REFERENCING OLD TABLE AS old_tickets FOR EACH STATEMENT EXECUTE FUNCTION tickets_incident_status();
+CREATE OR REPLACE TRIGGER tickets_incidents_truncate AFTER TRUNCATE ON tickets
+    FOR EACH STATEMENT EXECUTE FUNCTION incidents_truncate();
+"""
+
+# Triggers por fila de antes (para downgrade)
+ROW_TRIGGERS = (
+    ("tickets", "tickets_stats_insert_delete"), ("tickets", "tickets_stats_update"),
+    ("tickets", "tickets_correlate"), ("tickets", "tickets_incident_status"),
+) + tuple((table, f"{table}_sync_log") for table in SYNC_TABLES)
+
+STATEMENT_TRIGGERS = (
+    ("tickets", "tickets_stats_insert"), ("tickets", "tickets_stats_update"), ("tickets", "tickets_stats_delete"),
+    ("tickets", "tickets_correlate"), ("tickets", "tickets_incident_status"), ("tickets", "tickets_incident_delete"),
+) + tuple((table, f"{table}_sync_log_{action}") for table in SYNC_TABLES for action in ("insert", "update", "delete"))
+
+OLD_TRIGGERS_DDL = """
+CREATE OR REPLACE FUNCTION tickets_set_resolved_at() RETURNS trigger AS $$
+BEGIN
+    IF NEW.status IN ('resolved', 'closed') THEN
+        NEW.resolved_at := COALESCE(
+            NEW.resolved_at,
+            CASE WHEN TG_OP = 'UPDATE' THEN OLD.resolved_at END,
+            now()
+        );
+    ELSE
+        NEW.resolved_at := NULL;
+    END IF;
+    RETURN NEW;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION tickets_maintain_stats() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE ticket_stats SET count = count - 1
+         WHERE status = COALESCE(OLD.status, '') AND priority = COALESCE(OLD.priority, '')
+           AND category = COALESCE(OLD.category, '') AND assigned_id = COALESCE(OLD.assigned_id, 0);
+        IF OLD.status IN ('open', 'in_progress') THEN
+            UPDATE ticket_open_days SET count = count - 1 WHERE created_day = OLD.created_at::date;
+        END IF;
+        IF OLD.resolved_at IS NOT NULL THEN
+            UPDATE ticket_resolution_stats
+               SET resolved_count = resolved_count - 1,
+                   total_seconds = total_seconds - EXTRACT(EPOCH FROM OLD.resolved_at - OLD.created_at)
+             WHERE category = COALESCE(OLD.category, '');
+        END IF;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO ticket_stats AS s (status, priority, category, assigned_id, count)
+        VALUES (COALESCE(NEW.status, ''), COALESCE(NEW.priority, ''), COALESCE(NEW.category, ''),
+                COALESCE(NEW.assigned_id, 0), 1)
+        ON CONFLICT (status, priority, category, assigned_id) DO UPDATE SET count = s.count + 1;
+        IF NEW.status IN ('open', 'in_progress') THEN
+            INSERT INTO ticket_open_days AS d (created_day, count) VALUES (NEW.created_at::date, 1)
+            ON CONFLICT (created_day) DO UPDATE SET count = d.count + 1;
+        END IF;
+        IF NEW.resolved_at IS NOT NULL THEN
+            INSERT INTO ticket_resolution_stats AS r (category, resolved_count, total_seconds)
+            VALUES (COALESCE(NEW.category, ''), 1, EXTRACT(EPOCH FROM NEW.resolved_at - NEW.created_at))
+            ON CONFLICT (category) DO UPDATE
+               SET resolved_count = r.resolved_count + 1, total_seconds = r.total_seconds + EXCLUDED.total_seconds;
+        END IF;
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION ticket_stats_rebuild() RETURNS void AS $$
+BEGIN
+    DELETE FROM ticket_stats;
+    DELETE FROM ticket_open_days;
+    DELETE FROM ticket_resolution_stats;
+    INSERT INTO ticket_stats (status, priority, category, assigned_id, count)
+    SELECT COALESCE(status, ''), COALESCE(priority, ''), COALESCE(category, ''), COALESCE(assigned_id, 0), count(*)
+      FROM tickets GROUP BY 1, 2, 3, 4;
+    INSERT INTO ticket_open_days (created_day, count)
+    SELECT created_at::date, count(*) FROM tickets WHERE status IN ('open', 'in_progress') GROUP BY 1;
+    INSERT INTO ticket_resolution_stats (category, resolved_count, total_seconds)
+    SELECT COALESCE(category, ''), count(*), sum(EXTRACT(EPOCH FROM resolved_at - created_at))
+      FROM tickets WHERE resolved_at IS NOT NULL GROUP BY 1;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION ticket_stats_truncate() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM ticket_stats;
+    DELETE FROM ticket_open_days;
+    DELETE FROM ticket_resolution_stats;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER tickets_set_resolved_at BEFORE INSERT OR UPDATE OF status, resolved_at ON tickets
+    FOR EACH ROW EXECUTE FUNCTION tickets_set_resolved_at();
+CREATE OR REPLACE TRIGGER tickets_stats_insert_delete AFTER INSERT OR DELETE ON tickets
+    FOR EACH ROW EXECUTE FUNCTION tickets_maintain_stats();
+CREATE OR REPLACE TRIGGER tickets_stats_update AFTER UPDATE OF status, priority, category, assigned_id, created_at, resolved_at ON tickets
+    FOR EACH ROW EXECUTE FUNCTION tickets_maintain_stats();
+CREATE OR REPLACE TRIGGER tickets_stats_truncate AFTER TRUNCATE ON tickets
+    FOR EACH STATEMENT EXECUTE FUNCTION ticket_stats_truncate();
+"""
+
+OLD_SYNC_CHANGES_DDL = """
+CREATE OR REPLACE FUNCTION sync_log_change() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO sync_changes (txid, entity, entity_id, op)
+    VALUES (pg_current_xact_id()::text::bigint, TG_ARGV[0], CASE TG_OP WHEN 'DELETE' THEN OLD.id ELSE NEW.id END, TG_OP);
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+""" + "".join(
+    f"CREATE OR REPLACE TRIGGER {table}_sync_log AFTER INSERT OR UPDATE OR DELETE ON {table}\n"
+    f"    FOR EACH ROW EXECUTE FUNCTION sync_log_change('{table}');\n"
+    for table in SYNC_TABLES
+)
+
+OLD_INCIDENTS_DDL = r"""
+CREATE OR REPLACE FUNCTION nap_box_key(value text) RETURNS text AS $$
+    SELECT NULLIF(regexp_replace(
+        regexp_replace(upper(btrim(value)), '[\s,/-]+(P|PTO|PUERTO|PORT)\.?\s*\d+$', ''),
+        '[^A-Z0-9]', '', 'g'), '')
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION client_services_set_subnet() RETURNS trigger AS $$
+DECLARE
+    parts text[] := regexp_match(NEW.ip_address, '^\s*(\d{1,3})\.(\d{1,3})\.(\d{1,3})\.(\d{1,3})\s*$');
+BEGIN
+    IF parts IS NULL OR GREATEST(parts[1]::int, parts[2]::int, parts[3]::int, parts[4]::int) > 255 THEN
+        NEW.subnet := NULL;
+    ELSE
+        NEW.subnet := format('%s.%s.%s.0/24', parts[1]::int, parts[2]::int, parts[3]::int);
+    END IF;
+    RETURN NEW;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER client_services_set_subnet BEFORE INSERT OR UPDATE OF ip_address ON client_services
+    FOR EACH ROW EXECUTE FUNCTION client_services_set_subnet();
+
+CREATE OR REPLACE FUNCTION service_sheets_set_nap_box() RETURNS trigger AS $$
+BEGIN
+    UPDATE client_services s SET nap_box = nap_box_key(NEW.nap_box_data), updated_at = now()
+      FROM tickets t
+     WHERE t.id = NEW.ticket_id AND s.id = t.service_id AND s.nap_box IS DISTINCT FROM nap_box_key(NEW.nap_box_data);
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER service_sheets_set_nap_box AFTER INSERT OR UPDATE OF nap_box_data ON service_sheets
+    FOR EACH ROW WHEN (nap_box_key(NEW.nap_box_data) IS NOT NULL) EXECUTE FUNCTION service_sheets_set_nap_box();
+
+CREATE OR REPLACE FUNCTION incident_attach(ticket_id integer, service_id integer, created_at timestamptz) RETURNS void AS $$
+DECLARE
+    keys record;
+    incident integer;
+BEGIN
+    FOR keys IN
+        SELECT k.kind, k.key FROM client_services s, LATERAL (VALUES ('nap', s.nap_box), ('subnet', s.subnet)) AS k (kind, key)
+         WHERE s.id = incident_attach.service_id AND k.key IS NOT NULL
+    LOOP
+        -- El incidente de esa clave quedó quieto: es otro corte
+        UPDATE incidents SET status = 'closed', closed_at = now()
+         WHERE kind = keys.kind AND key = keys.key AND status = 'open'
+           AND last_ticket_at < incident_attach.created_at - interval '4 hours';
+        INSERT INTO incidents AS i (kind, key, status, opened_at, last_ticket_at, tickets_count, open_count)
+        VALUES (keys.kind, keys.key, 'open', incident_attach.created_at, incident_attach.created_at, 1, 1)
+        ON CONFLICT (kind, key) WHERE status = 'open' DO UPDATE
+           SET tickets_count = i.tickets_count + 1, open_count = i.open_count + 1,
+               opened_at = least(i.opened_at, EXCLUDED.opened_at),
+               last_ticket_at = greatest(i.last_ticket_at, EXCLUDED.last_ticket_at)
+        RETURNING id INTO incident;
+        INSERT INTO incident_tickets (incident_id, ticket_id) VALUES (incident, incident_attach.ticket_id);
+    END LOOP;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION tickets_correlate() RETURNS trigger AS $$
+BEGIN
+    PERFORM incident_attach(NEW.id, NEW.service_id, NEW.created_at);
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+-- Tickets que se resuelven (o se reabren) o se borran: el contador de pendientes de sus incidentes
+CREATE OR REPLACE FUNCTION tickets_incident_status() RETURNS trigger AS $$
+DECLARE
+    was_open boolean := COALESCE(OLD.status IN ('open', 'in_progress'), false);
+    is_open boolean := false;
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        is_open := COALESCE(NEW.status IN ('open', 'in_progress'), false);
+    END IF;
+    IF was_open <> is_open THEN
+        UPDATE incidents i
+           SET open_count = i.open_count + CASE WHEN is_open THEN 1 ELSE -1 END,
+               status = CASE WHEN i.open_count + CASE WHEN is_open THEN 1 ELSE -1 END = 0 THEN 'closed' ELSE i.status END,
+               closed_at = CASE WHEN i.open_count + CASE WHEN is_open THEN 1 ELSE -1 END = 0 THEN COALESCE(i.closed_at, now()) ELSE i.closed_at END
+          FROM incident_tickets m
+         WHERE m.ticket_id = OLD.id AND i.id = m.incident_id;
+    END IF;
+    IF TG_OP = 'DELETE' THEN
+        UPDATE incidents i SET tickets_count = i.tickets_count - 1
+          FROM incident_tickets m
+         WHERE m.ticket_id = OLD.id AND i.id = m.incident_id;
+        DELETE FROM incident_tickets WHERE ticket_id = OLD.id;
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+-- Lo mismo que hacen los triggers ticket por ticket, pero de una vez sobre lo pendiente: por clave,
+-- un incidente nuevo cada vez que pasan más de 4 horas entre dos tickets; el último sigue abierto
+CREATE OR REPLACE FUNCTION incidents_rebuild() RETURNS integer AS $$
+DECLARE
+    attached integer;
+BEGIN
+    DELETE FROM incident_tickets;
+    DELETE FROM incidents;
+    WITH keyed AS (
+        SELECT t.id AS ticket_id, t.created_at, k.kind, k.key,
+               CASE WHEN t.created_at - lag(t.created_at) OVER w > interval '4 hours' THEN 1 ELSE 0 END AS starts
+          FROM tickets t
+          JOIN client_services s ON s.id = t.service_id
+         CROSS JOIN LATERAL (VALUES ('nap', s.nap_box), ('subnet', s.subnet)) AS k (kind, key)
+         WHERE t.status IN ('open', 'in_progress') AND k.key IS NOT NULL
+        WINDOW w AS (PARTITION BY k.kind, k.key ORDER BY t.created_at, t.id)
+    ), numbered AS (
+        SELECT *, sum(starts) OVER (PARTITION BY kind, key ORDER BY created_at, ticket_id) AS run FROM keyed
+    ), grouped AS MATERIALIZED (
+        SELECT nextval(pg_get_serial_sequence('incidents', 'id')) AS id, kind, key, run,
+               run = max(run) OVER (PARTITION BY kind, key) AS latest,
+               min(created_at) AS opened_at, max(created_at) AS last_ticket_at, count(*) AS tickets
+          FROM numbered
+         GROUP BY kind, key, run
+    ), created AS (
+        INSERT INTO incidents (id, kind, key, status, opened_at, last_ticket_at, closed_at, tickets_count, open_count)
+        SELECT id, kind, key, CASE WHEN latest THEN 'open' ELSE 'closed' END, opened_at, last_ticket_at,
+               CASE WHEN NOT latest THEN now() END, tickets, tickets
+          FROM grouped
+    )
+    INSERT INTO incident_tickets (incident_id, ticket_id)
+    SELECT g.id, n.ticket_id FROM numbered n JOIN grouped g USING (kind, key, run);
+    GET DIAGNOSTICS attached = ROW_COUNT;
+    RETURN attached;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION incidents_truncate() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM incident_tickets;
+    DELETE FROM incidents;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER tickets_correlate AFTER INSERT ON tickets
+    FOR EACH ROW WHEN (NEW.service_id IS NOT NULL AND NEW.status IN ('open', 'in_progress'))
+    EXECUTE FUNCTION tickets_correlate();
+CREATE OR REPLACE TRIGGER tickets_incident_status AFTER UPDATE OF status OR DELETE ON tickets
+    FOR EACH ROW EXECUTE FUNCTION tickets_incident_status();
+CREATE OR REPLACE TRIGGER tickets_incidents_truncate AFTER TRUNCATE ON tickets
+    FOR EACH STATEMENT EXECUTE FUNCTION incidents_truncate();
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE OR REPLACE TRIGGER no cambia un trigger por fila a uno por sentencia: se borran antes
+    for table, trigger in ROW_TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger} ON {table}")
+    op.execute(TRIGGERS_DDL)
+    op.execute(SYNC_CHANGES_DDL)
+    op.execute(INCIDENTS_DDL)
+    op.execute("DROP FUNCTION IF EXISTS incident_attach(integer, integer, timestamptz)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, trigger in STATEMENT_TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger} ON {table}")
+    op.execute(OLD_TRIGGERS_DDL)
+    op.execute(OLD_SYNC_CHANGES_DDL)
+    op.execute(OLD_INCIDENTS_DDL)
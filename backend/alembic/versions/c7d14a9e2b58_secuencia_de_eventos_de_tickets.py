@@ -0,0 +1,28 @@
+"""Secuencia de eventos de tickets
+
+Revision ID: c7d14a9e2b58
+Revises: 5a8f3e1c7b92
+Create Date: 2026-10-17 23:51:42
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d14a9e2b58'
+down_revision: Union[str, Sequence[str], None] = '5a8f3e1c7b92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(sa.schema.CreateSequence(sa.Sequence('ticket_events_id_seq')))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(sa.schema.DropSequence(sa.Sequence('ticket_events_id_seq')))
@@ -0,0 +1,55 @@
+"""updated_at para ETag de listados
+
+Revision ID: c8e3a1f5d279
+Revises: b6d2f9a4c813
+Create Date: 2026-10-18 00:48:33
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8e3a1f5d279'
+down_revision: Union[str, Sequence[str], None] = 'b6d2f9a4c813'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Versión de GET /tickets por max(updated_at) (la reemplaza e5b2d8f4a173)
+TICKETS_VERSION_DDL = """
+CREATE OR REPLACE FUNCTION tickets_version(OUT total bigint, OUT last_modified timestamptz) AS $$
+BEGIN
+    SELECT coalesce(sum(count), 0) INTO total FROM ticket_stats;
+    last_modified := greatest(
+        (SELECT max(updated_at) FROM tickets),
+        (SELECT max(created_at) FROM tickets),
+        (SELECT max(updated_at) FROM client_services),
+        (SELECT max(updated_at) FROM clients),
+        (SELECT max(updated_at) FROM plans)
+    );
+END $$ LANGUAGE plpgsql STABLE;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Las filas existentes quedan con la fecha de la migración (now() no reescribe la tabla)
+    for table in ('clients', 'client_services', 'plans'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True))
+    op.create_index(op.f('ix_clients_updated_at'), 'clients', ['updated_at'], unique=False)
+    op.create_index(op.f('ix_client_services_updated_at'), 'client_services', ['updated_at'], unique=False)
+    # max(updated_at) por índice en cada partición, sin recorrer tickets
+    op.create_index(op.f('ix_tickets_updated_at'), 'tickets', ['updated_at'], unique=False)
+    op.execute(TICKETS_VERSION_DDL)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP FUNCTION IF EXISTS tickets_version()")
+    op.drop_index(op.f('ix_tickets_updated_at'), table_name='tickets')
+    op.drop_index(op.f('ix_client_services_updated_at'), table_name='client_services')
+    op.drop_index(op.f('ix_clients_updated_at'), table_name='clients')
+    for table in ('plans', 'client_services', 'clients'):
+        op.drop_column(table, 'updated_at')
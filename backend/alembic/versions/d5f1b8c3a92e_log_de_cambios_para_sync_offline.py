@@ -0,0 +1,84 @@
+"""Log de cambios para sync offline
+
+Revision ID: d5f1b8c3a92e
+Revises: c8e3a1f5d279
+Create Date: 2026-10-18 00:56:53
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5f1b8c3a92e'
+down_revision: Union[str, Sequence[str], None] = 'c8e3a1f5d279'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Log de cambios de GET /sync, primera versión (por fila; la reemplaza c3f8a6d1e947)
+SYNC_TABLES = ("tickets", "clients", "client_services", "service_sheets")
+
+SYNC_CHANGES_DDL = """
+CREATE OR REPLACE FUNCTION sync_log_change() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO sync_changes (txid, entity, entity_id, op)
+    VALUES (pg_current_xact_id()::text::bigint, TG_ARGV[0], CASE TG_OP WHEN 'DELETE' THEN OLD.id ELSE NEW.id END, TG_OP);
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+""" + "".join(
+    f"CREATE OR REPLACE TRIGGER {table}_sync_log AFTER INSERT OR UPDATE OR DELETE ON {table}\n"
+    f"    FOR EACH ROW EXECUTE FUNCTION sync_log_change('{table}');\n"
+    for table in SYNC_TABLES
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Las planillas existentes quedan con la fecha de la migración (now() no reescribe la tabla)
+    op.add_column('service_sheets', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True))
+    op.add_column('service_sheets', sa.Column('client_ref', sa.String(), nullable=True))
+    op.create_index(op.f('ix_service_sheets_client_ref'), 'service_sheets', ['client_ref'], unique=False)
+
+    op.create_table('sync_changes',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('txid', sa.BigInteger(), nullable=False),
+    sa.Column('entity', sa.String(), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('op', sa.String(), nullable=False),
+    sa.Column('changed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_sync_changes_txid_id', 'sync_changes', ['txid', 'id'], unique=False)
+    op.create_index('ix_sync_changes_entity', 'sync_changes', ['entity', 'entity_id'], unique=False)
+    op.create_index(op.f('ix_sync_changes_changed_at'), 'sync_changes', ['changed_at'], unique=False)
+
+    # Una fila por registro existente: una app sin token baja todo recorriendo el log (ver sync.py)
+    for table in SYNC_TABLES:
+        op.execute(
+            "INSERT INTO sync_changes (txid, entity, entity_id, op) "
+            f"SELECT pg_current_xact_id()::text::bigint, '{table}', id, 'INSERT' FROM {table} ORDER BY id"
+        )
+    op.execute(SYNC_CHANGES_DDL)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in SYNC_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_sync_log ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS sync_log_change()")
+    op.drop_index(op.f('ix_sync_changes_changed_at'), table_name='sync_changes')
+    op.drop_index('ix_sync_changes_entity', table_name='sync_changes')
+    op.drop_index('ix_sync_changes_txid_id', table_name='sync_changes')
+    op.drop_table('sync_changes')
+
+    op.drop_index(op.f('ix_service_sheets_client_ref'), table_name='service_sheets')
+    op.drop_column('service_sheets', 'client_ref')
+    op.drop_column('service_sheets', 'updated_at')
+    # Meses archivados (partitions.py archive): que sigan teniendo las columnas del padre
+    archived = op.get_bind().execute(sa.text(
+        "SELECT tablename FROM pg_tables WHERE schemaname = 'archive' AND tablename ~ '^service_sheets_y[0-9]{4}m[0-9]{2}$'"
+    )).scalars().all()
+    for name in archived:
+        op.execute(f'ALTER TABLE archive."{name}" DROP COLUMN IF EXISTS client_ref, DROP COLUMN IF EXISTS updated_at')
@@ -0,0 +1,35 @@
+"""external_id para importacion
+
+Revision ID: d93a5c27e1f4
+Revises: b41d0e6f8a27
+Create Date: 2026-10-17 23:39:27
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd93a5c27e1f4'
+down_revision: Union[str, Sequence[str], None] = 'b41d0e6f8a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ['clients', 'client_services', 'tickets']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Clave natural del sistema anterior: permite reimportar sin duplicar (ON CONFLICT)
+    for table in TABLES:
+        op.add_column(table, sa.Column('external_id', sa.String(), nullable=True))
+        op.create_index(op.f(f'ix_{table}_external_id'), table, ['external_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in reversed(TABLES):
+        op.drop_index(op.f(f'ix_{table}_external_id'), table_name=table)
+        op.drop_column(table, 'external_id')
@@ -0,0 +1,167 @@
+"""Particiones mensuales de tickets y planillas
+
+Revision ID: e2b7f90c4d16
+Revises: c7d14a9e2b58
+Create Date: 2026-10-18 00:27:07
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b7f90c4d16'
+down_revision: Union[str, Sequence[str], None] = 'c7d14a9e2b58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+
+# Crea las particiones mensuales (meses UTC) que falten entre dos fechas; la usa también src/partitions.py
+PARTITION_FUNCTION = """
+CREATE OR REPLACE FUNCTION create_monthly_partitions(parent text, from_month timestamptz, to_month timestamptz)
+RETURNS integer AS $$
+DECLARE
+    month timestamp := date_trunc('month', from_month AT TIME ZONE 'UTC');
+    created integer := 0;
+    partition text;
+BEGIN
+    WHILE month <= to_month AT TIME ZONE 'UTC' LOOP
+        partition := format('%s_y%sm%s', parent, to_char(month, 'YYYY'), to_char(month, 'MM'));
+        IF to_regclass(partition) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                           partition, parent, month AT TIME ZONE 'UTC', (month + interval '1 month') AT TIME ZONE 'UTC');
+            created := created + 1;
+        END IF;
+        month := month + interval '1 month';
+    END LOOP;
+    RETURN created;
+END $$ LANGUAGE plpgsql;
+"""
+
+# Lo que se pierde al recrear cada tabla (índices, FKs salientes) y hay que volver a crear
+TABLES = {
+    'service_sheets': {
+        'fallback_created_at': 'COALESCE(started_at, now())',
+        'indexes': [
+            'CREATE INDEX ix_service_sheets_id ON service_sheets (id)',
+            'CREATE INDEX ix_service_sheets_ticket_id ON service_sheets (ticket_id)',
+        ],
+        'foreign_keys': [
+            'ALTER TABLE service_sheets ADD CONSTRAINT service_sheets_author_id_fkey FOREIGN KEY (author_id) REFERENCES users (id)',
+        ],
+    },
+    'tickets': {
+        'fallback_created_at': 'COALESCE(updated_at, now())',
+        'indexes': [
+            'CREATE INDEX ix_tickets_id ON tickets (id)',
+            'CREATE INDEX ix_tickets_service_id ON tickets (service_id)',
+            'CREATE INDEX ix_tickets_created_at ON tickets (created_at)',
+            'CREATE INDEX ix_tickets_status_id ON tickets (status, id DESC)',
+            "CREATE INDEX ix_tickets_assigned_open_created ON tickets (assigned_id, created_at) "
+            "WHERE status IN ('open', 'in_progress')",
+        ],
+        'foreign_keys': [
+            'ALTER TABLE tickets ADD CONSTRAINT tickets_service_id_fkey FOREIGN KEY (service_id) REFERENCES client_services (id)',
+            'ALTER TABLE tickets ADD CONSTRAINT tickets_creator_id_fkey FOREIGN KEY (creator_id) REFERENCES users (id)',
+            'ALTER TABLE tickets ADD CONSTRAINT tickets_assigned_id_fkey FOREIGN KEY (assigned_id) REFERENCES users (id)',
+        ],
+    },
+}
+
+TICKET_TRIGGERS = """
+CREATE TRIGGER tickets_set_resolved_at BEFORE INSERT OR UPDATE OF status, resolved_at ON tickets
+    FOR EACH ROW EXECUTE FUNCTION tickets_set_resolved_at();
+CREATE TRIGGER tickets_stats_insert_delete AFTER INSERT OR DELETE ON tickets
+    FOR EACH ROW EXECUTE FUNCTION tickets_maintain_stats();
+CREATE TRIGGER tickets_stats_update AFTER UPDATE OF status, priority, category, assigned_id, created_at, resolved_at ON tickets
+    FOR EACH ROW EXECUTE FUNCTION tickets_maintain_stats();
+CREATE TRIGGER tickets_stats_truncate AFTER TRUNCATE ON tickets
+    FOR EACH STATEMENT EXECUTE FUNCTION ticket_stats_truncate();
+"""
+
+# Vuelve a adjuntar los meses movidos al esquema archive por `partitions.py archive`
+REATTACH_ARCHIVED = """
+DO $$
+DECLARE
+    part record;
+    month timestamp;
+BEGIN
+    FOR part IN
+        SELECT tablename, substring(tablename from '^(.*)_y[0-9]{4}m[0-9]{2}$') AS parent FROM pg_tables
+        WHERE schemaname = 'archive' AND tablename ~ '^(tickets|service_sheets)_y[0-9]{4}m[0-9]{2}$'
+    LOOP
+        month := make_timestamp(substring(part.tablename from '_y([0-9]{4})m')::int,
+                                substring(part.tablename from 'm([0-9]{2})$')::int, 1, 0, 0, 0);
+        EXECUTE format('ALTER TABLE archive.%I SET SCHEMA public', part.tablename);
+        EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                       part.parent, part.tablename, month AT TIME ZONE 'UTC', (month + interval '1 month') AT TIME ZONE 'UTC');
+    END LOOP;
+END $$;
+"""
+
+
+def rebuild(table, partitioned):
+    """Recrea la tabla (particionada o no) con las mismas columnas y copia los datos."""
+    spec = TABLES[table]
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY NONE") # Que no se borre con la tabla vieja
+    op.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+    op.execute(
+        f"CREATE TABLE {table} (LIKE {table}_old INCLUDING DEFAULTS)"
+        + (" PARTITION BY RANGE (created_at)" if partitioned else "")
+    )
+    if partitioned:
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN created_at SET NOT NULL") # Es parte de la clave
+        op.execute(
+            f"SELECT create_monthly_partitions('{table}', "
+            f"COALESCE((SELECT min(created_at) FROM {table}_old), now()), now() + interval '{MONTHS_AHEAD} months')"
+        )
+    op.execute(f"INSERT INTO {table} SELECT * FROM {table}_old")
+    op.execute(f"DROP TABLE {table}_old CASCADE")
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+
+    # Índices y claves después de copiar: más rápido que mantenerlos fila por fila
+    if partitioned:
+        # Toda clave única de una tabla particionada tiene que incluir la columna de partición
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, created_at)")
+    else:
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN created_at DROP NOT NULL")
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id)")
+    for statement in spec['indexes'] + spec['foreign_keys']:
+        op.execute(statement)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Conversión completa: bloquea ambas tablas mientras dura (correr en una ventana de mantenimiento)
+    op.execute("LOCK TABLE tickets, service_sheets IN ACCESS EXCLUSIVE MODE")
+    op.execute(PARTITION_FUNCTION)
+    for table, spec in TABLES.items():
+        # La columna de partición no puede ser NULL
+        op.execute(f"UPDATE {table} SET created_at = {spec['fallback_created_at']} WHERE created_at IS NULL")
+
+    # Una FK hacia una tabla particionada necesita una clave única solo sobre ticket_id: ya no existe.
+    # Tampoco puede haber UNIQUE solo sobre external_id (la importación usa UPDATE + INSERT en su lugar).
+    op.execute("ALTER TABLE service_sheets DROP CONSTRAINT IF EXISTS service_sheets_ticket_id_fkey")
+    rebuild('service_sheets', partitioned=True)
+    rebuild('tickets', partitioned=True)
+    op.execute('CREATE INDEX ix_tickets_external_id ON tickets (external_id)')
+    op.execute(TICKET_TRIGGERS)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("LOCK TABLE tickets, service_sheets IN ACCESS EXCLUSIVE MODE")
+    op.execute(REATTACH_ARCHIVED) # Sin ellos la tabla plana quedaría sin el historial archivado
+    rebuild('tickets', partitioned=False)
+    op.execute('CREATE UNIQUE INDEX ix_tickets_external_id ON tickets (external_id)')
+    op.execute(TICKET_TRIGGERS)
+    rebuild('service_sheets', partitioned=False)
+    op.execute(
+        "ALTER TABLE service_sheets ADD CONSTRAINT service_sheets_ticket_id_fkey "
+        "FOREIGN KEY (ticket_id) REFERENCES tickets (id)"
+    )
+    op.execute("DROP FUNCTION IF EXISTS create_monthly_partitions(text, timestamptz, timestamptz)")
+    op.execute("SELECT ticket_stats_rebuild()") # Incluye los tickets que estaban archivados
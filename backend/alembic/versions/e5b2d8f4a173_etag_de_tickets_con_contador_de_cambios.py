@@ -0,0 +1,83 @@
+"""ETag de tickets con contador de cambios por commit
+
+Revision ID: e5b2d8f4a173
+Revises: c3f8a6d1e947
+Create Date: 2026-10-18 02:34:55
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b2d8f4a173'
+down_revision: Union[str, Sequence[str], None] = 'c3f8a6d1e947'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Tablas que muestra la bandeja de GET /tickets
+TICKETS_VERSION_TABLES = ("tickets", "client_services", "clients", "plans")
+
+# Contador de cambios para el ETag de GET /tickets (ver DataVersion en models.py)
+TICKETS_VERSION_DDL = """
+CREATE OR REPLACE FUNCTION bump_data_version(listing text) RETURNS void AS $$
+    INSERT INTO data_versions (name, slot, version) VALUES (listing, mod(pg_backend_pid(), 16), 1)
+    ON CONFLICT (name, slot) DO UPDATE SET version = data_versions.version + 1;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION data_versions_bump() RETURNS trigger AS $$
+BEGIN
+    PERFORM bump_data_version(TG_ARGV[0]);
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION tickets_version(OUT total bigint, OUT version bigint) AS $$
+    SELECT (SELECT coalesce(sum(count), 0) FROM ticket_stats),
+           (SELECT coalesce(sum(version), 0) FROM data_versions WHERE name = 'tickets');
+$$ LANGUAGE sql STABLE;
+""" + "".join(
+    f"CREATE OR REPLACE TRIGGER {table}_tickets_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}\n"
+    f"    FOR EACH STATEMENT EXECUTE FUNCTION data_versions_bump('tickets');\n"
+    for table in TICKETS_VERSION_TABLES
+)
+
+# Versión anterior (c8e3a1f5d279), para el downgrade
+OLD_TICKETS_VERSION_DDL = """
+CREATE OR REPLACE FUNCTION tickets_version(OUT total bigint, OUT last_modified timestamptz) AS $$
+BEGIN
+    SELECT coalesce(sum(count), 0) INTO total FROM ticket_stats;
+    last_modified := greatest(
+        (SELECT max(updated_at) FROM tickets),
+        (SELECT max(created_at) FROM tickets),
+        (SELECT max(updated_at) FROM client_services),
+        (SELECT max(updated_at) FROM clients),
+        (SELECT max(updated_at) FROM plans)
+    );
+END $$ LANGUAGE plpgsql STABLE;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('data_versions',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('slot', sa.SmallInteger(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name', 'slot')
+    )
+    # Cambian las columnas que devuelve: CREATE OR REPLACE no alcanza
+    op.execute("DROP FUNCTION IF EXISTS tickets_version()")
+    op.execute(TICKETS_VERSION_DDL)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TICKETS_VERSION_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_tickets_version ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS tickets_version()")
+    op.execute("DROP FUNCTION IF EXISTS data_versions_bump()")
+    op.execute("DROP FUNCTION IF EXISTS bump_data_version(text)")
+    op.drop_table('data_versions')
+    op.execute(OLD_TICKETS_VERSION_DDL)
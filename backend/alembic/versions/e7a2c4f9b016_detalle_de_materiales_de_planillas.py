@@ -0,0 +1,128 @@
+"""Detalle de materiales de planillas
+
+Revision ID: e7a2c4f9b016
+Revises: d5f1b8c3a92e
+Create Date: 2026-10-18 01:06:56
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a2c4f9b016'
+down_revision: Union[str, Sequence[str], None] = 'd5f1b8c3a92e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Detalle y totales diarios de materiales (ver materials.py)
+MATERIALS_DDL = r"""
+CREATE OR REPLACE FUNCTION materials_items(materials json) RETURNS TABLE (item text, quantity numeric) AS $$
+    SELECT lower(btrim(key)), sum(replace(btrim(value #>> '{}'), ',', '.')::numeric)
+      FROM jsonb_each(CASE WHEN jsonb_typeof(materials::jsonb) = 'object' THEN materials::jsonb END)
+     WHERE btrim(value #>> '{}') ~ '^[0-9]+([.,][0-9]+)?$' AND btrim(key) <> ''
+     GROUP BY 1
+    HAVING sum(replace(btrim(value #>> '{}'), ',', '.')::numeric) > 0
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION service_sheets_sync_materials() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM service_sheet_materials WHERE sheet_id = OLD.id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO service_sheet_materials (sheet_id, item, quantity, author_id, used_at)
+        SELECT NEW.id, item, quantity, NEW.author_id, COALESCE(NEW.started_at, NEW.created_at)
+          FROM materials_items(NEW.materials_used);
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION service_sheets_materials_truncate() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM service_sheet_materials;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+-- El detalle solo recibe INSERT y DELETE (una edición de la planilla borra y vuelve a cargar)
+CREATE OR REPLACE FUNCTION materials_maintain_daily() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' AND OLD.used_at IS NOT NULL THEN
+        UPDATE service_sheet_materials_daily
+           SET quantity = quantity - OLD.quantity, sheets = sheets - 1
+         WHERE day = OLD.used_at::date AND author_id = COALESCE(OLD.author_id, 0) AND item = OLD.item;
+    ELSIF TG_OP = 'INSERT' AND NEW.used_at IS NOT NULL THEN
+        INSERT INTO service_sheet_materials_daily AS d (day, author_id, item, quantity, sheets)
+        VALUES (NEW.used_at::date, COALESCE(NEW.author_id, 0), NEW.item, NEW.quantity, 1)
+        ON CONFLICT (day, author_id, item) DO UPDATE SET quantity = d.quantity + EXCLUDED.quantity, sheets = d.sheets + 1;
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION materials_daily_truncate() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM service_sheet_materials_daily;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION materials_daily_rebuild() RETURNS void AS $$
+BEGIN
+    DELETE FROM service_sheet_materials_daily;
+    INSERT INTO service_sheet_materials_daily (day, author_id, item, quantity, sheets)
+    SELECT used_at::date, COALESCE(author_id, 0), item, sum(quantity), count(*)
+      FROM service_sheet_materials WHERE used_at IS NOT NULL GROUP BY 1, 2, 3;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER service_sheets_materials_insert_delete AFTER INSERT OR DELETE ON service_sheets
+    FOR EACH ROW EXECUTE FUNCTION service_sheets_sync_materials();
+CREATE OR REPLACE TRIGGER service_sheets_materials_update AFTER UPDATE OF materials_used, author_id, started_at, created_at ON service_sheets
+    FOR EACH ROW EXECUTE FUNCTION service_sheets_sync_materials();
+CREATE OR REPLACE TRIGGER service_sheets_materials_truncate AFTER TRUNCATE ON service_sheets
+    FOR EACH STATEMENT EXECUTE FUNCTION service_sheets_materials_truncate();
+CREATE OR REPLACE TRIGGER service_sheet_materials_daily AFTER INSERT OR DELETE ON service_sheet_materials
+    FOR EACH ROW EXECUTE FUNCTION materials_maintain_daily();
+CREATE OR REPLACE TRIGGER service_sheet_materials_truncate AFTER TRUNCATE ON service_sheet_materials
+    FOR EACH STATEMENT EXECUTE FUNCTION materials_daily_truncate();
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('service_sheet_materials',
+    sa.Column('sheet_id', sa.Integer(), nullable=False),
+    sa.Column('item', sa.String(), nullable=False),
+    sa.Column('quantity', sa.Numeric(precision=14, scale=3), nullable=False),
+    sa.Column('author_id', sa.Integer(), nullable=True),
+    sa.Column('used_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('sheet_id', 'item')
+    )
+    op.create_table('service_sheet_materials_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('author_id', sa.Integer(), nullable=False),
+    sa.Column('item', sa.String(), nullable=False),
+    sa.Column('quantity', sa.Numeric(precision=14, scale=3), nullable=False),
+    sa.Column('sheets', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'author_id', 'item')
+    )
+    # Desde acá las planillas nuevas o editadas ya cargan su detalle. Las existentes se desarman
+    # después, de a lotes y sin tener tomada la tabla: python src/materials.py backfill
+    op.execute(MATERIALS_DDL)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS service_sheets_materials_truncate ON service_sheets")
+    op.execute("DROP TRIGGER IF EXISTS service_sheets_materials_update ON service_sheets")
+    op.execute("DROP TRIGGER IF EXISTS service_sheets_materials_insert_delete ON service_sheets")
+    op.execute("DROP TRIGGER IF EXISTS service_sheet_materials_truncate ON service_sheet_materials")
+    op.execute("DROP TRIGGER IF EXISTS service_sheet_materials_daily ON service_sheet_materials")
+    op.execute("DROP FUNCTION IF EXISTS materials_daily_rebuild()")
+    op.execute("DROP FUNCTION IF EXISTS materials_daily_truncate()")
+    op.execute("DROP FUNCTION IF EXISTS materials_maintain_daily()")
+    op.execute("DROP FUNCTION IF EXISTS service_sheets_materials_truncate()")
+    op.execute("DROP FUNCTION IF EXISTS service_sheets_sync_materials()")
+    op.execute("DROP FUNCTION IF EXISTS materials_items(json)")
+    op.drop_table('service_sheet_materials_daily')
+    op.drop_table('service_sheet_materials')
@@ -0,0 +1,124 @@
+"""Telemetría de potencia óptica de las ONUs
+
+Revision ID: f3b9d2e6a741
+Revises: e7a2c4f9b016
+Create Date: 2026-10-18 01:14:19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b9d2e6a741'
+down_revision: Union[str, Sequence[str], None] = 'e7a2c4f9b016'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Particiones por día y ONU de la última planilla (ver telemetry.py)
+TELEMETRY_DDL = r"""
+CREATE OR REPLACE FUNCTION create_daily_partitions(parent text, from_day timestamptz, to_day timestamptz)
+RETURNS integer AS $$
+DECLARE
+    day timestamp := date_trunc('day', from_day AT TIME ZONE 'UTC');
+    created integer := 0;
+    partition text;
+BEGIN
+    WHILE day <= to_day AT TIME ZONE 'UTC' LOOP
+        partition := format('%s_y%sm%sd%s', parent, to_char(day, 'YYYY'), to_char(day, 'MM'), to_char(day, 'DD'));
+        IF to_regclass(partition) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                           partition, parent, day AT TIME ZONE 'UTC', (day + interval '1 day') AT TIME ZONE 'UTC');
+            created := created + 1;
+        END IF;
+        day := day + interval '1 day';
+    END LOOP;
+    RETURN created;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION service_sheets_set_onu_sn() RETURNS trigger AS $$
+DECLARE
+    sn text := upper(btrim(NEW.onu_sn));
+    target integer;
+BEGIN
+    SELECT service_id INTO target FROM tickets WHERE id = NEW.ticket_id;
+    IF target IS NOT NULL THEN
+        UPDATE client_services SET onu_sn = NULL, updated_at = now() WHERE onu_sn = sn AND id <> target;
+        UPDATE client_services SET onu_sn = sn, updated_at = now() WHERE id = target AND onu_sn IS DISTINCT FROM sn;
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER service_sheets_set_onu_sn AFTER INSERT OR UPDATE OF onu_sn ON service_sheets
+    FOR EACH ROW WHEN (btrim(NEW.onu_sn) <> '') EXECUTE FUNCTION service_sheets_set_onu_sn();
+"""
+
+# ONU de la última planilla de cada servicio; si la misma ONU figura en varios, queda en el más reciente
+BACKFILL_ONU_SN = """
+UPDATE client_services s SET onu_sn = latest.sn
+  FROM (
+    SELECT DISTINCT ON (sn) service_id, sn
+      FROM (
+        SELECT DISTINCT ON (t.service_id) t.service_id, upper(btrim(h.onu_sn)) AS sn, h.created_at
+          FROM service_sheets h
+          JOIN tickets t ON t.id = h.ticket_id
+         WHERE btrim(h.onu_sn) <> '' AND t.service_id IS NOT NULL
+         ORDER BY t.service_id, h.created_at DESC
+      ) last_sheet
+     ORDER BY sn, created_at DESC
+  ) latest
+ WHERE s.id = latest.service_id
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('client_services', sa.Column('onu_sn', sa.String(), nullable=True))
+    op.create_index(op.f('ix_client_services_onu_sn'), 'client_services', ['onu_sn'], unique=False)
+    op.execute(BACKFILL_ONU_SN)
+
+    op.create_table('onu_readings',
+    sa.Column('service_id', sa.Integer(), nullable=False),
+    sa.Column('read_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('rx_dbm', sa.Float(precision=24), nullable=False),
+    sa.Column('tx_dbm', sa.Float(precision=24), nullable=True),
+    sa.PrimaryKeyConstraint('service_id', 'read_at'),
+    postgresql_partition_by='RANGE (read_at)'
+    )
+    op.create_table('onu_readings_hourly',
+    sa.Column('service_id', sa.Integer(), nullable=False),
+    sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('samples', sa.Integer(), nullable=False),
+    sa.Column('rx_min', sa.Float(precision=24), nullable=False),
+    sa.Column('rx_max', sa.Float(precision=24), nullable=False),
+    sa.Column('rx_sum', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('service_id', 'bucket'),
+    postgresql_partition_by='RANGE (bucket)'
+    )
+    op.create_table('onu_readings_daily',
+    sa.Column('service_id', sa.Integer(), nullable=False),
+    sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('samples', sa.Integer(), nullable=False),
+    sa.Column('rx_min', sa.Float(precision=24), nullable=False),
+    sa.Column('rx_max', sa.Float(precision=24), nullable=False),
+    sa.Column('rx_sum', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('service_id', 'bucket')
+    )
+    op.execute(TELEMETRY_DDL)
+    # Los próximos días ya creados; después los mantiene `python src/telemetry.py maintain`
+    op.execute("SELECT create_daily_partitions('onu_readings', now(), now() + interval '3 days')")
+    op.execute("SELECT create_monthly_partitions('onu_readings_hourly', now(), now() + interval '3 days')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS service_sheets_set_onu_sn ON service_sheets")
+    op.execute("DROP FUNCTION IF EXISTS service_sheets_set_onu_sn()")
+    op.execute("DROP FUNCTION IF EXISTS create_daily_partitions(text, timestamptz, timestamptz)")
+    op.drop_table('onu_readings_daily')
+    op.drop_table('onu_readings_hourly') # Con sus particiones
+    op.drop_table('onu_readings')
+    op.drop_index(op.f('ix_client_services_onu_sn'), table_name='client_services')
+    op.drop_column('client_services', 'onu_sn')
@@ -0,0 +1,50 @@
+"""Busqueda de texto completo en tickets
+
+Revision ID: f4a9c2d81e37
+Revises: e2b7f90c4d16
+Create Date: 2026-10-18 00:29:42
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4a9c2d81e37'
+down_revision: Union[str, Sequence[str], None] = 'e2b7f90c4d16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (tabla, expresión de la columna generada search_vector, la que lee search.py)
+SEARCH_VECTORS = [
+    ('tickets',
+     "setweight(to_tsvector('spanish', coalesce(title, '')), 'A') || "
+     "setweight(to_tsvector('spanish', coalesce(description, '')), 'B') || "
+     "setweight(to_tsvector('spanish', coalesce(public_note, '')), 'C')"),
+    ('service_sheets', "setweight(to_tsvector('spanish', coalesce(tech_notes, '')), 'B')"),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, expression in SEARCH_VECTORS:
+        # Reescribe la tabla para calcular la columna en las filas existentes (toma un lock exclusivo).
+        # En tablas particionadas la columna y el índice se propagan a cada partición.
+        op.execute(f"ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({expression}) STORED")
+        op.execute(f"CREATE INDEX ix_{table}_search_vector ON {table} USING gin (search_vector)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    conn = op.get_bind()
+    for table, _ in reversed(SEARCH_VECTORS):
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_search_vector")
+        op.execute(f"ALTER TABLE {table} DROP COLUMN search_vector")
+        # Meses archivados (partitions.py archive): que sigan teniendo las columnas del padre
+        archived = conn.execute(sa.text(
+            "SELECT tablename FROM pg_tables WHERE schemaname = 'archive' AND tablename ~ :pattern"
+        ), {'pattern': f'^{table}_y[0-9]{{4}}m[0-9]{{2}}$'}).scalars().all()
+        for name in archived:
+            op.execute(f'ALTER TABLE archive."{name}" DROP COLUMN IF EXISTS search_vector')
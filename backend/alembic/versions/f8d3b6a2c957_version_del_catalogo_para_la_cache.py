@@ -0,0 +1,41 @@
+"""Versión del catálogo para la caché
+
+Revision ID: f8d3b6a2c957
+Revises: e5b2d8f4a173
+Create Date: 2026-10-18 03:51:53
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f8d3b6a2c957'
+down_revision: Union[str, Sequence[str], None] = 'e5b2d8f4a173'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Tablas de las que salen el combo de servicios y el catálogo de planes (ver cache.py)
+CATALOG_VERSION_TABLES = ("client_services", "clients", "plans")
+
+# Mismo contador que el de GET /tickets (data_versions), con otro nombre: un ticket nuevo no
+# vacía la caché del catálogo. Lo sube cualquier escritura, venga de la API, del CLI o de psql.
+CATALOG_VERSION_DDL = "".join(
+    f"CREATE OR REPLACE TRIGGER {table}_catalog_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}\n"
+    f"    FOR EACH STATEMENT EXECUTE FUNCTION data_versions_bump('catalog');\n"
+    for table in CATALOG_VERSION_TABLES
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(CATALOG_VERSION_DDL)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in CATALOG_VERSION_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_catalog_version ON {table}")
+    op.execute("DELETE FROM data_versions WHERE name = 'catalog'")
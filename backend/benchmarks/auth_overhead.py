@@ -0,0 +1,116 @@
+# backend/benchmarks/auth_overhead.py
+# Cuánto cuesta autenticar cada request, y si el login con bcrypt frena al resto de la API.
+#   1. En proceso: firmar/validar un token y buscar el usuario en la caché (sin base ni HTTP).
+#   2. Contra la API levantada: /health y /tickets/stats sin token y con token (mismo worker, keep-alive).
+#   3. Latencia de /health mientras llegan logins en paralelo (bcrypt en el pool de procesos).
+# Uso (desde backend/, con la API levantada y un usuario con contraseña; el paso 1 también necesita
+# AUTH_SECRET, o AUTH_DEV_RANDOM_SECRET=1, en el entorno):
+#   python benchmarks/auth_overhead.py --username admin --password admin123 [--url http://127.0.0.1:8000] [--requests 2000]
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+
+def in_process(repeat):
+    import auth
+
+    auth.user_cache.set(auth.CurrentUser(1, "admin", "admin", True))
+    token, _ = auth.issue_token(1)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        auth.user_cache.get(auth.verify_token(token))
+    validate = (time.perf_counter() - started) / repeat
+    started = time.perf_counter()
+    for _ in range(repeat):
+        auth.issue_token(1)
+    issue = (time.perf_counter() - started) / repeat
+    return validate, issue
+
+
+class Client:
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+
+    def request(self, method, path, body=None, token=None):
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        started = time.perf_counter()
+        self.conn.request(method, path, json.dumps(body) if body is not None else None, headers)
+        response = self.conn.getresponse()
+        payload = response.read()
+        return time.perf_counter() - started, response.status, payload
+
+
+def p(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))] * 1000
+
+
+def timed_get(client, path, token, total):
+    client.request("GET", path, token=token) # Calienta conexión y caché
+    latencies = []
+    for _ in range(total):
+        elapsed, status, payload = client.request("GET", path, token=token)
+        if status != 200:
+            raise SystemExit(f"GET {path}: HTTP {status} {payload[:200]!r}")
+        latencies.append(elapsed)
+    return latencies
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Costo de la autenticación por request y del login.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--requests", type=int, default=2000, help="Requests por escenario")
+    parser.add_argument("--logins", type=int, default=4, help="Clientes haciendo login en paralelo en el paso 3")
+    args = parser.parse_args()
+
+    validate, issue = in_process(100000)
+    print("En proceso:")
+    print(f"  validar token + usuario en caché {validate * 1e6:7.1f} µs")
+    print(f"  emitir token                     {issue * 1e6:7.1f} µs")
+
+    client = Client(args.url)
+    login = lambda c: c.request("POST", "/auth/login", {"username": args.username, "password": args.password})
+    elapsed, status, payload = login(client)
+    if status != 200:
+        raise SystemExit(f"Login: HTTP {status} {payload[:200]!r}")
+    token = json.loads(payload)["access_token"]
+    print(f"Login: {elapsed * 1000:.0f} ms")
+
+    print("Por request (p50 / p95 ms):")
+    for path in ("/health", "/tickets/stats"):
+        plain = timed_get(client, path, None, args.requests)
+        signed = timed_get(client, path, token, args.requests)
+        print(f"  {path:15} sin token {p(plain, 50):6.2f} / {p(plain, 95):6.2f}   con token {p(signed, 50):6.2f} / {p(signed, 95):6.2f}"
+              f"   diferencia p50 {p(signed, 50) - p(plain, 50):+.2f}")
+
+    # Logins en paralelo: /health tiene que seguir respondiendo como si nada
+    stop = threading.Event()
+    logins = []
+    def keep_logging_in():
+        own = Client(args.url)
+        while not stop.is_set():
+            elapsed, status, _ = login(own)
+            logins.append((elapsed, status))
+    threads = [threading.Thread(target=keep_logging_in) for _ in range(args.logins)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.5)
+    during = timed_get(client, "/health", token, args.requests // 4)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    ok = [elapsed for elapsed, status in logins if status == 200]
+    print(f"Con {args.logins} clientes haciendo login: /health p50 {p(during, 50):.2f} ms, p95 {p(during, 95):.2f} ms")
+    print(f"  {len(ok)} logins ok (p50 {p(ok, 50) if ok else 0:.0f} ms), {len(logins) - len(ok)} rechazados (503 por cola llena)")
@@ -0,0 +1,96 @@
+# backend/benchmarks/bench_compression.py
+# Bytes que viajan y CPU del servidor por request en los listados, sin comprimir (como antes),
+# con gzip, con brotli y revalidando con If-None-Match (304).
+# Uso (desde backend/, con DATABASE_URL apuntando a una base ya migrada y con datos):
+#   python benchmarks/bench_compression.py [--requests 200] [--path /tickets?limit=200 --path /services_options]
+#
+# Levanta uvicorn con un proceso y lee su tiempo de CPU de /proc (Linux) antes y después de cada
+# tanda, así la CPU del cliente no se mezcla con la del servidor.
+import argparse
+import http.client
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from startup import BACKEND_DIR, free_port, stop, wait_until_up
+
+MODES = {
+    "sin comprimir": {"Accept-Encoding": "identity"},
+    "gzip": {"Accept-Encoding": "gzip"},
+    "brotli": {"Accept-Encoding": "br"},
+}
+
+
+def cpu_seconds(pid):
+    # utime + stime del proceso, en segundos (campos 14 y 15 de /proc/<pid>/stat)
+    with open(f"/proc/{pid}/stat") as stat:
+        fields = stat.read().rpartition(")")[2].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def fetch(conn, path, headers):
+    conn.request("GET", path, headers=headers)
+    response = conn.getresponse()
+    body = response.read()
+    # Lo que viaja: línea de estado + headers + cuerpo (tal cual, comprimido o no)
+    head = len(f"HTTP/1.1 {response.status} {response.reason}\r\n") + sum(
+        len(name) + len(value) + 4 for name, value in response.getheaders()
+    ) + 2
+    return response, head + len(body)
+
+
+def run(port, pid, path, headers, requests):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        response, _ = fetch(conn, path, headers) # Calienta caché y pool
+        cpu = cpu_seconds(pid)
+        started = time.perf_counter()
+        total = 0
+        for _ in range(requests):
+            response, size = fetch(conn, path, headers)
+            total += size
+        elapsed = time.perf_counter() - started
+        return response.status, total / requests, (cpu_seconds(pid) - cpu) / requests, elapsed / requests
+    finally:
+        conn.close()
+
+
+def etag_of(port, path):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        response, _ = fetch(conn, path, {})
+        return response.getheader("ETag")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bytes y CPU por request con y sin compresión / 304.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--path", action="append", help="Se puede repetir (por defecto /tickets y /services_options)")
+    args = parser.parse_args()
+    if "DATABASE_URL" not in os.environ:
+        sys.exit("Definí DATABASE_URL (una base con `alembic upgrade head` aplicado y datos)")
+    paths = args.path or ["/tickets?limit=200", "/services_options"]
+
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+    )
+    try:
+        wait_until_up(port, started)
+        for path in paths:
+            print(path)
+            modes = dict(MODES)
+            etag = etag_of(port, path)
+            if etag:
+                modes["304 (If-None-Match)"] = {"Accept-Encoding": "br, gzip", "If-None-Match": etag}
+            for label, headers in modes.items():
+                status, size, cpu, latency = run(port, process.pid, path, headers, args.requests)
+                print(f"  {label:22s} {status}  {size:10.0f} B/req  CPU {cpu * 1000:6.2f} ms/req  latencia {latency * 1000:6.2f} ms")
+    finally:
+        stop(process)
@@ -0,0 +1,88 @@
+# backend/benchmarks/bench_serialization.py
+# Compara el camino ORM + Pydantic de /tickets contra el camino rápido (tuplas + orjson).
+# Uso: python benchmarks/bench_serialization.py [1000 10000 100000]
+# Sin DATABASE_URL usa un SQLite temporal; con DATABASE_URL mide contra esa base (¡la llena de datos!).
+import os
+import sys
+import tempfile
+import time
+
+TEMP_DB = "DATABASE_URL" not in os.environ
+if TEMP_DB:
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ.setdefault("AUTH_DEV_RANDOM_SECRET", "1") # Sin tokens: no hace falta una clave real
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from sqlalchemy import insert, func, select
+from database import SessionLocal, engine
+import main
+import models
+
+if TEMP_DB:
+    models.Base.metadata.create_all(bind=engine) # Con una base real, el esquema lo crea Alembic
+
+
+def ensure_tickets(db, n):
+    # Llenamos hasta tener n tickets (en lotes, sin pasar por el ORM)
+    current = db.scalar(select(func.count(models.Ticket.id)))
+    if current >= n:
+        return
+    if not db.scalar(select(func.count(models.ClientService.id))):
+        client = models.Client(name="Cliente Benchmark", phone="123", billing_address="Calle 1")
+        plan = models.Plan(name="Fibra 300 Mega", bandwidth_down=300, bandwidth_up=100)
+        db.add_all([client, plan])
+        db.flush()
+        db.add(models.ClientService(client_id=client.id, plan_id=plan.id, ip_address="10.0.0.1", installation_address="Calle 1"))
+        db.commit()
+    service_id = db.scalar(select(models.ClientService.id).limit(1))
+    batch = []
+    for i in range(current, n):
+        batch.append({
+            "title": f"Ticket {i}", "description": "Sin servicio desde la tormenta", "priority": "medium",
+            "status": "open", "category": "Tecnico", "service_id": service_id,
+        })
+        if len(batch) == 5000:
+            db.execute(insert(models.Ticket), batch)
+            batch = []
+    if batch:
+        db.execute(insert(models.Ticket), batch)
+    db.commit()
+
+
+def orm_path(db, filters):
+    tickets = db.execute(main.tickets_select(filters)).scalars().all()
+    page = main.TicketPage.model_validate(main.tickets_page(tickets, filters.limit), from_attributes=True)
+    return page.model_dump_json().encode()
+
+
+def fast_path(db, filters):
+    return main.tickets_page_json(db.execute(main.tickets_rows_select(filters)).all(), filters.limit).body
+
+
+def timed(fn, n, repeat=3):
+    best = None
+    for _ in range(repeat):
+        db = SessionLocal() # Sesión nueva: sin identity map "caliente"
+        start = time.perf_counter()
+        body = fn(db, main.TicketFilters(limit=n))
+        elapsed = time.perf_counter() - start
+        db.close()
+        best = elapsed if best is None else min(best, elapsed)
+    return best, body
+
+
+def run(sizes):
+    db = SessionLocal()
+    print(f"{'tickets':>8} {'orm+pydantic':>14} {'rápido':>10} {'mejora':>8}")
+    for n in sizes:
+        ensure_tickets(db, n)
+        slow, slow_body = timed(orm_path, n)
+        fast, fast_body = timed(fast_path, n)
+        assert slow_body == fast_body, "Las dos salidas no son idénticas"
+        print(f"{n:>8} {slow * 1000:>12.1f}ms {fast * 1000:>8.1f}ms {slow / fast:>7.1f}x")
+    db.close()
+
+
+if __name__ == "__main__":
+    run([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000])
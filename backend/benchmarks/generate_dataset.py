@@ -0,0 +1,184 @@
+# backend/benchmarks/generate_dataset.py
+# Genera un set de datos sintético y reproducible (misma semilla = mismos datos) a escala producción.
+# Uso: python benchmarks/generate_dataset.py --clients 200000 --seed 42
+# Carga a través de bulk_import (COPY + upsert por external_id), así que correrlo dos veces no duplica.
+import argparse
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from sqlalchemy import func, select
+
+from database import SessionLocal, copy_rows
+from bulk_import import Importer, chunks
+import models
+import partitions
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc) # Fijo: la fecha de hoy no debe cambiar los datos
+
+FIRST_NAMES = ["Juan", "María", "Carlos", "Ana", "Lucas", "Sofía", "Diego", "Valentina", "Martín", "Lucía"]
+LAST_NAMES = ["Pérez", "Gómez", "Rodríguez", "Fernández", "López", "Díaz", "Martínez", "Sosa", "Romero", "Álvarez"]
+STREETS = ["Av. San Martín", "Belgrano", "Rivadavia", "Sarmiento", "Mitre", "Av. Colón", "Urquiza", "Moreno"]
+BUSINESSES = ["Farmacia", "Almacén", "Estancia", "Taller", "Kiosco", "Escuela", "Panadería"]
+PLANS = [("Fibra 100 Mega", 100, 20, 15000), ("Fibra 300 Mega", 300, 100, 22000),
+         ("Fibra 600 Mega", 600, 200, 30000), ("Aire 20 Mega", 20, 5, 8000)]
+PROBLEMS = [("Sin servicio - Luz roja en ONU", "Soporte Técnico"), ("Latencia alta", "Soporte Técnico"),
+            ("Corte de fibra", "Soporte Técnico"), ("Cambio de clave Wifi", "Soporte Técnico"),
+            ("Antena desalineada", "Soporte Técnico"), ("Consulta de factura", "Admin"),
+            ("Cambio de plan", "Ventas"), ("Mudanza de servicio", "Ventas")]
+
+# Distribuciones sesgadas como en la realidad: casi todo está resuelto y casi nada es crítico
+STATUS_WEIGHTS = {"closed": 55, "resolved": 25, "open": 12, "in_progress": 8}
+PRIORITY_WEIGHTS = {"low": 30, "medium": 45, "high": 20, "critical": 5}
+MATERIALS = {"cable_drop_m": (10, 300), "conector_sc_apc": (1, 4), "onu": (0, 1), "roseta": (0, 1), "precinto": (2, 20)}
+SHEET_COLUMNS = ("ticket_id", "author_id", "started_at", "ended_at", "signal_power", "onu_sn", "nap_box_data",
+                 "materials_used", "tech_notes", "photos_url", "created_at", "updated_at")
+
+
+def weighted(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+def gen_clients(rng, n):
+    for i in range(n):
+        if rng.random() < 0.1:
+            name = f"{rng.choice(BUSINESSES)} {rng.choice(LAST_NAMES)} {i}"
+        else:
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}"
+        yield {
+            "external_id": f"GEN-C{i}",
+            "name": name,
+            "billing_address": f"{rng.choice(STREETS)} {rng.randint(1, 5000)}",
+            "phone": f"351-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}",
+            "email": f"cliente{i}@example.com",
+            "cuit": f"20-{rng.randint(10000000, 45000000)}-{rng.randint(0, 9)}",
+        }
+
+def gen_services(rng, n_clients, max_per_client):
+    s = 0
+    for c in range(n_clients):
+        # La mayoría tiene un solo servicio; algunos (comercios, campos) tienen varios
+        for _ in range(1 if rng.random() < 0.85 else rng.randint(2, max_per_client)):
+            yield {
+                "external_id": f"GEN-S{s}",
+                "client_external_id": f"GEN-C{c}",
+                "plan_name": rng.choices(PLANS, weights=[30, 45, 15, 10])[0][0],
+                "ip_address": f"10.{s // 65536 % 256}.{s // 256 % 256}.{s % 256}",
+                "mac_address": ":".join(f"{rng.randint(0, 255):02X}" for _ in range(6)),
+                "installation_address": f"{rng.choice(STREETS)} {rng.randint(1, 5000)}",
+                "geolocation": f"{-31.4 + rng.uniform(-0.3, 0.3):.5f},{-64.18 + rng.uniform(-0.3, 0.3):.5f}",
+            }
+            s += 1
+
+def gen_tickets(rng, n_tickets, n_services, technicians, days):
+    for t in range(n_tickets):
+        status = weighted(rng, STATUS_WEIGHTS)
+        # Lo abierto es reciente; lo cerrado se reparte en todo el historial
+        age = rng.uniform(0, 7 if status in ("open", "in_progress") else days)
+        title, category = rng.choice(PROBLEMS)
+        created = NOW - timedelta(days=age)
+        solved = status in ("resolved", "closed")
+        yield {
+            "external_id": f"GEN-T{t}",
+            "service_external_id": f"GEN-S{rng.randrange(n_services)}",
+            "title": title,
+            "description": "Reclamo generado para pruebas de carga.",
+            "category": category,
+            "status": status,
+            "priority": weighted(rng, PRIORITY_WEIGHTS),
+            "assigned_username": rng.choice(technicians) if status != "open" or rng.random() < 0.5 else None,
+            "creator_username": "admin",
+            "created_at": created.isoformat(),
+            "resolved_at": (created + timedelta(hours=rng.uniform(1, 96))).isoformat() if solved else None,
+        }
+
+def gen_sheets(rng, tickets, ticket_ids, tech_ids):
+    for t in tickets:
+        # Solo lo resuelto tiene planilla de servicio (y no siempre)
+        if t["status"] not in ("resolved", "closed") or rng.random() < 0.4:
+            continue
+        started = datetime.fromisoformat(t["created_at"]) + timedelta(hours=rng.uniform(2, 72))
+        ended = started + timedelta(minutes=rng.randint(20, 180))
+        yield {
+            "ticket_id": ticket_ids[t["external_id"]],
+            "author_id": tech_ids[t["assigned_username"] or rng.choice(list(tech_ids))],
+            "started_at": started,
+            "ended_at": ended,
+            "signal_power": round(rng.gauss(-21, 3), 2),
+            "onu_sn": f"ZTEG{rng.randint(0, 16**8):08X}",
+            "nap_box_data": f"NAP-{rng.randint(1, 400):03d} P{rng.randint(1, 16)}",
+            "materials_used": json.dumps({k: rng.randint(lo, hi) for k, (lo, hi) in MATERIALS.items() if rng.random() < 0.7}),
+            "tech_notes": "Se reemplaza conector y se verifica potencia.",
+            "photos_url": "[]",
+            # La planilla se sube al terminar la visita: cae en el mes de su ticket, no en el de la carga
+            "created_at": ended,
+            "updated_at": ended,
+        }
+
+
+def ensure_users(db, technicians):
+    existing = set(db.scalars(select(models.User.username)))
+    for username, role in [("admin", "admin")] + [(name, "tecnico") for name in technicians]:
+        if username not in existing:
+            db.add(models.User(username=username, role=role, password_hash="xxx"))
+    db.commit()
+    return dict(db.execute(select(models.User.username, models.User.id)).all())
+
+def ensure_plans(db):
+    existing = set(db.scalars(select(models.Plan.name)))
+    db.add_all([models.Plan(name=name, bandwidth_down=down, bandwidth_up=up, price=price)
+                for name, down, up, price in PLANS if name not in existing])
+    db.commit()
+
+
+def generate(clients, tickets_per_client, max_services, technicians, days, seed):
+    rng = random.Random(seed)
+    db = SessionLocal()
+    try:
+        tech_names = [f"tecnico{i}" for i in range(1, technicians + 1)]
+        users = ensure_users(db, tech_names)
+        ensure_plans(db)
+        importer = Importer(db)
+
+        print(f"🌱 Generando dataset (semilla {seed})...")
+        importer.run("clients", gen_clients(rng, clients))
+        services = list(gen_services(rng, clients, max_services))
+        importer.run("services", services)
+
+        n_tickets = int(clients * tickets_per_client)
+        tickets = list(gen_tickets(rng, n_tickets, len(services), tech_names, days))
+        importer.run("tickets", tickets)
+
+        # Las planillas no tienen external_id: para no duplicarlas solo se cargan la primera vez.
+        # Van con COPY, como la importación; lo que sigue costando son los triggers por fila que pasan
+        # la ONU y la caja NAP de cada planilla a su servicio.
+        if db.scalar(select(models.ServiceSheet.id).limit(1)) is None:
+            tech_ids = {name: users[name] for name in tech_names}
+            sheets = list(gen_sheets(rng, tickets, importer.keys["tickets"].ids, tech_ids))
+            if sheets and partitions.is_partitioned(db.connection(), "service_sheets"):
+                db.execute(select(func.create_monthly_partitions(
+                    "service_sheets", min(sheet["created_at"] for sheet in sheets), max(sheet["created_at"] for sheet in sheets)
+                )))
+            for chunk in chunks(sheets, 5000):
+                copy_rows(db, "service_sheets", SHEET_COLUMNS, ([sheet[c] for c in SHEET_COLUMNS] for sheet in chunk))
+                db.commit()
+            print(f"✅ service_sheets: {len(sheets)} filas")
+        else:
+            print("⚠️  Ya hay planillas de servicio cargadas. Saltando service_sheets.")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generador de datos sintéticos para pruebas de carga.")
+    parser.add_argument("--clients", type=int, default=10000)
+    parser.add_argument("--tickets-per-client", type=float, default=5.0)
+    parser.add_argument("--max-services", type=int, default=4, help="Máximo de servicios por cliente")
+    parser.add_argument("--technicians", type=int, default=25)
+    parser.add_argument("--days", type=int, default=3 * 365, help="Antigüedad del historial")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    generate(args.clients, args.tickets_per_client, args.max_services, args.technicians, args.days, args.seed)
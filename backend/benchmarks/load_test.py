@@ -0,0 +1,247 @@
+# backend/benchmarks/load_test.py
+# Prueba de carga contra una API levantada (uvicorn / docker compose).
+# Uso:
+#   python benchmarks/load_test.py --url http://localhost:4001 --concurrency 32 --requests 2000 --out base.json
+#   python benchmarks/load_test.py ... --out nuevo.json --compare base.json
+#   python benchmarks/load_test.py --scenarios batch_create,batch_update --concurrency 1 --requests 20 \
+#       --budget batch_create=1000 --budget batch_update=1000   # lotes de 1000 tickets en menos de 1 s (p95)
+# Mide por escenario latencia p50/p95/p99 y throughput, y guarda el resultado en JSON para comparar commits.
+# Con --budget termina con código 1 si el p95 de un escenario se pasa del límite (para CI).
+import argparse
+import http.client
+import json
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit
+
+
+class Worker:
+    """Un hilo = una conexión keep-alive, como un navegador de la mesa de ayuda."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        conn_cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.conn = conn_cls(parts.hostname, parts.port, timeout=30)
+
+    def request(self, method, path, body=None):
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        start = time.perf_counter()
+        try:
+            self.conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+            response = self.conn.getresponse()
+            response.read()
+            ok = response.status < 400
+        except (OSError, http.client.HTTPException):
+            self.conn.close() # Se reconecta sola en el próximo request
+            ok = False
+        return time.perf_counter() - start, ok
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(url, make_request, total, concurrency):
+    local = threading.local()
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        if not hasattr(local, "worker"):
+            local.worker = Worker(url)
+        method, path, body = make_request(i)
+        elapsed, ok = local.worker.request(method, path, body)
+        with lock:
+            latencies.append(elapsed)
+            errors += 0 if ok else 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    ms = lambda value: round(value * 1000, 2) if value is not None else None
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / wall, 1),
+        "mean_ms": ms(sum(latencies) / len(latencies)),
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1]),
+    }
+
+
+def discover_service_ids(url):
+    # Tomamos servicios reales de la primera página de tickets para el POST
+    worker = Worker(url)
+    worker.conn.request("GET", "/tickets?limit=200")
+    data = json.loads(worker.conn.getresponse().read())
+    items = data["items"] if isinstance(data, dict) else data
+    return sorted({t["service"]["id"] for t in items if t.get("service")})
+
+
+def discover_ticket_ids(url, total=1000):
+    # Los tickets más recientes, paginando con el cursor, para el cambio masivo
+    worker = Worker(url)
+    ids, cursor = [], None
+    while len(ids) < total:
+        worker.conn.request("GET", "/tickets?limit=200" + (f"&cursor={cursor}" if cursor else ""))
+        data = json.loads(worker.conn.getresponse().read())
+        ids.extend(t["id"] for t in data["items"])
+        cursor = data.get("next_cursor")
+        if not cursor:
+            break
+    return ids[:total]
+
+
+def discover_user_ids(url, candidates=range(1, 51)):
+    # La API no lista usuarios: probamos ids con la cola del técnico (404 si el usuario no existe)
+    worker = Worker(url)
+    found = []
+    for user_id in candidates:
+        worker.conn.request("GET", f"/technicians/{user_id}/queue?limit=1")
+        response = worker.conn.getresponse()
+        response.read()
+        if response.status == 200:
+            found.append(user_id)
+    return found
+
+
+SCENARIOS = ("tickets", "tickets_filtered", "services_options", "create_ticket", "batch_create", "batch_update")
+
+
+def build_scenarios(url, seed, service_ids, ticket_ids, user_ids):
+    scenarios = {
+        "tickets": lambda i, rng: ("GET", "/tickets", None),
+        "tickets_filtered": lambda i, rng: ("GET", f"/tickets?status={rng.choice(['open', 'in_progress'])}", None),
+        "services_options": lambda i, rng: ("GET", "/services_options", None),
+        "create_ticket": lambda i, rng: ("POST", "/tickets", {
+            "title": f"Prueba de carga {i}",
+            "description": "Ticket creado por benchmarks/load_test.py",
+            "priority": rng.choice(["low", "medium", "high", "critical"]),
+            "service_id": rng.choice(service_ids),
+        }),
+        # Corte masivo: 1000 tickets en un solo POST /tickets/batch
+        "batch_create": lambda i, rng: ("POST", "/tickets/batch", {"tickets": [{
+            "title": f"Corte masivo {i}-{n}",
+            "description": "Ticket creado por benchmarks/load_test.py",
+            "priority": "high",
+            "service_id": rng.choice(service_ids),
+        } for n in range(1000)]}),
+        # Los mismos 1000 tickets van y vienen entre open e in_progress con otro técnico
+        "batch_update": lambda i, rng: ("PATCH", "/tickets/batch", {
+            "ticket_ids": ticket_ids,
+            "status": "in_progress" if i % 2 == 0 else "open",
+            "assigned_id": None if i % 2 else rng.choice(user_ids),
+        }),
+    }
+    # Un generador por request, sembrado con (seed, escenario, i): el request i es siempre el mismo,
+    # lo arme el hilo que lo arme y en el orden que sea
+    return {
+        name: lambda i, name=name, make=make: make(i, random.Random(f"{seed}:{name}:{i}"))
+        for name, make in scenarios.items()
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_comparison(old, new):
+    print(f"\n{'escenario':<18} {'métrica':<15} {'antes':>10} {'ahora':>10} {'cambio':>8}")
+    for name, stats in new["scenarios"].items():
+        before = old["scenarios"].get(name)
+        if not before:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+            a, b = before[metric], stats[metric]
+            change = f"{(b - a) / a * 100:+.1f}%" if a else "-"
+            print(f"{name:<18} {metric:<15} {a:>10} {b:>10} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API de Emerald ERP.")
+    parser.add_argument("--url", default="http://localhost:4001")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000, help="Requests por escenario")
+    parser.add_argument("--scenarios", default="tickets,tickets_filtered,services_options,create_ticket",
+                        help="Separados por coma; batch_create y batch_update (1000 tickets por request) no corren por defecto")
+    parser.add_argument("--service-id", type=int, action="append", help="Servicio para el POST (se puede repetir)")
+    parser.add_argument("--assigned-id", type=int, action="append", help="Técnico para batch_update (se puede repetir)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="Archivo JSON donde guardar el resultado")
+    parser.add_argument("--compare", help="Resultado JSON anterior contra el cual comparar")
+    parser.add_argument("--budget", action="append", default=[], metavar="ESCENARIO=MS",
+                        help="p95 máximo aceptado para un escenario (se puede repetir)")
+    args = parser.parse_args()
+    budgets = {}
+    for item in args.budget:
+        name, _, limit = item.partition("=")
+        if not limit:
+            parser.error(f"--budget {item}: usar ESCENARIO=MS")
+        budgets[name.strip()] = float(limit)
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"--scenarios: {', '.join(unknown)} no existe (opciones: {', '.join(SCENARIOS)})")
+    creates = {"create_ticket", "batch_create"} & set(names)
+    service_ids = args.service_id or (discover_service_ids(args.url) if creates else [])
+    if creates and not service_ids:
+        parser.error("No hay servicios para crear tickets: pasá --service-id o cargá datos primero")
+    ticket_ids = discover_ticket_ids(args.url) if "batch_update" in names else []
+    if "batch_update" in names and not ticket_ids:
+        parser.error("No hay tickets para el cambio masivo: cargá datos primero")
+    user_ids = args.assigned_id or (discover_user_ids(args.url) if "batch_update" in names else [])
+    if "batch_update" in names and not user_ids:
+        parser.error("No hay usuarios para asignar en el cambio masivo: pasá --assigned-id o cargá datos primero")
+    scenarios = build_scenarios(args.url, args.seed, service_ids, ticket_ids, user_ids)
+
+    result = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "url": args.url,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+        },
+        "scenarios": {},
+    }
+    print(f"{'escenario':<18} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'errores':>8}")
+    for name in names:
+        stats = run_scenario(args.url, scenarios[name], args.requests, args.concurrency)
+        result["scenarios"][name] = stats
+        print(f"{name:<18} {stats['throughput_rps']:>8} {stats['p50_ms']:>6}ms {stats['p95_ms']:>6}ms "
+              f"{stats['p99_ms']:>6}ms {stats['errors']:>8}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), result)
+
+    over = [(name, result["scenarios"][name]["p95_ms"], limit) for name, limit in budgets.items()
+            if name in result["scenarios"] and result["scenarios"][name]["p95_ms"] > limit]
+    for name, p95, limit in over:
+        print(f"FUERA DE PRESUPUESTO: {name} p95 {p95}ms > {limit:g}ms")
+    if over:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# backend/benchmarks/materials_report.py
+# Consumo de materiales de un mes por técnico e ítem: recorriendo el JSON de cada planilla en Python
+# (como había que hacerlo antes) contra GET /reports/materials (totales diarios que mantienen triggers).
+# Uso (desde backend/, con DATABASE_URL apuntando a una base migrada, con planillas y con
+# `python src/materials.py backfill` corrido):
+#   python benchmarks/materials_report.py [--month 2026-09] [--repeat 20]
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from sqlalchemy import select
+
+import materials
+import models
+from database import engine
+
+
+def month_bounds(value):
+    start = datetime.strptime(value, "%Y-%m").date() if value else date.today().replace(day=1)
+    end = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start, end
+
+
+def python_walk(conn, start, end):
+    # Todas las planillas a Python; solo se queda con las del mes
+    S = models.ServiceSheet
+    lower, upper = datetime(start.year, start.month, 1).astimezone(), datetime(end.year, end.month, 1).astimezone()
+    totals = {}
+    for author_id, started_at, created_at, used in conn.execute(select(S.author_id, S.started_at, S.created_at, S.materials_used)):
+        when = started_at or created_at
+        if when is None or not lower <= when < upper or not isinstance(used, dict):
+            continue
+        for item, quantity in used.items():
+            if isinstance(quantity, str):
+                try:
+                    quantity = float(quantity.strip().replace(",", "."))
+                except ValueError:
+                    continue
+            if isinstance(quantity, (int, float)) and quantity > 0:
+                key = (author_id, item.strip().lower())
+                totals[key] = totals.get(key, 0) + quantity
+    return totals
+
+
+def timed(function, repeat):
+    function() # Calienta caché de Postgres y conexión
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - started) / repeat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reporte mensual de materiales: JSON en Python vs SQL.")
+    parser.add_argument("--month", help="YYYY-MM (por defecto el mes actual)")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    start, end = month_bounds(args.month)
+
+    with engine.connect() as conn:
+        walked, walk_seconds = timed(lambda: python_walk(conn, start, end), 1)
+        report, report_seconds = timed(lambda: materials.materials_report(conn, "month", start, end), args.repeat)
+
+    print(f"Mes {start:%Y-%m}: {len(report['rows'])} filas técnico/ítem, {len(report['totals'])} ítems")
+    print(f"  JSON en Python (antes)   {walk_seconds * 1000:9.1f} ms")
+    print(f"  /reports/materials (SQL) {report_seconds * 1000:9.1f} ms")
+    differences = sum(abs(walked.get((row["author_id"], row["item"]), 0) - row["quantity"]) > 1e-6 for row in report["rows"])
+    print(f"  Filas que no coinciden: {differences}")
@@ -0,0 +1,142 @@
+# backend/benchmarks/onu_poller_sim.py
+# Simulador del poller de las OLTs: lee un archivo de equipos, inventa la potencia de cada ONU en
+# cada vuelta y la manda por lotes a POST /telemetry/onu_readings, igual que el poller real.
+# Sirve para probar la ingesta sin OLTs y para medir cuántas lecturas por segundo aguanta.
+#
+# El archivo de equipos es un CSV con encabezado service_id y/o onu_sn (uno por fila); con
+# --export-devices se arma desde la base (servicios con ONU conocida, o todos si ninguno la tiene).
+#
+# Uso (desde backend/, con la API levantada):
+#   python benchmarks/onu_poller_sim.py --export-devices /tmp/devices.csv [--limit 20000]   # necesita DATABASE_URL
+#   python benchmarks/onu_poller_sim.py --devices /tmp/devices.csv --ticks 12 --replay     # 1 hora de lecturas, sin esperar
+#   python benchmarks/onu_poller_sim.py --devices /tmp/devices.csv --interval 300           # tiempo real, cada 5 minutos
+import argparse
+import csv
+import gzip
+import http.client
+import io
+import json
+import os
+import random
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+
+def export_devices(path, limit):
+    from sqlalchemy import text
+    from database import engine
+
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT id, onu_sn FROM client_services WHERE onu_sn IS NOT NULL ORDER BY id LIMIT :limit"
+        ), {"limit": limit}).all()
+        if not rows:
+            rows = conn.execute(text("SELECT id, NULL FROM client_services ORDER BY id LIMIT :limit"), {"limit": limit}).all()
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["service_id", "onu_sn"])
+        writer.writerows(rows)
+    return len(rows)
+
+
+def load_devices(path, by_sn):
+    # (clave, valor) de cada equipo: por serie si se pide y la fila la tiene, si no por service_id
+    with open(path, newline="") as f:
+        devices = []
+        for row in csv.DictReader(f):
+            if by_sn and row.get("onu_sn"):
+                devices.append(("onu_sn", row["onu_sn"]))
+            elif row.get("service_id"):
+                devices.append(("service_id", row["service_id"]))
+    return devices
+
+
+def reading(key, value, at, noise):
+    # Potencia estable por equipo (entre -27 y -17 dBm), con ruido y alguna caída ocasional
+    base = -17 - (zlib.crc32(value.encode()) % 1000) / 100
+    rx = base + noise.gauss(0, 0.3) - (noise.random() < 0.002) * noise.uniform(3, 10)
+    return {key: value, "read_at": at.isoformat(), "rx_dbm": round(rx, 2), "tx_dbm": round(2 + noise.gauss(0, 0.1), 2)}
+
+
+def encode(readings, fmt):
+    if fmt == "ndjson":
+        return "".join(json.dumps(r) + "\n" for r in readings).encode(), "application/x-ndjson"
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=["service_id", "onu_sn", "read_at", "rx_dbm", "tx_dbm"])
+    writer.writeheader()
+    writer.writerows(readings)
+    return buffer.getvalue().encode(), "text/csv"
+
+
+def post(conn, path, body, content_type, compress):
+    headers = {"Content-Type": content_type}
+    if compress:
+        body = gzip.compress(body, 1)
+        headers["Content-Encoding"] = "gzip"
+    conn.request("POST", path, body, headers)
+    response = conn.getresponse()
+    payload = response.read()
+    if response.status != 200:
+        raise SystemExit(f"HTTP {response.status}: {payload[:500]!r}")
+    return json.loads(payload)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulador del poller de ONUs contra POST /telemetry/onu_readings.")
+    parser.add_argument("--devices", help="CSV con service_id y/o onu_sn")
+    parser.add_argument("--export-devices", metavar="PATH", help="Arma el archivo de equipos desde la base y sale")
+    parser.add_argument("--limit", type=int, default=20000, help="Equipos a exportar")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/telemetry/onu_readings")
+    parser.add_argument("--ticks", type=int, default=1, help="Vueltas del poller")
+    parser.add_argument("--interval", type=int, default=300, help="Segundos entre vueltas")
+    parser.add_argument("--replay", action="store_true", help="Fechas hacia atrás y sin esperar entre vueltas")
+    parser.add_argument("--batch", type=int, default=5000, help="Lecturas por request")
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    parser.add_argument("--by-sn", action="store_true", help="Identificar por onu_sn en vez de service_id")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.export_devices:
+        print(f"{export_devices(args.export_devices, args.limit)} equipos en {args.export_devices}")
+        raise SystemExit
+    if not args.devices:
+        parser.error("falta --devices (o --export-devices)")
+
+    devices = load_devices(args.devices, args.by_sn)
+    url = urlsplit(args.url)
+    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=120)
+    noise = random.Random(args.seed)
+    totals = {"received": 0, "inserted": 0, "duplicates": 0, "unknown": 0, "rejected": 0}
+    latencies = []
+
+    now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    started = time.perf_counter()
+    for tick in range(args.ticks):
+        if args.replay:
+            at = now - timedelta(seconds=args.interval * (args.ticks - 1 - tick))
+        else:
+            if tick:
+                time.sleep(args.interval)
+            at = datetime.now(timezone.utc).replace(microsecond=0)
+        readings = [reading(key, value, at, noise) for key, value in devices]
+        for i in range(0, len(readings), args.batch):
+            body, content_type = encode(readings[i:i + args.batch], args.format)
+            sent = time.perf_counter()
+            result = post(conn, url.path, body, content_type, args.gzip)
+            latencies.append(time.perf_counter() - sent)
+            for key in totals:
+                totals[key] += result[key]
+        print(f"vuelta {tick + 1}/{args.ticks} ({at:%Y-%m-%d %H:%M}): {len(readings)} lecturas")
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(", ".join(f"{key} {value}" for key, value in totals.items()))
+    print(f"{totals['received'] / elapsed:,.0f} lecturas/s ({elapsed:.1f} s en total)")
+    print(f"por request de {args.batch}: p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, "
+          f"máx {latencies[-1] * 1000:.0f} ms")
@@ -0,0 +1,146 @@
+# backend/benchmarks/startup.py
+# Tiempos de arranque de la API: lo que tarda un worker en estar listo y en responder el primer request.
+# Uso (desde backend/, con DATABASE_URL apuntando a una base ya migrada):
+#   python benchmarks/startup.py [--workers 4] [--runs 3]
+#
+# Mide, con la mediana de varias corridas:
+#   - import de la app en un intérprete nuevo (lo que paga cada worker sin --preload)
+#   - uvicorn con un proceso: arranque hasta el primer 200 de /health, y el primer GET /tickets
+#     contra los siguientes (el primero paga conexiones y compilación de consultas si no hay warm-up)
+#   - gunicorn con N workers, con y sin preload: cuándo queda listo cada worker desde el arranque
+import argparse
+import http.client
+import multiprocessing
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+# Las APIs que levantan estos benchmarks no emiten tokens: alcanza con la clave al azar de desarrollo
+os.environ.setdefault("AUTH_DEV_RANDOM_SECRET", "1")
+READY = re.compile(r"\[(\d+)\] \[INFO\] Application startup complete")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get(port, path, timeout=30):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    try:
+        start = time.perf_counter()
+        conn.request("GET", path)
+        response = conn.getresponse()
+        response.read()
+        return response.status, time.perf_counter() - start
+    finally:
+        conn.close()
+
+
+def wait_until_up(port, started, timeout=60):
+    # Primer 200 de /health, en segundos desde que se lanzó el proceso
+    while time.perf_counter() - started < timeout:
+        try:
+            status, _ = get(port, "/health", timeout=1)
+            if status == 200:
+                return time.perf_counter() - started
+        except OSError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError("La API no respondió a tiempo")
+
+
+def stop(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def measure_import():
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import sys; sys.path.insert(0, 'src'); import main"],
+                   cwd=BACKEND_DIR, check=True, capture_output=True)
+    return time.perf_counter() - started
+
+
+def measure_uvicorn():
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+    )
+    try:
+        up = wait_until_up(port, started)
+        _, first = get(port, "/tickets?limit=50")
+        warm = statistics.median(get(port, "/tickets?limit=50")[1] for _ in range(20))
+        return up, first, warm
+    finally:
+        stop(process)
+
+
+def measure_gunicorn(workers, preload):
+    port = free_port()
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), GUNICORN_PRELOAD="1" if preload else "0")
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "src.main:app", "--bind", f"127.0.0.1:{port}"],
+        cwd=BACKEND_DIR, env=env, stderr=subprocess.PIPE, text=True,
+    )
+    ready = {} # pid del worker -> segundos hasta "Application startup complete"
+    all_ready = threading.Event()
+
+    def read_log():
+        for line in process.stderr:
+            match = READY.search(line)
+            if match:
+                ready.setdefault(match.group(1), time.perf_counter() - started)
+                if len(ready) >= workers:
+                    all_ready.set()
+
+    threading.Thread(target=read_log, daemon=True).start()
+    try:
+        up = wait_until_up(port, started)
+        if not all_ready.wait(60):
+            raise RuntimeError(f"Solo {len(ready)} de {workers} workers arrancaron")
+        return up, sorted(ready.values())
+    finally:
+        stop(process)
+
+
+def ms(seconds):
+    return f"{seconds * 1000:8.0f} ms"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tiempos de arranque de la API.")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    if "DATABASE_URL" not in os.environ:
+        sys.exit("Definí DATABASE_URL (una base con `alembic upgrade head` aplicado)")
+
+    imports = [measure_import() for _ in range(args.runs)]
+    print(f"Import de la app (intérprete nuevo):     {ms(statistics.median(imports))}")
+
+    runs = [measure_uvicorn() for _ in range(args.runs)]
+    print(f"uvicorn, 1 proceso: primer 200 /health   {ms(statistics.median(r[0] for r in runs))}")
+    print(f"  primer GET /tickets                    {ms(statistics.median(r[1] for r in runs))}")
+    print(f"  GET /tickets ya caliente (mediana)     {ms(statistics.median(r[2] for r in runs))}")
+
+    for preload in (True, False):
+        runs = [measure_gunicorn(args.workers, preload) for _ in range(args.runs)]
+        label = "con preload" if preload else "sin preload"
+        print(f"gunicorn, {args.workers} workers {label}:")
+        print(f"  primer 200 /health                     {ms(statistics.median(r[0] for r in runs))}")
+        for index in range(args.workers):
+            print(f"  worker {index + 1} listo                         {ms(statistics.median(r[1][index] for r in runs))}")
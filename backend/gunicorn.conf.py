@@ -0,0 +1,41 @@
+# backend/gunicorn.conf.py
+# Perfil de producción: gunicorn administra varios workers de uvicorn (uno por núcleo).
+# Uso: gunicorn src.main:app   (lee este archivo solo si se corre desde backend/)
+#
+# Cada worker tiene su propio pool de conexiones: con N workers la base ve hasta
+# N * (DB_POOL_SIZE + DB_MAX_OVERFLOW) conexiones. Ajustar contra max_connections de Postgres.
+import multiprocessing
+import os
+import sys
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY") or multiprocessing.cpu_count())
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# La app se importa una sola vez en el master y los workers la heredan al hacer fork:
+# arrancan más rápido y comparten la memoria de los módulos. Importar no toca la base.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1").lower() in ("1", "true", "yes", "on")
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = 30 # Los streams SSE se cortan al reiniciar; los clientes reconectan solos
+keepalive = 5
+
+# Reciclamos cada worker de vez en cuando (con jitter, para que no se reinicien todos juntos)
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") # Sin definir: sin log de accesos (ya está /metrics)
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    # Con preload_app el engine se creó en el master: que ningún worker use conexiones del pool heredado
+    database = sys.modules.get("database")
+    if database is not None:
+        database.engine.dispose(close=False)
+        if database.async_engine is not None:
+            database.async_engine.sync_engine.dispose(close=False)
+    replicas = sys.modules.get("replicas")
+    if replicas is not None:
+        for replica in replicas.router.replicas:
+            replica.engine.dispose(close=False)
@@ -0,0 +1,316 @@
+# backend/src/auth.py
+# Login y autenticación por token para la API.
+#
+#   POST /auth/login {"username", "password"} -> {"access_token", "expires_at", "user"}
+#   Después: Authorization: Bearer <token> en cada request.
+#
+# - El bcrypt del login (~100 ms de CPU por intento) corre en un pool de procesos acotado
+#   (AUTH_HASH_WORKERS): no frena el event loop ni ocupa el threadpool de Starlette. Si ya hay
+#   AUTH_HASH_QUEUE logins esperando, el siguiente recibe 503 en vez de encolarse sin fin.
+# - El token va firmado con HMAC-SHA256 (AUTH_SECRET, el mismo en todos los workers) y lleva solo
+#   el id del usuario y el vencimiento. Validarlo es calcular una firma: no toca la base.
+# - Usuario y rol salen de una caché LRU en memoria (AUTH_USER_CACHE_TTL segundos); la tabla users
+#   se consulta solo cuando falta el usuario en la caché. Un cambio en users hecho con una sesión
+#   de SQLAlchemy lo saca de la caché de este worker al confirmarse; los demás lo ven al vencer el TTL.
+#
+# Con AUTH_REQUIRED=0 (por defecto, mientras el frontend no tenga login) los requests sin token
+# siguen funcionando como antes; un token inválido o vencido da 401 igual.
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import multiprocessing
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import chain
+from typing import NamedTuple, Optional
+
+import anyio.to_thread
+import orjson
+from fastapi import HTTPException, Request
+from passlib.context import CryptContext
+from passlib.exc import UnknownHashError
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal, _env_bool
+
+AUTH_REQUIRED = _env_bool("AUTH_REQUIRED", False)
+AUTH_TOKEN_TTL = int(os.getenv("AUTH_TOKEN_TTL", str(12 * 3600))) # Segundos (un turno)
+AUTH_HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", "2"))
+AUTH_HASH_QUEUE = int(os.getenv("AUTH_HASH_QUEUE", str(AUTH_HASH_WORKERS * 8)))
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "60"))
+AUTH_USER_CACHE_MAX = int(os.getenv("AUTH_USER_CACHE_MAX", "10000"))
+
+# Sin token: lo que usan el balanceador, Prometheus y el propio login
+PUBLIC_PATHS = {"/auth/login", "/health", "/metrics"}
+
+log = logging.getLogger("emerald.auth")
+
+# Con la clave cualquiera puede firmar un token de cualquier usuario: sin una clave propia la API no
+# arranca. Generarla con: python -c "import secrets; print(secrets.token_urlsafe(32))"
+AUTH_SECRET_MIN_LENGTH = 32
+PLACEHOLDER_SECRETS = {"cambiar-en-produccion", "changeme", "secret"}
+# Solo desarrollo, y pedido a mano: clave al azar de este proceso (los tokens no valen en otros
+# workers ni después de reiniciar)
+AUTH_DEV_RANDOM_SECRET = _env_bool("AUTH_DEV_RANDOM_SECRET", False)
+
+def load_secret():
+    secret = os.getenv("AUTH_SECRET", "")
+    if not secret and AUTH_DEV_RANDOM_SECRET:
+        log.warning("AUTH_SECRET sin definir: se usa una clave al azar de este proceso (AUTH_DEV_RANDOM_SECRET=1)")
+        return secrets.token_bytes(32)
+    if not secret:
+        raise RuntimeError("Falta AUTH_SECRET (o AUTH_DEV_RANDOM_SECRET=1 para desarrollo)")
+    if secret.lower() in PLACEHOLDER_SECRETS or len(secret) < AUTH_SECRET_MIN_LENGTH:
+        raise RuntimeError(f"AUTH_SECRET inválida: usar una clave propia de al menos {AUTH_SECRET_MIN_LENGTH} caracteres")
+    return secret.encode()
+
+AUTH_SECRET = load_secret()
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto") # Igual que mock-seed.py
+# Para un usuario inexistente también se verifica un hash: mismo tiempo de respuesta que una
+# contraseña equivocada, así el login no revela qué usuarios existen
+DUMMY_HASH = "$2b$12$FJhjWs18HtmTbfrbMbgYHufEJxpt6bNtRXXNgma0m4RLNtop7olbi"
+
+
+class CurrentUser(NamedTuple):
+    id: int
+    username: str
+    role: Optional[str]
+    is_active: bool
+
+
+# --- TOKENS ---
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(AUTH_SECRET, payload.encode(), hashlib.sha256).digest())
+
+def issue_token(user_id: int, now=None):
+    # -> (token, vencimiento en epoch)
+    expires_at = int(now if now is not None else time.time()) + AUTH_TOKEN_TTL
+    payload = _b64encode(orjson.dumps({"sub": user_id, "exp": expires_at}))
+    return f"{payload}.{_sign(payload)}", expires_at
+
+def verify_token(token: str, now=None):
+    # Id del usuario, o None si el token está mal formado, la firma no coincide o ya venció
+    payload, _, signature = token.partition(".")
+    if not signature or not hmac.compare_digest(signature, _sign(payload)):
+        return None
+    try:
+        claims = orjson.loads(_b64decode(payload))
+        user_id, expires_at = int(claims["sub"]), claims["exp"]
+    except (ValueError, TypeError, KeyError):
+        return None
+    return user_id if expires_at > (now if now is not None else time.time()) else None
+
+
+# --- CACHÉ DE USUARIOS ---
+class UserCache:
+    """Usuarios por id en memoria del proceso, con TTL y desalojo LRU (como MemoryCache en cache.py)."""
+
+    def __init__(self, ttl=AUTH_USER_CACHE_TTL, max_entries=AUTH_USER_CACHE_MAX):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = OrderedDict() # id -> (vence, CurrentUser)
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is None:
+                return None
+            expires, user = entry
+            if expires < time.monotonic():
+                del self._data[user_id]
+                return None
+            self._data.move_to_end(user_id)
+            return user
+
+    def set(self, user):
+        with self._lock:
+            self._data[user.id] = (time.monotonic() + self.ttl, user)
+            self._data.move_to_end(user.id)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return user
+
+    def delete(self, *user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._data.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+user_cache = UserCache()
+
+USER_SQL = text("SELECT id, username, role, COALESCE(is_active, true) AS is_active FROM users WHERE id = :id")
+LOGIN_SQL = text("""
+SELECT id, username, role, COALESCE(is_active, true) AS is_active, password_hash FROM users WHERE username = :username
+""")
+
+def load_user(user_id):
+    with SessionLocal() as db:
+        row = db.execute(USER_SQL, {"id": user_id}).one_or_none()
+    return user_cache.set(CurrentUser(*row)) if row is not None else None
+
+
+# Igual que la caché de respuestas: juntamos los usuarios tocados en el flush y los sacamos al commit
+@event.listens_for(Session, "after_flush")
+def _collect_flushed_users(session, flush_context):
+    touched = {obj.id for obj in chain(session.new, session.dirty, session.deleted) if isinstance(obj, models.User)}
+    user_ids = session.info.setdefault("auth_users", set())
+    if touched and user_ids is not None: # None: ya se vacía toda la caché
+        user_ids.update(touched)
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_users(orm_execute_state):
+    # UPDATE/DELETE masivos sobre users: no sabemos cuáles, se vacía toda la caché
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.local_table.name == "users":
+            orm_execute_state.session.info["auth_users"] = None
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_users_on_commit(session):
+    if "auth_users" in session.info:
+        user_ids = session.info.pop("auth_users")
+        if user_ids is None:
+            user_cache.clear()
+        else:
+            user_cache.delete(*user_ids)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_users_on_rollback(session):
+    session.info.pop("auth_users", None)
+
+
+# --- VALIDACIÓN POR REQUEST ---
+def _unauthorized(detail):
+    return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+def request_token(request: Request):
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        return token.strip()
+    if request.url.path == "/tickets/stream":
+        return request.query_params.get("access_token") # EventSource no puede mandar encabezados
+    return None
+
+async def authenticate(request: Request) -> Optional[CurrentUser]:
+    """Dependencia de toda la app: el usuario del token, o None si no vino (y no es obligatorio).
+
+    Async a propósito: con el usuario en caché no hay nada que bloquee, y así no ocupa un thread
+    del threadpool en cada request.
+    """
+    if request.url.path in PUBLIC_PATHS:
+        return None
+    token = request_token(request)
+    if token is None:
+        if AUTH_REQUIRED:
+            raise _unauthorized("Falta el token (Authorization: Bearer ...)")
+        return None
+    user_id = verify_token(token)
+    if user_id is None:
+        raise _unauthorized("Token inválido o vencido")
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await anyio.to_thread.run_sync(load_user, user_id)
+    if user is None or not user.is_active:
+        raise _unauthorized("Usuario inexistente o deshabilitado")
+    return user
+
+
+# --- LOGIN ---
+def verify_password(password: str, password_hash: Optional[str]) -> bool:
+    # Corre en los procesos del pool: solo CPU, sin base
+    try:
+        return pwd_context.verify(password, password_hash or DUMMY_HASH)
+    except (UnknownHashError, ValueError):
+        return False # Hash vacío o de otro formato (ej. usuarios de populate.py): no entra
+
+
+def _noop():
+    return None
+
+
+class HashPool:
+    """Pool de procesos para bcrypt, uno por worker de la API y con cola acotada."""
+
+    def __init__(self, workers=AUTH_HASH_WORKERS, max_pending=AUTH_HASH_QUEUE):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0 # Solo se toca desde el event loop
+        self._executor = None
+        self._pid = None
+
+    def executor(self):
+        # spawn y no fork: el worker ya tiene threads (pool de conexiones, réplicas) al crear el pool
+        if self._pid != os.getpid():
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            self._pid = os.getpid()
+        return self._executor
+
+    def start(self):
+        # Levanta los procesos antes del primer login (lifespan de la app)
+        for _ in range(self.workers):
+            self.executor().submit(_noop)
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = self._pid = None
+
+    async def verify(self, password, password_hash):
+        if self.pending >= self.max_pending:
+            raise HTTPException(status_code=503, detail="Demasiados logins a la vez, reintentar", headers={"Retry-After": "1"})
+        self.pending += 1
+        try:
+            future = self.executor().submit(verify_password, password, password_hash)
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            log.exception("Se cayó el pool de bcrypt; se recrea en el próximo login")
+            self.shutdown()
+            raise HTTPException(status_code=503, detail="Login no disponible, reintentar", headers={"Retry-After": "1"})
+        finally:
+            self.pending -= 1
+
+hash_pool = HashPool()
+
+
+def _find_login_user(username):
+    with SessionLocal() as db:
+        return db.execute(LOGIN_SQL, {"username": username}).one_or_none()
+
+def _touch_last_login(user_id):
+    # SQL directo: un UPDATE del ORM sobre users vaciaría toda la caché de usuarios
+    with SessionLocal() as db:
+        db.execute(text("UPDATE users SET last_login = now() WHERE id = :id"), {"id": user_id})
+        db.commit()
+
+async def login(username: str, password: str):
+    # -> (token, vencimiento, CurrentUser). Las consultas cortas van a un thread; el bcrypt, al pool
+    row = await anyio.to_thread.run_sync(_find_login_user, username)
+    ok = await hash_pool.verify(password, row.password_hash if row is not None else None)
+    if row is None or not ok:
+        raise _unauthorized("Usuario o contraseña incorrectos")
+    if not row.is_active:
+        raise HTTPException(status_code=403, detail="Usuario deshabilitado")
+    await anyio.to_thread.run_sync(_touch_last_login, row.id)
+    user = user_cache.set(CurrentUser(row.id, row.username, row.role, row.is_active)) # El primer request ya no va a la base
+    token, expires_at = issue_token(user.id)
+    return token, expires_at, user
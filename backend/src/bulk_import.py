@@ -0,0 +1,288 @@
+# backend/src/bulk_import.py
+# Importación masiva desde el sistema anterior (CSV o JSON Lines).
+#
+# Uso:
+#   python src/bulk_import.py clients clientes.csv services servicios.jsonl tickets tickets.csv
+#
+# Se procesan en el orden indicado y en lotes: cada lote entra por COPY a una tabla temporal y de
+# ahí, con un único INSERT ... ON CONFLICT (external_id) DO UPDATE ... RETURNING id, external_id,
+# a la tabla real. Lo que devuelve RETURNING alimenta el mapa external_id -> id que usan los lotes
+# siguientes para resolver claves foráneas (cliente del servicio, servicio del ticket) sin consultar
+# fila por fila. Reimportar el mismo archivo no duplica nada.
+#
+# Un servicio cuyo cliente no existe (ni en la base ni en lo importado antes), o un ticket sin su
+# servicio, se descarta: no se importan huérfanos. El resumen de cada tipo dice cuántos fueron y
+# por stderr salen los primeros external_id, para corregir el archivo y volver a importarlo.
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from itertools import islice
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import select, update, exists, func, text, table, column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from database import SessionLocal, copy_rows
+import models
+import partitions
+
+CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+INSERT_ONLY = {"external_id", "created_at"} # Al reimportar no se pisan
+# Tablas particionadas: external_id no puede ser UNIQUE (toda clave única debe incluir created_at),
+# así que no sirve ON CONFLICT y se hace UPDATE de lo existente + INSERT de lo nuevo
+NO_UNIQUE_EXTERNAL_ID = {"tickets"}
+# Columnas que tiene que traer cada archivo; se revisan antes de importar nada
+REQUIRED_COLUMNS = {
+    "clients": ("external_id",),
+    "services": ("external_id", "client_external_id"),
+    "tickets": ("external_id", "service_external_id"),
+}
+# Clave foránea que tiene que resolverse para importar la fila (la que se descarta si no)
+PARENTS = {"services": ("client_id", "cliente"), "tickets": ("service_id", "servicio")}
+MAX_REPORTED = 10 # external_id de descartadas que se muestran por tipo
+
+
+# --- LECTURA EN STREAMING ---
+def read_rows(path):
+    # Nunca cargamos el archivo entero: devolvemos fila por fila
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            for row in csv.DictReader(f):
+                yield {key: (value if value != "" else None) for key, value in row.items()}
+
+def read_columns(path):
+    # Encabezado del CSV, o las claves de la primera línea del JSON Lines
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            first = next((line for line in f if line.strip()), None)
+            return list(json.loads(first)) if first else []
+        return next(csv.reader(f), [])
+
+def chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# --- RESOLUCIÓN DE CLAVES FORÁNEAS ---
+def external_key(row, name):
+    # external_id de la fila padre como texto (en JSON Lines puede venir como número); None si no vino
+    value = row.get(name)
+    return None if value in (None, "") else str(value)
+
+
+class KeyMap:
+    """external_id -> id de una tabla, cargado desde RETURNING o con un SELECT ... IN por lote."""
+
+    def __init__(self, model):
+        self.model = model
+        self.ids = {}
+
+    def remember(self, pairs):
+        for row_id, external_id in pairs:
+            self.ids[external_id] = row_id
+
+    def resolve(self, db, external_ids):
+        missing = {key for key in external_ids if key is not None and key not in self.ids}
+        if missing:
+            self.remember(db.execute(
+                select(self.model.id, self.model.external_id).where(self.model.external_id.in_(missing))
+            ).all())
+        return self.ids
+
+
+class Importer:
+    def __init__(self, db, chunk_size=CHUNK_SIZE):
+        self.db = db
+        self.chunk_size = chunk_size
+        self.keys = {
+            "clients": KeyMap(models.Client),
+            "services": KeyMap(models.ClientService),
+            "tickets": KeyMap(models.Ticket),
+        }
+        # Planes y usuarios son pocos: los cargamos enteros por nombre
+        self.plans = dict(db.execute(select(models.Plan.name, models.Plan.id)).all())
+        self.users = dict(db.execute(select(models.User.username, models.User.id)).all())
+        self.partitioned = {} # tabla -> si está particionada por mes (se consulta una vez)
+
+    # --- Conversión de cada fila al formato de la tabla ---
+    def client_values(self, rows):
+        return [{
+            "external_id": str(r["external_id"]),
+            "name": r.get("name"),
+            "billing_address": r.get("billing_address"),
+            "phone": r.get("phone"),
+            "email": r.get("email"),
+            "cuit": r.get("cuit"),
+        } for r in rows]
+
+    def service_values(self, rows):
+        clients = self.keys["clients"].resolve(self.db, {external_key(r, "client_external_id") for r in rows})
+        self.ensure_plans({r.get("plan_name") for r in rows})
+        return [{
+            "external_id": str(r["external_id"]),
+            "client_id": clients.get(external_key(r, "client_external_id")),
+            "plan_id": self.plans.get(r.get("plan_name")),
+            "ip_address": r.get("ip_address"),
+            "mac_address": r.get("mac_address"),
+            "installation_address": r.get("installation_address"),
+            "geolocation": r.get("geolocation"),
+            "site_contact_name": r.get("site_contact_name"),
+            "site_contact_phone": r.get("site_contact_phone"),
+        } for r in rows]
+
+    def ticket_values(self, rows):
+        services = self.keys["services"].resolve(self.db, {external_key(r, "service_external_id") for r in rows})
+        return [{
+            "external_id": str(r["external_id"]),
+            "service_id": services.get(external_key(r, "service_external_id")),
+            "creator_id": self.users.get(r.get("creator_username")),
+            "assigned_id": self.users.get(r.get("assigned_username")),
+            "category": r.get("category"),
+            "status": r.get("status") or "open",
+            "priority": r.get("priority") or "medium",
+            "title": r.get("title"),
+            "description": r.get("description"),
+            "public_note": r.get("public_note"),
+            "created_at": r.get("created_at") or datetime.now(timezone.utc), # Texto ISO: lo interpreta Postgres en el COPY
+            "resolved_at": r.get("resolved_at"), # Si viene vacío y está resuelto, lo completa el trigger
+        } for r in rows]
+
+    def ensure_plans(self, names):
+        missing = [name for name in names if name and name not in self.plans]
+        if missing:
+            stmt = pg_insert(models.Plan).values([{"name": name} for name in missing])
+            self.plans.update({name: plan_id for plan_id, name in self.db.execute(
+                stmt.returning(models.Plan.id, models.Plan.name)
+            ).all()})
+
+    # --- Upsert por lotes ---
+    def upsert(self, model, values):
+        # 1. COPY del lote a una tabla temporal (mucho más rápido que mandar parámetros)
+        # 2. Un único INSERT ... SELECT ... ON CONFLICT DO UPDATE ... RETURNING hacia la tabla real
+        columns = list(values[0])
+        staging = self.staging_table(model.__table__.name, columns)
+        self.copy_rows(staging.name, columns, values)
+        if model.__table__.name in NO_UNIQUE_EXTERNAL_ID:
+            return self.update_then_insert(model.__table__, staging, columns)
+
+        stmt = pg_insert(model.__table__).from_select(columns, select(*staging.c))
+        updatable = {key: stmt.excluded[key] for key in columns if key not in INSERT_ONLY}
+        if "updated_at" in model.__table__.c: # ON CONFLICT no aplica el onupdate de la columna
+            updatable["updated_at"] = func.now()
+        stmt = stmt.on_conflict_do_update(index_elements=["external_id"], set_=updatable)
+        return self.db.execute(stmt.returning(model.id, model.external_id)).all()
+
+    def update_then_insert(self, target, staging, columns):
+        # Mismo resultado que el upsert (el importador es el único que escribe external_id en lote)
+        self.ensure_partitions(target, staging)
+        same = target.c.external_id == staging.c.external_id
+        updated = self.db.execute(
+            update(target).where(same)
+            .values({key: staging.c[key] for key in columns if key not in INSERT_ONLY})
+            .returning(target.c.id, target.c.external_id)
+        ).all()
+        inserted = self.db.execute(
+            pg_insert(target).from_select(columns, select(*staging.c).where(~exists().where(same)))
+            .returning(target.c.id, target.c.external_id)
+        ).all()
+        return updated + inserted
+
+    def ensure_partitions(self, target, staging):
+        # Cargas históricas: crea los meses del lote que todavía no tienen partición
+        if target.name not in self.partitioned:
+            self.partitioned[target.name] = partitions.is_partitioned(self.db.connection(), target.name)
+        if self.partitioned[target.name]:
+            self.db.execute(select(func.create_monthly_partitions(
+                target.name, func.min(staging.c.created_at), func.max(staging.c.created_at)
+            )))
+
+    def staging_table(self, table_name, columns):
+        name = f"import_{table_name}"
+        # Solo las columnas que cargamos, sin restricciones; se vacía sola en cada commit
+        self.db.execute(text(
+            f"CREATE TEMP TABLE IF NOT EXISTS {name} ON COMMIT DELETE ROWS "
+            f"AS SELECT {', '.join(columns)} FROM {table_name} WITH NO DATA"
+        ))
+        return table(name, *[column(c) for c in columns])
+
+    def copy_rows(self, table_name, columns, values):
+        copy_rows(self.db, table_name, columns, ([v[c] for c in columns] for v in values))
+
+    def run(self, kind, rows):
+        model, to_values = {
+            "clients": (models.Client, self.client_values),
+            "services": (models.ClientService, self.service_values),
+            "tickets": (models.Ticket, self.ticket_values),
+        }[kind]
+
+        parent, parent_name = PARENTS.get(kind, (None, None))
+        total, skipped, orphans = 0, 0, []
+        start = time.perf_counter()
+        for chunk in chunks(rows, self.chunk_size):
+            valid = [r for r in chunk if r.get("external_id") not in (None, "")]
+            # Un mismo external_id repetido dentro del lote rompe ON CONFLICT: gana el último
+            values = list({v["external_id"]: v for v in to_values(valid)}.values()) if valid else []
+            if parent:
+                orphans += [v["external_id"] for v in values if v[parent] is None]
+                values = [v for v in values if v[parent] is not None]
+            skipped += len(chunk) - len(values)
+            if values:
+                self.keys[kind].remember(self.upsert(model, values))
+            self.db.commit()
+
+            total += len(chunk)
+            elapsed = time.perf_counter() - start
+            print(f"   {kind}: {total} filas ({total / elapsed:,.0f} filas/s)", file=sys.stderr)
+
+        elapsed = time.perf_counter() - start
+        print(f"✅ {kind}: {total} filas en {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} filas/s)"
+              + (f", {skipped} descartadas" if skipped else "")
+              + (f" ({len(orphans)} sin {parent_name})" if orphans else ""))
+        if orphans:
+            print(f"   {kind} sin {parent_name}: {', '.join(orphans[:MAX_REPORTED])}"
+                  + (" ..." if len(orphans) > MAX_REPORTED else ""), file=sys.stderr)
+        return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importación masiva de clientes, servicios y tickets.")
+    parser.add_argument("items", nargs="+", metavar="TIPO ARCHIVO",
+                        help="Pares tipo/archivo; tipo = clients | services | tickets")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    if len(args.items) % 2:
+        parser.error("Los argumentos van de a pares: TIPO ARCHIVO")
+    pairs = list(zip(args.items[::2], args.items[1::2]))
+    for kind, _ in pairs:
+        if kind not in REQUIRED_COLUMNS:
+            parser.error(f"Tipo desconocido: {kind}")
+    for kind, path in pairs:
+        missing = [name for name in REQUIRED_COLUMNS[kind] if name not in read_columns(path)]
+        if missing:
+            parser.error(f"{path}: faltan las columnas {', '.join(missing)} ({kind})")
+
+    db = SessionLocal()
+    try:
+        importer = Importer(db, chunk_size=args.chunk_size)
+        for kind, path in pairs:
+            importer.run(kind, read_rows(path))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
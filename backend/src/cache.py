@@ -0,0 +1,184 @@
+# backend/src/cache.py
+# Caché de respuestas de lectura que cambian poco (combo de servicios, catálogo de planes).
+# Las claves llevan la versión del catálogo (data_versions, ver catalog_key): cualquier escritura en
+# las tablas relacionadas, desde cualquier worker o desde el CLI, hace que la próxima lectura no acierte.
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+from sqlalchemy import text
+
+from compression import COMPRESSION_MIN_SIZE, choose_encoding, precompressed
+
+CACHE_TTL = int(os.getenv("CACHE_TTL", "300")) # Segundos
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "128"))
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL") # Si está definida, la caché se comparte entre workers
+SERVICE_CACHE_MAX_ENTRIES = int(os.getenv("SERVICE_CACHE_MAX_ENTRIES", "10000"))
+
+# Versión del catálogo: la suben triggers por sentencia en clients, client_services y plans
+# (migración f8d3b6a2c957), en la misma transacción que el cambio
+CATALOG_VERSION_SQL = text("SELECT coalesce(sum(version), 0) FROM data_versions WHERE name = 'catalog'")
+
+
+# Los ETag son débiles (W/): identifican los datos, no los bytes, así valen igual para la versión
+# con gzip, con brotli o sin comprimir (ver compression.py)
+def make_etag(body: bytes) -> str:
+    return 'W/"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def data_version(name: str, count: int, stamps):
+    """(ETag, Last-Modified) del listado `name` sin leer ni hashear el cuerpo.
+
+    Sale de cuántas filas hay y del updated_at más reciente: un alta suma una fila, una edición
+    mueve updated_at. Mismos datos, mismo ETag en todos los workers.
+    """
+    last_modified = max((stamp for stamp in stamps if stamp is not None), default=None)
+    micros = 0 if last_modified is None else int(last_modified.timestamp() * 1_000_000)
+    return f'W/"{name}-{count:x}-{micros:x}"', last_modified
+
+
+class MemoryCache:
+    """Caché en memoria del proceso con TTL y desalojo LRU."""
+
+    def __init__(self, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = OrderedDict() # clave -> (vence, etag, body, last_modified)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, etag, body, last_modified = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key) # Recién usada
+            return etag, body, last_modified
+
+    def set(self, key, body: bytes, etag=None, last_modified=None):
+        # Sin etag explícito (versión de los datos) se usa el hash del cuerpo
+        etag = etag or make_etag(body)
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, etag, body, last_modified)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False) # Sacamos la menos usada
+        return etag, body, last_modified
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisCache:
+    """Misma interfaz, sobre cualquier cliente compatible con Redis (get / set con ex / delete).
+
+    En tests se le puede pasar un cliente falso en memoria en lugar de redis.Redis.
+    """
+
+    def __init__(self, client, ttl=CACHE_TTL, prefix="emerald:cache:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        etag, _, rest = raw.partition(b"\n")
+        last_modified, _, body = rest.partition(b"\n")
+        return etag.decode(), body, datetime.fromisoformat(last_modified.decode()) if last_modified else None
+
+    def set(self, key, body: bytes, etag=None, last_modified=None):
+        etag = etag or make_etag(body)
+        stamp = last_modified.isoformat().encode() if last_modified else b""
+        self.client.set(self.prefix + key, etag.encode() + b"\n" + stamp + b"\n" + body, ex=self.ttl)
+        return etag, body, last_modified
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+def build_cache(prefix="emerald:cache:", max_entries=CACHE_MAX_ENTRIES):
+    if CACHE_REDIS_URL:
+        import redis # Dependencia opcional, solo si se configura CACHE_REDIS_URL
+        return RedisCache(redis.Redis.from_url(CACHE_REDIS_URL), prefix=prefix)
+    return MemoryCache(max_entries=max_entries)
+
+cache = build_cache()
+# Servicio con cliente y plan, por id: lo que necesita POST /tickets para armar la respuesta
+service_cache = build_cache(prefix="emerald:service:", max_entries=SERVICE_CACHE_MAX_ENTRIES)
+
+
+def catalog_key(key: str, version: int) -> str:
+    """Clave de caché atada a la versión del catálogo leída con CATALOG_VERSION_SQL.
+
+    No hace falta avisarle a nadie al escribir: con la versión nueva la clave es otra y las
+    entradas viejas se van por TTL o LRU. Vale igual para MemoryCache en cada worker que para Redis.
+    """
+    return f"{key}@{version}"
+
+
+# --- GET CONDICIONALES (ETag / Last-Modified -> 304) ---
+def validator_headers(etag: str, last_modified=None) -> dict:
+    # no-cache: el navegador guarda la respuesta pero revalida siempre (un 304 es barato)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # Comparación débil (RFC 9110): W/"x" y "x" son la misma versión
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+def is_not_modified(request: Request, etag: str, last_modified=None) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None: # Si vino, manda el ETag (If-Modified-Since se ignora)
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since # La fecha HTTP no tiene fracciones de segundo
+    return False
+
+def not_modified_response(etag: str, last_modified=None) -> Response:
+    return Response(status_code=304, headers=validator_headers(etag, last_modified))
+
+def cached_response(request: Request, etag: str, body: bytes, last_modified=None) -> Response:
+    # Si el navegador ya tiene esta versión, devolvemos 304 sin cuerpo
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    headers = validator_headers(etag, last_modified)
+    encoding = choose_encoding(request.headers.get("accept-encoding", "")) if len(body) >= COMPRESSION_MIN_SIZE else None
+    if encoding is not None:
+        # Comprimido una sola vez por versión; el middleware ve Content-Encoding y lo deja pasar
+        body = precompressed(etag, body, encoding)
+        headers.update({"Content-Encoding": encoding, "Vary": "Accept-Encoding"})
+    return Response(content=body, media_type="application/json", headers=headers)
+
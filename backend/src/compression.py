@@ -0,0 +1,142 @@
+# backend/src/compression.py
+# Compresión de respuestas según lo que acepta el cliente (header Accept-Encoding): brotli si
+# lo acepta y el paquete está instalado, si no gzip. Los listados JSON de tickets y servicios
+# bajan a una fracción del tamaño, lo que más se nota en los enlaces rurales lentos.
+#
+# Se apoya en el GZipMiddleware de Starlette (umbral de tamaño, respuestas en streaming, tipos que
+# ya vienen comprimidos o que no se deben demorar como text/event-stream); acá solo se agrega brotli
+# y la elección según las preferencias (q=) del cliente.
+import gzip
+import os
+import threading
+from collections import OrderedDict
+
+import anyio.to_thread
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES, GZipMiddleware, GZipResponder, IdentityResponder
+
+try:
+    import brotli # Dependencia opcional: sin ella se ofrece solo gzip
+except ImportError:
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024")) # Bytes; lo chico no vale la pena
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6")) # El 9 de Starlette cuesta mucha CPU y casi no achica más
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4")) # 4-5 es el punto justo para contenido dinámico
+PRECOMPRESSED_MAX_ENTRIES = int(os.getenv("PRECOMPRESSED_MAX_ENTRIES", "16"))
+
+# Además de los de Starlette: las planillas XLSX ya son un ZIP
+EXCLUDED_CONTENT_TYPES = DEFAULT_EXCLUDED_CONTENT_TYPES + (
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+)
+
+
+def accepted_encodings(header: str) -> dict:
+    # "br;q=1.0, gzip;q=0.8, *;q=0.1" -> {"br": 1.0, "gzip": 0.8, "*": 0.1}
+    accepted = {}
+    for item in header.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    return accepted
+
+
+def choose_encoding(header: str):
+    accepted = accepted_encodings(header)
+    available = ("br", "gzip") if brotli is not None else ("gzip",)
+    best, best_quality = None, 0.0
+    for encoding in available: # En caso de empate gana el primero (brotli comprime más)
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+# Las respuestas que salen de caché (combo de servicios, planes) son los mismos bytes mientras no
+# cambie su ETag: se comprimen una vez por versión y codificación, no en cada request (el combo
+# pesa varios MB y comprimirlo cuesta decenas de ms de CPU).
+_precompressed = OrderedDict() # (etag, codificación) -> cuerpo comprimido
+_precompressed_lock = threading.Lock()
+
+def precompressed(etag: str, body: bytes, encoding: str) -> bytes:
+    key = (etag, encoding)
+    with _precompressed_lock:
+        if key in _precompressed:
+            _precompressed.move_to_end(key)
+            return _precompressed[key]
+    compressed = compress(body, encoding) # Fuera del lock: si dos requests comprimen a la vez, da igual
+    with _precompressed_lock:
+        _precompressed[key] = compressed
+        while len(_precompressed) > PRECOMPRESSED_MAX_ENTRIES:
+            _precompressed.popitem(last=False)
+    return compressed
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app, minimum_size, quality=BROTLI_QUALITY, *, thread_minimum_size=128 * 1024,
+                 exclude_content_types=EXCLUDED_CONTENT_TYPES):
+        super().__init__(app, minimum_size, exclude_content_types=exclude_content_types)
+        self.quality = quality
+        self.thread_minimum_size = thread_minimum_size
+        self._compressor = None
+
+    @property
+    def compressor(self):
+        if self._compressor is None:
+            self._compressor = brotli.Compressor(quality=self.quality)
+        return self._compressor
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if len(body) >= self.thread_minimum_size:
+            # Igual que gzip: los bloques grandes se comprimen en un thread para no trabar el event loop
+            return await anyio.to_thread.run_sync(self._compress_body, body, more_body)
+        return self._compress_body(body, more_body)
+
+    def _compress_body(self, body: bytes, more_body: bool) -> bytes:
+        if more_body:
+            # Streaming (exportaciones): flush para que cada bloque salga sin esperar al siguiente
+            return self.compressor.process(body) + self.compressor.flush()
+        return self.compressor.process(body) + self.compressor.finish()
+
+
+class CompressionMiddleware(GZipMiddleware):
+    def __init__(self, app, minimum_size=COMPRESSION_MIN_SIZE, gzip_level=GZIP_LEVEL, brotli_quality=BROTLI_QUALITY):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=gzip_level,
+                         exclude_content_types=EXCLUDED_CONTENT_TYPES)
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding == "br":
+            responder = BrotliResponder(self.app, self.minimum_size, self.brotli_quality,
+                                        thread_minimum_size=self.thread_minimum_size,
+                                        exclude_content_types=self.exclude_content_types)
+        elif encoding == "gzip":
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel,
+                                      thread_minimum_size=self.thread_minimum_size,
+                                      exclude_content_types=self.exclude_content_types)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size, exclude_content_types=self.exclude_content_types)
+        await responder(scope, receive, send)
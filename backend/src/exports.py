@@ -0,0 +1,258 @@
+# backend/src/exports.py
+# Exportaciones para gerencia (GET /exports/tickets y /exports/service_sheets) en CSV o XLSX.
+#
+# Las filas salen de un cursor del lado del servidor (stream_results + yield_per) y se mandan por
+# tandas en un StreamingResponse: la memoria no depende de la cantidad de filas y los primeros
+# bytes (el encabezado) salen antes de que la base termine de recorrer la tabla.
+# El XLSX se arma a mano (una hoja, celdas de texto y número) sobre un zip en streaming,
+# así no hace falta ninguna librería ni un archivo temporal.
+import csv
+import io
+import json
+import math
+import os
+import re
+import zipfile
+from datetime import date, datetime
+from xml.sax.saxutils import escape
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+import models
+from replicas import router
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "2000")) # Filas por tanda (cursor y envío)
+XLSX_MAX_ROWS = 1048576 # Límite de filas de una hoja de Excel
+XLSX_TRUNCATED = "Exportación cortada en {rows} filas (el máximo de una hoja de Excel): para el resto, CSV o un rango de fechas más corto"
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+# --- CONSULTAS ---
+def tickets_export_select(date_from=None, date_to=None, statuses=None):
+    T, S, C, P = models.Ticket, models.ClientService, models.Client, models.Plan
+    Tech = aliased(models.User)
+    columns = [
+        ("ID", T.id), ("ID externo", T.external_id), ("Creado", T.created_at), ("Estado", T.status),
+        ("Prioridad", T.priority), ("Categoría", T.category), ("Título", T.title),
+        ("Cliente", C.name), ("IP", S.ip_address), ("Dirección", S.installation_address),
+        ("Plan", P.name), ("Técnico", Tech.username), ("Resuelto", T.resolved_at),
+    ]
+    stmt = (
+        select(*[col for _, col in columns])
+        .outerjoin(S, T.service_id == S.id)
+        .outerjoin(C, S.client_id == C.id)
+        .outerjoin(P, S.plan_id == P.id)
+        .outerjoin(Tech, T.assigned_id == Tech.id)
+        .order_by(T.id)
+    )
+    if date_from:
+        stmt = stmt.where(T.created_at >= date_from)
+    if date_to:
+        stmt = stmt.where(T.created_at < date_to)
+    if statuses:
+        stmt = stmt.where(T.status.in_(statuses))
+    return [name for name, _ in columns], stmt
+
+def service_sheets_export_select(date_from=None, date_to=None, statuses=None):
+    SS, T, S, C = models.ServiceSheet, models.Ticket, models.ClientService, models.Client
+    Tech = aliased(models.User)
+    columns = [
+        ("ID", SS.id), ("Ticket", SS.ticket_id), ("Estado del ticket", T.status), ("Cliente", C.name),
+        ("Técnico", Tech.username), ("Inicio", SS.started_at), ("Fin", SS.ended_at),
+        ("Potencia (dBm)", SS.signal_power), ("ONU", SS.onu_sn), ("Caja NAP", SS.nap_box_data),
+        ("Materiales", SS.materials_used), ("Notas", SS.tech_notes),
+    ]
+    stmt = (
+        select(*[col for _, col in columns])
+        .outerjoin(T, SS.ticket_id == T.id)
+        .outerjoin(S, T.service_id == S.id)
+        .outerjoin(C, S.client_id == C.id)
+        .outerjoin(Tech, SS.author_id == Tech.id)
+        .order_by(SS.id)
+    )
+    # El rango de fechas es sobre el inicio de la visita; el estado, el del ticket
+    if date_from:
+        stmt = stmt.where(SS.started_at >= date_from)
+    if date_to:
+        stmt = stmt.where(SS.started_at < date_to)
+    if statuses:
+        stmt = stmt.where(T.status.in_(statuses))
+    return [name for name, _ in columns], stmt
+
+
+# --- FORMATOS ---
+def to_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ", timespec="seconds")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+PLAIN_TYPES = {str, int, float, type(None)} # csv.writer ya los escribe bien (None -> vacío)
+
+
+class CsvWriter:
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+
+    def header(self, names):
+        self.buffer.write("\ufeff") # BOM: así Excel abre el CSV como UTF-8 (acentos, ñ)
+        return self.rows([names])
+
+    def rows(self, rows):
+        self.writer.writerows([v if v.__class__ in PLAIN_TYPES else to_text(v) for v in row] for row in rows)
+        data = self.buffer.getvalue().encode("utf-8")
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+    def close(self):
+        return b""
+
+
+class _Drain(io.RawIOBase):
+    """Destino del zip: no se puede hacer seek, así que zipfile escribe todo de corrido y lo vamos vaciando."""
+
+    def __init__(self):
+        self.parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts.clear()
+        return data
+
+
+_ILLEGAL_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Datos" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+class XlsxWriter:
+    def __init__(self):
+        self.out = _Drain()
+        self.zip = zipfile.ZipFile(self.out, "w", compression=zipfile.ZIP_DEFLATED)
+        for name, content in XLSX_PARTS.items():
+            self.zip.writestr(name, content)
+        self.sheet = self.zip.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) # Puede pasar los 4 GB
+        self.sheet.write(
+            b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+        )
+        self.count = 0
+        # Excel no abre más de XLSX_MAX_ROWS filas: la última queda guardada hasta saber si hay más.
+        # Si las hay, en su lugar va una fila que avisa que la exportación está cortada.
+        self.last = None
+        self.truncated = False
+
+    def header(self, names):
+        return self.rows([names])
+
+    def rows(self, rows):
+        parts = []
+        for row in rows:
+            self.count += 1
+            if self.count < XLSX_MAX_ROWS:
+                self._row(parts, row)
+            elif self.count == XLSX_MAX_ROWS:
+                self.last = row
+            else:
+                self.truncated = True
+                break
+        self.sheet.write("".join(parts).encode("utf-8"))
+        return self.out.drain()
+
+    def _row(self, parts, row):
+        parts.append("<row>")
+        for value in row:
+            # NaN e infinito no son números válidos en el XML de la hoja (Excel la da por dañada): van como texto
+            if (isinstance(value, int) and not isinstance(value, bool)) or (isinstance(value, float) and math.isfinite(value)):
+                parts.append(f"<c><v>{value}</v></c>")
+            else:
+                text = escape(_ILLEGAL_XML.sub("", to_text(value)))
+                parts.append(f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+        parts.append("</row>")
+
+    def close(self):
+        parts = []
+        if self.truncated:
+            self._row(parts, [XLSX_TRUNCATED.format(rows=XLSX_MAX_ROWS - 2)]) # Sin contar encabezado ni aviso
+        elif self.last is not None:
+            self._row(parts, self.last)
+        self.sheet.write("".join(parts).encode("utf-8") + b"</sheetData></worksheet>")
+        self.sheet.close()
+        self.zip.close()
+        return self.out.drain()
+
+
+WRITERS = {"csv": CsvWriter, "xlsx": XlsxWriter}
+
+
+# --- RESPUESTA EN STREAMING ---
+def stream_export(names, stmt, fmt):
+    writer = WRITERS[fmt]()
+    yield writer.header(names) # Sale enseguida, antes de la primera consulta
+    # Conexión propia: el generador sigue corriendo después de que el endpoint devolvió la respuesta.
+    # Es la lectura más pesada: va a una réplica si hay (ver replicas.py)
+    with router.pick().connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=EXPORT_CHUNK_ROWS).execute(stmt)
+        for rows in result.partitions():
+            data = writer.rows(rows)
+            if data:
+                yield data
+            if getattr(writer, "truncated", False):
+                break # El resto no entra en la hoja: no se sigue leyendo
+    yield writer.close()
+
+def export_response(name, names, stmt, fmt):
+    filename = f"{name}_{datetime.now():%Y%m%d_%H%M}.{fmt}"
+    return StreamingResponse(
+        stream_export(names, stmt, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "X-Accel-Buffering": "no"},
+    )
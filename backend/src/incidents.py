@@ -0,0 +1,128 @@
+# backend/src/incidents.py
+# Agrupación de tickets por infraestructura compartida (GET /incidents).
+#
+# Cuando se corta un troncal de fibra llegan decenas de tickets de servicios colgados de la misma
+# caja NAP o de la misma subred. En vez de atenderlos uno por uno, un trigger en la misma
+# transacción que crea el ticket lo suma a un "incidente" abierto de su caja NAP y de su subred:
+#   - client_services.nap_box: caja NAP normalizada de la última planilla del servicio (trigger en service_sheets)
+#   - client_services.subnet:  /24 de ip_address (trigger en client_services)
+#   - incidents:               un incidente abierto como mucho por (tipo, clave), con sus contadores
+#   - incident_tickets:        qué tickets forman cada incidente
+# Los triggers corren una vez por sentencia con todos sus tickets: un lote de 1000 tickets es una
+# lectura de sus servicios y un upsert de incidentes, sin recorrer los tickets abiertos. Al ser
+# triggers también cubren /tickets/batch y la importación masiva.
+#
+# Los tickets de un incidente tienen created_at entre opened_at y last_ticket_at: el detalle busca
+# sus tickets con ese rango y solo lee las particiones de esos meses.
+#
+# Un incidente deja de sumar tickets (se cierra) cuando pasan 4 horas sin tickets nuevos de
+# esa clave o cuando se resuelven todos los suyos; el siguiente ticket de la clave abre uno nuevo.
+#
+# Mantenimiento:
+#   python src/incidents.py check     # compara los contadores contra los tickets
+#   python src/incidents.py rebuild   # rearma los incidentes de lo pendiente, en orden de creación
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+
+INCIDENT_KINDS = ("nap", "subnet")
+MIN_TICKETS = 2 # Un ticket solo no es un incidente: /incidents no lo lista por defecto
+
+# Funciones y triggers: migración c3f8a6d1e947 (la versión por sentencia de a8c5e1d7f360).
+# nap_box_key: "nap-12 puerto 3", "NAP 12 / P3" y "Nap12-p3" quedan como "NAP12" (sin el puerto).
+# La ventana de 4 horas sin tickets nuevos que cierra un incidente está en tickets_correlate().
+
+INCIDENT_COLUMNS = "i.id, i.kind, i.key, i.status, i.opened_at, i.last_ticket_at, i.closed_at, i.tickets_count, i.open_count"
+
+LIST_SQL = f"""
+SELECT {INCIDENT_COLUMNS}
+  FROM incidents i
+ WHERE i.status = :status AND i.tickets_count >= :min_tickets
+   AND (CAST(:kind AS text) IS NULL OR i.kind = :kind)
+   AND (CAST(:before_id AS integer) IS NULL OR i.id < :before_id)
+ ORDER BY i.id DESC
+ LIMIT :limit
+"""
+
+# Servicios colgados de la misma caja/subred: cuántos clientes reclamaron sobre cuántos posibles
+DETAIL_SQL = f"""
+SELECT {INCIDENT_COLUMNS},
+       CASE i.kind WHEN 'nap' THEN (SELECT count(*) FROM client_services s WHERE s.nap_box = i.key)
+                   ELSE (SELECT count(*) FROM client_services s WHERE s.subnet = i.key) END
+  FROM incidents i
+ WHERE i.id = :id
+"""
+
+MEMBERS_SQL = "SELECT ticket_id FROM incident_tickets WHERE incident_id = :id ORDER BY ticket_id"
+
+CHECK_SQL = """
+SELECT i.id, i.tickets_count, i.open_count, count(m.ticket_id), count(t.id) FILTER (WHERE t.status IN ('open', 'in_progress'))
+  FROM incidents i
+  LEFT JOIN incident_tickets m ON m.incident_id = i.id
+  LEFT JOIN tickets t ON t.id = m.ticket_id
+ GROUP BY i.id
+HAVING i.tickets_count <> count(m.ticket_id)
+    OR i.open_count <> count(t.id) FILTER (WHERE t.status IN ('open', 'in_progress'))
+"""
+
+
+def incident_dict(row):
+    (incident_id, kind, key, status, opened_at, last_ticket_at, closed_at, tickets_count, open_count) = row[:9]
+    return {
+        "id": incident_id,
+        "kind": kind,
+        "key": key,
+        "status": status,
+        "opened_at": opened_at,
+        "last_ticket_at": last_ticket_at,
+        "closed_at": closed_at,
+        "tickets_count": tickets_count,
+        "open_count": open_count,
+    }
+
+
+def list_incidents(conn, status="open", kind=None, min_tickets=MIN_TICKETS, limit=50, before_id=None):
+    # Más nuevos primero; uno de más para saber si hay otra página
+    rows = conn.execute(text(LIST_SQL), {
+        "status": status, "kind": kind, "min_tickets": min_tickets, "before_id": before_id, "limit": limit + 1,
+    }).all()
+    return [incident_dict(row) for row in rows]
+
+
+def get_incident(conn, incident_id):
+    # -> (incidente con services_count, ids de sus tickets) o None
+    row = conn.execute(text(DETAIL_SQL), {"id": incident_id}).first()
+    if row is None:
+        return None
+    incident = incident_dict(row)
+    incident["services_count"] = row[9]
+    return incident, conn.execute(text(MEMBERS_SQL), {"id": incident_id}).scalars().all()
+
+
+def check(conn):
+    # [(id, tickets_count, open_count, miembros, miembros pendientes)] de los incidentes que no cierran
+    return [tuple(row) for row in conn.execute(text(CHECK_SQL))]
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "check"
+    with engine.begin() as conn:
+        if command == "rebuild":
+            conn.execute(text("LOCK TABLE tickets IN SHARE ROW EXCLUSIVE MODE")) # Que nadie escriba mientras tanto
+            attached = conn.execute(text("SELECT incidents_rebuild()")).scalar()
+            print(f"✅ Incidentes rearmados: {attached} asignaciones ticket-incidente.")
+        elif command == "check":
+            diffs = check(conn)
+            if diffs:
+                print(f"⚠️  {len(diffs)} incidentes con contadores que no coinciden con sus tickets:")
+                for diff in diffs:
+                    print("   ", diff)
+                sys.exit(1)
+            print("✅ Los incidentes coinciden con sus tickets.")
+        else:
+            sys.exit(f"Comando desconocido: {command} (usar check o rebuild)")
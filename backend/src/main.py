@@ -2,19 +2,72 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from fastapi import FastAPI, Depends, HTTPException
+import asyncio
+import base64
+import json
+import logging
+import orjson
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session, joinedload
-from typing import List, Optional
-from pydantic import BaseModel
-from datetime import datetime
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy import select, insert, update, func, or_, case, null, text, union_all
+from sqlalchemy.orm import Session, joinedload, contains_eager
+from typing import Any, Dict, Generic, List, Literal, Optional, TypeVar
+from pydantic import BaseModel, Field, TypeAdapter
+from datetime import date, datetime, timedelta, timezone
 
-from database import engine, Base, get_db
+from database import engine, Base, SessionLocal, get_db, get_async_db, USE_ASYNC_DB, warm_up_pool, warm_up_async_pool
 import models
+from cache import CATALOG_VERSION_SQL, cache, catalog_key, service_cache, cached_response, data_version, is_not_modified, not_modified_response, validator_headers
+from compression import CompressionMiddleware
+from metrics import MetricsMiddleware, render_metrics
+from replicas import ReadYourWritesMiddleware, get_read_db, POSITION_HEADER
+from ticket_stats import get_ticket_stats, OPEN_STATUSES
+from ticket_events import hub, queue_ticket_events
+import auth
+import exports
+import incidents
+import materials
+import partitions
+import search
+import sync
+import telemetry
 
-models.Base.metadata.create_all(bind=engine)
+# El esquema lo crea y actualiza Alembic (alembic upgrade head), no el arranque de cada worker
+log = logging.getLogger("emerald")
 
-app = FastAPI(title="Emerald ERP API")
+def prime_connection(conn):
+    # La bandeja de tickets es lo primero que pide cada pantalla: que no la pague el primer usuario
+    filters = TicketFilters(limit=1)
+    with Session(bind=conn) as db:
+        if TICKETS_FAST_PATH:
+            db.execute(tickets_rows_select(filters)).all()
+        else:
+            db.execute(tickets_select(filters)).scalars().all()
+
+@asynccontextmanager
+async def lifespan(app):
+    try:
+        # Conexiones listas antes de aceptar tráfico (en un thread: el connect de psycopg2 bloquea)
+        await asyncio.to_thread(warm_up_pool, prime_connection)
+        if USE_ASYNC_DB:
+            await warm_up_async_pool(prime_connection)
+    except Exception:
+        log.exception("No se pudo precalentar el pool de conexiones; se conectará en el primer request")
+    try:
+        # Meses que vienen de tickets y planillas (casi siempre ya están y no toca el esquema)
+        await asyncio.to_thread(partitions.ensure_on_startup, engine)
+    except Exception:
+        log.exception("No se pudieron crear las particiones de los próximos meses (las filas caen en la DEFAULT)")
+    await hub.start() # Reparto de novedades para /tickets/stream
+    auth.hash_pool.start() # Procesos de bcrypt listos antes del primer login
+    yield
+    auth.hash_pool.shutdown()
+    await hub.stop()
+
+# Token en cada request (ver auth.py); sin AUTH_REQUIRED, los requests sin token siguen pasando
+app = FastAPI(title="Emerald ERP API", lifespan=lifespan, dependencies=[Depends(auth.authenticate)])
 
 #origins = ["http://localhost:4000", "http://localhost:5173"]
 app.add_middleware(
@@ -23,7 +76,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[POSITION_HEADER], # El frontend lo reenvía (App.jsx) para leer lo que acaba de escribir
 )
+app.add_middleware(ReadYourWritesMiddleware) # X-DB-Position en las escrituras (solo con réplicas, ver replicas.py)
+app.add_middleware(CompressionMiddleware) # gzip / brotli según Accept-Encoding (ver compression.py)
+app.add_middleware(MetricsMiddleware) # Latencia, cantidad de SQL y filas por request -> /metrics
 
 # --- ESQUEMAS DE LECTURA (Lo que sale hacia afuera) ---
 class PlanSchema(BaseModel):
@@ -32,6 +89,10 @@ class PlanSchema(BaseModel):
     bandwidth_up: int
     class Config: from_attributes = True
 
+class PlanCatalogSchema(PlanSchema):
+    id: int
+    price: float | None = None
+
 class ClientSchema(BaseModel):
     name: str
     phone: str | None = None
@@ -57,57 +118,931 @@ class TicketResponse(BaseModel):
     service: ServiceSchema | None = None 
     class Config: from_attributes = True
 
+class TicketPage(BaseModel):
+    items: List[TicketResponse]
+    next_cursor: str | None = None # None = no hay más páginas
+
+class SearchHit(BaseModel):
+    ticket: TicketResponse
+    rank: float
+    highlights: Dict[str, str] # campo -> fragmento con <mark>; solo los campos que coincidieron
+
+class SearchPage(BaseModel):
+    items: List[SearchHit]
+    next_cursor: str | None = None
+
+class QueueItem(BaseModel):
+    ticket: TicketResponse
+    latitude: float | None = None # Del servicio (NULL si no tiene geolocalización)
+    longitude: float | None = None
+    distance_km: float | None = None # Solo si se mandó la posición del técnico
+
+class AssigneeStats(BaseModel):
+    assigned_id: Optional[int] # None = sin asignar
+    count: int
+    open_count: int
+
+class TicketStats(BaseModel):
+    total: int
+    by_status: Dict[str, int]
+    by_priority: Dict[str, int]
+    by_category: Dict[str, int]
+    by_assignee: List[AssigneeStats]
+    open_age_buckets: Dict[str, int]
+    mttr_hours_by_category: Dict[str, float]
+
+# Serializadores directos a JSON para las respuestas que guardamos en caché
+services_adapter = TypeAdapter(List[ServiceSchema])
+service_adapter = TypeAdapter(ServiceSchema)
+plans_adapter = TypeAdapter(List[PlanCatalogSchema])
+
+def dump_json(adapter: TypeAdapter, objs) -> bytes:
+    return adapter.dump_json(adapter.validate_python(objs, from_attributes=True))
+
 # --- ESQUEMAS DE CREACIÓN (Lo que entra desde el formulario) ---
 class TicketCreate(BaseModel):
     title: str
     description: str
     priority: str
     service_id: int
-    # No pedimos status (siempre nace open) ni usuario (hardcodeamos admin por ahora)
+    # No pedimos status (siempre nace open) ni usuario (sale del token; sin login, el admin)
 
-# --- ENDPOINTS ---
+# --- OPERACIONES MASIVAS (ej: corte de fibra en una caja NAP) ---
+BATCH_MAX = int(os.getenv("TICKETS_BATCH_MAX", "5000"))
+
+class TicketBatchCreate(BaseModel):
+    tickets: List[TicketCreate] = Field(..., min_length=1, max_length=BATCH_MAX)
+
+class TicketBatchUpdate(BaseModel):
+    ticket_ids: List[int] = Field(..., min_length=1, max_length=BATCH_MAX)
+    status: Optional[Literal["open", "in_progress", "resolved", "closed"]] = None
+    assigned_id: Optional[int] = None # Mandar null explícito para desasignar
+
+class TicketBatchItem(BaseModel):
+    index: Optional[int] = None # Posición en el pedido (alta masiva)
+    id: Optional[int] = None
+    ok: bool
+    error: Optional[str] = None
+    ticket: Optional[TicketResponse] = None
+
+class TicketBatchResult(BaseModel):
+    ok_count: int
+    error_count: int
+    results: List[TicketBatchItem]
+
+# --- SINCRONIZACIÓN DE LA APP OFFLINE (ver sync.py) ---
+# Filas planas: la app arma las relaciones con los ids (los planes salen de GET /plans)
+class SyncTicket(BaseModel):
+    id: int
+    service_id: int | None = None
+    assigned_id: int | None = None
+    title: str | None = None
+    description: str | None = None
+    priority: str | None = None
+    status: str | None = None
+    category: str | None = None
+    public_note: str | None = None
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
+    resolved_at: datetime | None = None
+
+class SyncClient(BaseModel):
+    id: int
+    name: str | None = None
+    billing_address: str | None = None
+    phone: str | None = None
+    email: str | None = None
+    cuit: str | None = None
+    updated_at: datetime | None = None
+
+class SyncService(BaseModel):
+    id: int
+    client_id: int | None = None
+    plan_id: int | None = None
+    ip_address: str | None = None
+    mac_address: str | None = None
+    installation_address: str | None = None
+    geolocation: str | None = None
+    latitude: float | None = None
+    longitude: float | None = None
+    site_contact_name: str | None = None
+    site_contact_phone: str | None = None
+    onu_sn: str | None = None
+    updated_at: datetime | None = None
+
+class SyncServiceSheet(BaseModel):
+    id: int
+    ticket_id: int | None = None
+    author_id: int | None = None
+    started_at: datetime | None = None
+    ended_at: datetime | None = None
+    signal_power: float | None = None
+    onu_sn: str | None = None
+    nap_box_data: str | None = None
+    materials_used: Any = None
+    tech_notes: str | None = None
+    photos_url: Any = None
+    client_ref: str | None = None
+    created_at: datetime | None = None
+    updated_at: datetime | None = None # Se devuelve como base_updated_at al editar
+
+RowT = TypeVar("RowT")
 
-@app.get("/tickets", response_model=List[TicketResponse])
-def get_tickets(db: Session = Depends(get_db)):
-    tickets = db.query(models.Ticket).options(
+class SyncEntityChanges(BaseModel, Generic[RowT]):
+    upserted: List[RowT] # Estado actual: reemplaza la copia local
+    deleted: List[int] # Ids que ya no existen
+
+class SyncPage(BaseModel):
+    tickets: SyncEntityChanges[SyncTicket]
+    clients: SyncEntityChanges[SyncClient]
+    services: SyncEntityChanges[SyncService]
+    service_sheets: SyncEntityChanges[SyncServiceSheet]
+    next_token: str # Guardarlo y mandarlo como since la próxima vez
+    has_more: bool # True = pedir de nuevo ya mismo con next_token
+
+class ServiceSheetUpload(BaseModel):
+    client_ref: str = Field(..., min_length=1, max_length=100) # Id local de la app (reintentos sin duplicar)
+    id: Optional[int] = None # Solo al editar una planilla que ya estaba en el servidor
+    base_updated_at: Optional[datetime] = None # updated_at de la copia editada (obligatorio con id)
+    ticket_id: int
+    author_id: Optional[int] = None
+    started_at: Optional[datetime] = None
+    ended_at: Optional[datetime] = None
+    signal_power: Optional[float] = None
+    onu_sn: Optional[str] = None
+    nap_box_data: Optional[str] = None
+    materials_used: Dict[str, Any] = {}
+    tech_notes: Optional[str] = None
+    photos_url: List[str] = []
+
+class ServiceSheetUploadBatch(BaseModel):
+    sheets: List[ServiceSheetUpload] = Field(..., min_length=1, max_length=sync.SYNC_UPLOAD_MAX)
+
+class ServiceSheetUploadItem(BaseModel):
+    index: int
+    client_ref: str
+    id: Optional[int] = None
+    ok: bool
+    status: Literal["created", "updated", "duplicate", "conflict", "error"]
+    error: Optional[str] = None
+    sheet: Optional[SyncServiceSheet] = None # En un conflicto, la versión del servidor
+
+class ServiceSheetUploadResult(BaseModel):
+    ok_count: int
+    conflict_count: int
+    error_count: int
+    results: List[ServiceSheetUploadItem]
+
+# --- CONSUMO DE MATERIALES (ver materials.py) ---
+class MaterialsRow(BaseModel):
+    period: date # Primer día del período
+    author_id: Optional[int] = None
+    technician: Optional[str] = None
+    item: str
+    quantity: float
+    sheets: int # Planillas en las que aparece
+
+class MaterialsTotal(BaseModel):
+    period: date
+    item: str
+    quantity: float
+    sheets: int
+
+class MaterialsReport(BaseModel):
+    period: Literal["day", "week", "month", "year"]
+    rows: List[MaterialsRow] # Por período, ítem y técnico
+    totals: List[MaterialsTotal] # Por período e ítem (todos los técnicos)
+
+# --- POTENCIA ÓPTICA DE LAS ONUs (ver telemetry.py) ---
+class ReadingError(BaseModel):
+    line: int # Línea del cuerpo (con el encabezado, en CSV)
+    error: str
+
+class OnuReadingsResult(BaseModel):
+    received: int
+    inserted: int
+    duplicates: int # Ya cargadas (reenvío del poller)
+    unknown: int # service_id u onu_sn que no corresponden a ningún servicio
+    rejected: int # Con errores de formato o fuera de rango
+    errors: List[ReadingError] # Los primeros
+
+class SignalPoint(BaseModel):
+    at: datetime # Lectura, o inicio de la hora/del día
+    samples: int
+    rx_min: float
+    rx_avg: float
+    rx_max: float
+    tx_dbm: Optional[float] = None # Solo en crudo
+
+class SignalHistory(BaseModel):
+    service_id: int
+    resolution: Literal["raw", "hour", "day"]
+    date_from: datetime
+    date_to: datetime
+    points: List[SignalPoint]
+
+# --- INCIDENTES (ver incidents.py) ---
+class IncidentSchema(BaseModel):
+    id: int
+    kind: Literal["nap", "subnet"]
+    key: str # Caja NAP normalizada o red ("10.1.2.0/24")
+    status: Literal["open", "closed"]
+    opened_at: datetime
+    last_ticket_at: datetime
+    closed_at: Optional[datetime] = None
+    tickets_count: int
+    open_count: int # Tickets todavía pendientes
+
+class IncidentPage(BaseModel):
+    items: List[IncidentSchema]
+    next_cursor: Optional[str] = None
+
+class IncidentDetail(IncidentSchema):
+    services_count: int # Servicios colgados de la misma caja/subred (hayan reclamado o no)
+    tickets: List[TicketResponse]
+
+# --- AUTENTICACIÓN ---
+class LoginRequest(BaseModel):
+    username: str = Field(..., min_length=1)
+    password: str = Field(..., min_length=1, max_length=72) # bcrypt solo usa los primeros 72 bytes
+
+class UserSchema(BaseModel):
+    id: int
+    username: str
+    role: Optional[str] = None # 'admin', 'tecnico', 'mesa_ayuda'
+    class Config: from_attributes = True
+
+class LoginResponse(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    expires_at: datetime
+    user: UserSchema
+
+# --- PAGINACIÓN (KEYSET) ---
+# El cursor es opaco para el frontend: base64 del último ID entregado.
+# Paginamos por "id < cursor" en vez de OFFSET para que la página 1000 cueste lo mismo que la 1.
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode()
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        return int(json.loads(base64.urlsafe_b64decode(cursor.encode()))["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+# --- FILTROS DE /tickets ---
+# Dependencia compartida entre la versión sync y la async del endpoint
+class TicketFilters:
+    def __init__(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = Query(50, ge=1, le=200),
+        status: Optional[str] = None,
+        priority: Optional[str] = None,
+        category: Optional[str] = None,
+        assigned_id: Optional[int] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ):
+        self.cursor = cursor
+        self.limit = limit
+        self.status = status
+        self.priority = priority
+        self.category = category
+        self.assigned_id = assigned_id
+        self.created_from = created_from
+        self.created_to = created_to
+
+def filter_tickets(stmt, filters: TicketFilters):
+    # Filtros del lado del servidor (solo aplicamos los que vienen)
+    if filters.status:
+        stmt = stmt.where(models.Ticket.status == filters.status)
+    if filters.priority:
+        stmt = stmt.where(models.Ticket.priority == filters.priority)
+    if filters.category:
+        stmt = stmt.where(models.Ticket.category == filters.category)
+    if filters.assigned_id is not None:
+        stmt = stmt.where(models.Ticket.assigned_id == filters.assigned_id)
+    if filters.created_from:
+        stmt = stmt.where(models.Ticket.created_at >= filters.created_from)
+    if filters.created_to:
+        stmt = stmt.where(models.Ticket.created_at < filters.created_to)
+    if filters.cursor:
+        stmt = stmt.where(models.Ticket.id < decode_cursor(filters.cursor))
+
+    # Pedimos uno de más para saber si existe otra página sin hacer un COUNT
+    return stmt.order_by(models.Ticket.id.desc()).limit(filters.limit + 1) # Nuevos arriba
+
+def tickets_select(filters: TicketFilters):
+    return filter_tickets(select(models.Ticket).options(
         joinedload(models.Ticket.service).joinedload(models.ClientService.client),
         joinedload(models.Ticket.service).joinedload(models.ClientService.plan)
-    ).order_by(models.Ticket.id.desc()).all() # Ordenamos por ID descendente (nuevos arriba)
-    return tickets
-
-# NUEVO: Endpoint para llenar el combo de "Seleccionar Servicio/Cliente"
-@app.get("/services_options", response_model=List[ServiceSchema])
-def get_services_options(db: Session = Depends(get_db)):
-    # Traemos solo los servicios activos para que el operador elija
-    services = db.query(models.ClientService).options(
+    ), filters)
+
+def tickets_page(tickets, limit: int):
+    next_cursor = None
+    if len(tickets) > limit:
+        tickets = tickets[:limit]
+        next_cursor = encode_cursor(tickets[-1].id)
+    return {"items": tickets, "next_cursor": next_cursor}
+
+# --- CAMINO RÁPIDO DE /tickets (TICKETS_FAST_PATH=1) ---
+# Traemos solo las columnas que muestra TicketResponse como tuplas (sin objetos ORM ni identity map)
+# y armamos el JSON directo con orjson. La salida es la misma que la del camino con Pydantic.
+TICKETS_FAST_PATH = os.getenv("TICKETS_FAST_PATH", "0").lower() in ("1", "true", "yes", "on")
+
+def tickets_rows_base():
+    T, S, C, P = models.Ticket, models.ClientService, models.Client, models.Plan
+    return (
+        select(
+            T.id, T.title, T.priority, T.status, T.category, T.description, T.created_at,
+            S.id, S.ip_address, S.installation_address,
+            C.id, C.name, C.phone, C.billing_address,
+            P.id, P.name, P.bandwidth_down, P.bandwidth_up,
+        )
+        .outerjoin(S, T.service_id == S.id)
+        .outerjoin(C, S.client_id == C.id)
+        .outerjoin(P, S.plan_id == P.id)
+    )
+
+def tickets_rows_select(filters: TicketFilters):
+    return filter_tickets(tickets_rows_base(), filters)
+
+def ticket_row_to_dict(row):
+    (t_id, title, priority, status, category, description, created_at,
+     s_id, ip_address, installation_address,
+     c_id, c_name, c_phone, c_billing,
+     p_id, p_name, p_down, p_up) = row
+    service = None
+    if s_id is not None:
+        service = {
+            "id": s_id,
+            "ip_address": ip_address,
+            "installation_address": installation_address,
+            "client": None if c_id is None else {"name": c_name, "phone": c_phone, "billing_address": c_billing},
+            "plan": None if p_id is None else {"name": p_name, "bandwidth_down": p_down, "bandwidth_up": p_up},
+        }
+    return {
+        "id": t_id,
+        "title": title,
+        "priority": priority,
+        "status": status,
+        "category": category,
+        "description": description,
+        "created_at": created_at,
+        "service": service,
+    }
+
+def orjson_response(payload) -> Response:
+    # Igual que Pydantic: UTC sale como "Z"
+    return Response(content=orjson.dumps(payload, option=orjson.OPT_UTC_Z), media_type="application/json")
+
+# --- ETag de /tickets ---
+# La versión sale de las tablas resumen (sin tocar la página ni hashear el JSON): cuántos tickets hay
+# y el contador de cambios de tickets y de lo que muestran de servicio, cliente y plan. El contador
+# avanza al confirmar cada transacción, así que una que confirma tarde también cambia el ETag.
+# Sin Last-Modified: una fecha no sigue el orden de los commits (y el navegador manda If-None-Match).
+# Cualquier cambio invalida todas las páginas y filtros a la vez; a cambio el 304 no lee la página.
+TICKETS_VERSION_SQL = text("SELECT total, version FROM tickets_version()") # Ver models.py
+
+def tickets_version(row):
+    total, version = row
+    return f'W/"tickets-{total:x}-{version:x}"', None
+
+def services_version(services):
+    # De las filas ya cargadas para el combo: servicios más sus clientes y planes
+    stamps = [service.updated_at for service in services]
+    stamps += [service.client.updated_at for service in services if service.client is not None]
+    stamps += [service.plan.updated_at for service in services if service.plan is not None]
+    return data_version("services", len(services), stamps)
+
+def tickets_page_json(rows, limit: int) -> Response:
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][0])
+    return orjson_response({"items": [ticket_row_to_dict(row) for row in rows], "next_cursor": next_cursor})
+
+# --- NOVEDADES EN TIEMPO REAL (/tickets/stream) ---
+def ticket_dicts(db, ticket_ids, created_between=None):
+    # Varios tickets completos (servicio, cliente, plan) en una sola consulta, con el formato de GET /tickets.
+    # Con created_between (desde, hasta) solo se leen las particiones de esos meses (ver partitions.py)
+    stmt = tickets_rows_base().where(models.Ticket.id.in_(ticket_ids))
+    if created_between is not None:
+        stmt = stmt.where(models.Ticket.created_at.between(*created_between))
+    return {row[0]: ticket_row_to_dict(row) for row in db.execute(stmt).all()}
+
+def tickets_by_id(ticket_ids):
+    # El hub lo llama de a lotes (en un thread aparte)
+    with SessionLocal() as db:
+        return ticket_dicts(db, ticket_ids)
+
+hub.loader = tickets_by_id
+
+# --- COLA DE TRABAJO DEL TÉCNICO (/technicians/{id}/queue) ---
+def distance_km(lat: float, lon: float):
+    # Haversine entre el técnico y el servicio, en km (NULL si el servicio no tiene coordenadas)
+    S = models.ClientService
+    return 2 * 6371 * func.asin(func.sqrt(
+        func.power(func.sin(func.radians(S.latitude - lat) / 2), 2)
+        + func.cos(func.radians(lat)) * func.cos(func.radians(S.latitude))
+        * func.power(func.sin(func.radians(S.longitude - lon) / 2), 2)
+    ))
+
+def technician_queue_select(technician_id: int, limit: int, lat=None, lon=None, order="priority"):
+    T, S = models.Ticket, models.ClientService
+    distance = distance_km(lat, lon) if lat is not None else null()
+    urgency = (T.priority_rank.desc(), T.created_at, T.id)
+    # Por urgencia el índice ya entrega el orden y Postgres lee solo las primeras `limit` entradas;
+    # por cercanía hay que medir todos los pendientes del técnico para quedarse con los más cercanos
+    ordering = (distance.asc().nulls_last(), *urgency) if order == "nearest" else urgency
+    # La página se elige solo con tickets y servicios (mismo predicado que el índice parcial
+    # ix_tickets_queue); cliente y plan se suman después, únicamente a esas filas
+    page = (
+        select(
+            T.id, T.created_at, S.latitude, S.longitude, distance.label("distance_km"),
+            func.row_number().over(order_by=ordering).label("position"),
+        )
+        .outerjoin(S, T.service_id == S.id)
+        .where(T.assigned_id == technician_id, T.status.in_(OPEN_STATUSES))
+        .order_by(*ordering)
+        .limit(limit)
+        .subquery("page")
+    )
+    return (
+        tickets_rows_base()
+        .add_columns(page.c.latitude, page.c.longitude, page.c.distance_km)
+        .join(page, (T.id == page.c.id) & (T.created_at == page.c.created_at))
+        .order_by(page.c.position)
+    )
+
+def queue_row_to_dict(row):
+    latitude, longitude, distance = row[-3:]
+    return {
+        "ticket": ticket_row_to_dict(row[:-3]),
+        "latitude": latitude,
+        "longitude": longitude,
+        "distance_km": None if distance is None else round(distance, 3),
+    }
+
+def services_options_select():
+    return select(models.ClientService).options(
         joinedload(models.ClientService.client),
         joinedload(models.ClientService.plan)
-    ).all()
-    return services
+    )
+
+# --- BÚSQUEDA DE SERVICIOS (TYPEAHEAD) ---
+def like_escape(value: str) -> str:
+    # Que un "%" o "_" tipeado por el operador no se interprete como comodín
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def services_search_select(q: str, limit: int):
+    Client, Service = models.Client, models.ClientService
+    prefix = like_escape(q) + "%"
+    contains = "%" + like_escape(q) + "%"
+
+    # Candidatos: los mejores N de cada columna por separado, cada uno con su índice GIN trgm
+    # (Bitmap Index Scan). Un OR entre columnas de clients y client_services no lo resuelve ningún
+    # índice: terminaba en un Seq Scan del JOIN filtrando fila por fila. Igual que GET /search.
+    name_score = func.greatest(case((Client.name.ilike(prefix), 1.0), else_=0.0), func.similarity(Client.name, q))
+    address_score = func.similarity(Service.installation_address, q)
+    candidates = union_all(
+        select(Service.id).join(Service.client)
+        .where(or_(Client.name.ilike(contains), Client.name.op("%")(q)))
+        .order_by(name_score.desc(), Service.id).limit(limit),
+        select(Service.id)
+        .where(or_(Service.installation_address.ilike(contains), Service.installation_address.op("%")(q)))
+        .order_by(address_score.desc(), Service.id).limit(limit),
+        select(Service.id).where(Service.ip_address.like(prefix)).order_by(Service.id).limit(limit),
+        select(Service.id).where(Service.mac_address.ilike(prefix)).order_by(Service.id).limit(limit),
+    ).subquery()
+
+    # Coincidencias por prefijo (nombre, IP, MAC) van primero; después, por similitud trigram.
+    # El puntaje final se calcula solo sobre los candidatos (4 * N filas como mucho).
+    prefix_match = or_(Client.name.ilike(prefix), Service.ip_address.like(prefix), Service.mac_address.ilike(prefix))
+    rank = func.greatest(
+        case((prefix_match, 1.0), else_=0.0),
+        func.similarity(Client.name, q),
+        func.similarity(Service.installation_address, q),
+    )
+    return (
+        select(Service)
+        .join(Service.client)
+        .options(contains_eager(Service.client), joinedload(Service.plan)) # Reusamos el JOIN de clients
+        .where(Service.id.in_(select(candidates.c.id)))
+        .order_by(rank.desc(), Service.id)
+        .limit(limit)
+    )
+
+# --- ENDPOINTS ---
+
+if USE_ASYNC_DB:
+    # Versiones async: no bloquean el threadpool de Starlette esperando a Postgres
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    @app.get("/tickets", response_model=TicketPage)
+    async def get_tickets(
+        request: Request, response: Response,
+        filters: TicketFilters = Depends(), db: AsyncSession = Depends(get_async_db),
+    ):
+        etag, last_modified = tickets_version((await db.execute(TICKETS_VERSION_SQL)).one())
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+        if TICKETS_FAST_PATH:
+            result = await db.execute(tickets_rows_select(filters))
+            response = tickets_page_json(result.all(), filters.limit)
+            response.headers.update(validator_headers(etag, last_modified))
+            return response
+        response.headers.update(validator_headers(etag, last_modified))
+        result = await db.execute(tickets_select(filters))
+        return tickets_page(result.scalars().all(), filters.limit)
+
+    @app.get("/services_options", response_model=List[ServiceSchema])
+    async def get_services_options(request: Request, db: AsyncSession = Depends(get_async_db)):
+        key = catalog_key("services_options", (await db.execute(CATALOG_VERSION_SQL)).scalar())
+        hit = cache.get(key)
+        if hit is None:
+            result = await db.execute(services_options_select())
+            services = result.scalars().all()
+            hit = cache.set(key, dump_json(services_adapter, services), *services_version(services))
+        return cached_response(request, *hit)
+
+    @app.get("/services/search", response_model=List[ServiceSchema])
+    async def search_services(
+        q: str = Query(..., min_length=2),
+        limit: int = Query(20, ge=1, le=50),
+        db: AsyncSession = Depends(get_async_db),
+    ):
+        result = await db.execute(services_search_select(q.strip(), limit))
+        return result.scalars().all()
+else:
+    @app.get("/tickets", response_model=TicketPage)
+    def get_tickets(
+        request: Request, response: Response,
+        filters: TicketFilters = Depends(), db: Session = Depends(get_read_db),
+    ):
+        # Si el operador ya tiene esta versión, 304 sin leer la página
+        etag, last_modified = tickets_version(db.execute(TICKETS_VERSION_SQL).one())
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+        if TICKETS_FAST_PATH:
+            response = tickets_page_json(db.execute(tickets_rows_select(filters)).all(), filters.limit)
+            response.headers.update(validator_headers(etag, last_modified))
+            return response
+        response.headers.update(validator_headers(etag, last_modified)) # FastAPI los suma a la respuesta
+        tickets = db.execute(tickets_select(filters)).scalars().all()
+        return tickets_page(tickets, filters.limit)
+
+    # NUEVO: Endpoint para llenar el combo de "Seleccionar Servicio/Cliente"
+    @app.get("/services_options", response_model=List[ServiceSchema])
+    def get_services_options(request: Request, db: Session = Depends(get_db)):
+        # Cambia muy poco: lo servimos desde caché (la clave cambia al escribir clientes/servicios/planes)
+        key = catalog_key("services_options", db.execute(CATALOG_VERSION_SQL).scalar())
+        hit = cache.get(key)
+        if hit is None:
+            services = db.execute(services_options_select()).scalars().all()
+            hit = cache.set(key, dump_json(services_adapter, services), *services_version(services))
+        return cached_response(request, *hit)
+
+    # Buscador del modal "Nuevo Reclamo": devuelve solo los mejores N resultados
+    @app.get("/services/search", response_model=List[ServiceSchema])
+    def search_services(
+        q: str = Query(..., min_length=2),
+        limit: int = Query(20, ge=1, le=50),
+        db: Session = Depends(get_read_db),
+    ):
+        return db.execute(services_search_select(q.strip(), limit)).scalars().all()
+
+# Login: el bcrypt corre en el pool de procesos de auth.py, fuera del event loop y del threadpool
+@app.post("/auth/login", response_model=LoginResponse)
+async def post_login(credentials: LoginRequest):
+    token, expires_at, user = await auth.login(credentials.username, credentials.password)
+    return orjson_response({
+        "access_token": token,
+        "token_type": "bearer",
+        "expires_at": datetime.fromtimestamp(expires_at, timezone.utc),
+        "user": {"id": user.id, "username": user.username, "role": user.role},
+    })
+
+# Usuario del token (de la caché: no va a la base)
+@app.get("/auth/me", response_model=UserSchema)
+async def get_me(user: Optional[auth.CurrentUser] = Depends(auth.authenticate)):
+    if user is None:
+        raise HTTPException(status_code=401, detail="Falta el token (Authorization: Bearer ...)", headers={"WWW-Authenticate": "Bearer"})
+    return {"id": user.id, "username": user.username, "role": user.role}
+
+# Para el balanceador y los healthchecks: no toca la base
+@app.get("/health", include_in_schema=False)
+def health():
+    return {"status": "ok"}
+
+# Métricas para Prometheus
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# Novedades de tickets por Server-Sent Events: un mensaje chico por cambio en vez de recargar la lista
+@app.get("/tickets/stream")
+async def stream_tickets(
+    request: Request,
+    last_event_id: Optional[int] = Query(None),
+    last_event_id_header: Optional[int] = Header(None, alias="Last-Event-ID"), # Lo manda EventSource al reconectar
+):
+    resume_from = last_event_id_header if last_event_id_header is not None else last_event_id
+    return StreamingResponse(
+        hub.stream(request, resume_from),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}, # Sin buffer en nginx
+    )
+
+# KPIs del tablero: salen de las tablas resumen que mantienen los triggers (ver ticket_stats.py)
+@app.get("/tickets/stats", response_model=TicketStats)
+def get_tickets_stats(db: Session = Depends(get_read_db)):
+    return get_ticket_stats(db.connection())
+
+# Búsqueda de problemas parecidos en tickets y notas de técnicos (texto completo, ver search.py)
+@app.get("/search", response_model=SearchPage)
+def search_tickets(
+    q: str = Query(..., min_length=2),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+):
+    hits, next_cursor = search.search_tickets(db, q.strip(), limit, cursor)
+    tickets = ticket_dicts(db, [ticket_id for ticket_id, _, _ in hits])
+    return orjson_response({
+        "items": [
+            {"ticket": tickets[ticket_id], "rank": rank, "highlights": highlights}
+            for ticket_id, rank, highlights in hits if ticket_id in tickets
+        ],
+        "next_cursor": next_cursor,
+    })
+
+# Qué atender ahora: lo pendiente del técnico por urgencia, o por cercanía a donde está parado
+@app.get("/technicians/{technician_id}/queue", response_model=List[QueueItem])
+def get_technician_queue(
+    technician_id: int,
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+    order: Literal["priority", "nearest"] = "priority",
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+):
+    if (lat is None) != (lon is None):
+        raise HTTPException(status_code=400, detail="lat y lon van juntos")
+    if order == "nearest" and lat is None:
+        raise HTTPException(status_code=400, detail="Para ordenar por cercanía hace falta la posición (lat, lon)")
+    if db.get(models.User, technician_id) is None:
+        raise HTTPException(status_code=404, detail="Técnico no encontrado")
+    rows = db.execute(technician_queue_select(technician_id, limit, lat, lon, order)).all()
+    return orjson_response([queue_row_to_dict(row) for row in rows])
+
+# Cambios desde el último token para la app offline de los técnicos (sin since: todo, paginado)
+@app.get("/sync", response_model=SyncPage)
+def get_sync(
+    since: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=sync.SYNC_PAGE_MAX),
+    db: Session = Depends(get_db),
+):
+    return orjson_response(sync.read_changes(db, since, limit))
+
+# Planillas cargadas sin conexión: altas idempotentes por client_ref y ediciones con detección de conflictos
+@app.post("/sync/service_sheets", response_model=ServiceSheetUploadResult)
+def upload_service_sheets(batch: ServiceSheetUploadBatch, db: Session = Depends(get_db)):
+    if any(sheet.id is not None and sheet.base_updated_at is None for sheet in batch.sheets):
+        raise HTTPException(status_code=400, detail="Para editar una planilla hace falta base_updated_at")
+    result = sync.upload_service_sheets(db, [sheet.model_dump() for sheet in batch.sheets])
+    db.commit()
+    return orjson_response(result)
+
+# Materiales usados por ítem, técnico y período (conciliación de stock), agregados en SQL
+@app.get("/reports/materials", response_model=MaterialsReport)
+def get_materials_report(
+    period: Literal["day", "week", "month", "year"] = "month",
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None, # Exclusivo: el mes de septiembre es 2026-09-01 a 2026-10-01
+    author_id: Optional[int] = None,
+    item: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+):
+    return orjson_response(materials.materials_report(db.connection(), period, date_from, date_to, author_id, item))
+
+# Lotes del poller de las OLTs: CSV (text/csv) o JSON lines (application/x-ndjson), opcionalmente gzip
+async def raw_body(request: Request) -> bytes:
+    return await request.body()
+
+@app.post("/telemetry/onu_readings", response_model=OnuReadingsResult)
+def ingest_onu_readings(
+    body: bytes = Depends(raw_body),
+    content_type: Optional[str] = Header(None),
+    content_encoding: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    result = telemetry.ingest_body(db, body, content_type, content_encoding)
+    db.commit()
+    return orjson_response(result)
+
+# Historial de señal de un servicio; con resolution=auto: crudo hasta 2 días, por hora hasta 60, si no por día
+@app.get("/services/{service_id}/signal", response_model=SignalHistory)
+def get_service_signal(
+    service_id: int,
+    date_from: Optional[datetime] = None, # Por defecto, las últimas 24 horas
+    date_to: Optional[datetime] = None,
+    resolution: Literal["auto", "raw", "hour", "day"] = "auto",
+    db: Session = Depends(get_read_db),
+):
+    date_to = telemetry.as_utc(date_to) or datetime.now(timezone.utc)
+    date_from = telemetry.as_utc(date_from) or date_to - timedelta(days=1)
+    if date_from >= date_to:
+        raise HTTPException(status_code=400, detail="date_from tiene que ser anterior a date_to")
+    resolution = telemetry.pick_resolution(date_from, date_to, resolution)
+    if resolution == "raw" and date_to - date_from > telemetry.RAW_MAX_SPAN:
+        raise HTTPException(status_code=400, detail="Demasiado rango para lecturas crudas: usar resolution=hour o day")
+    if db.get(models.ClientService, service_id) is None:
+        raise HTTPException(status_code=404, detail="Servicio no encontrado")
+    return orjson_response(telemetry.signal_history(db.connection(), service_id, date_from, date_to, resolution))
+
+# Tickets agrupados por caja NAP o subred: un corte de troncal se atiende como un solo incidente
+@app.get("/incidents", response_model=IncidentPage)
+def get_incidents(
+    status: Literal["open", "closed"] = "open",
+    kind: Optional[Literal["nap", "subnet"]] = None,
+    min_tickets: int = Query(incidents.MIN_TICKETS, ge=1),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+):
+    before_id = decode_cursor(cursor) if cursor else None
+    items = incidents.list_incidents(db.connection(), status, kind, min_tickets, limit, before_id)
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1]["id"])
+    return orjson_response({"items": items, "next_cursor": next_cursor})
+
+@app.get("/incidents/{incident_id}", response_model=IncidentDetail)
+def get_incident(incident_id: int, db: Session = Depends(get_read_db)):
+    found = incidents.get_incident(db.connection(), incident_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Incidente no encontrado")
+    incident, ticket_ids = found
+    tickets = ticket_dicts(db, ticket_ids, (incident["opened_at"], incident["last_ticket_at"]))
+    incident["tickets"] = [tickets[ticket_id] for ticket_id in ticket_ids if ticket_id in tickets]
+    return orjson_response(incident)
+
+# Exportaciones para gerencia: se envían mientras se leen (memoria constante, sin importar el tamaño)
+@app.get("/exports/tickets")
+def export_tickets(
+    format: Literal["csv", "xlsx"] = "csv",
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    status: Optional[List[str]] = Query(None), # ?status=open&status=in_progress
+):
+    names, stmt = exports.tickets_export_select(date_from, date_to, status)
+    return exports.export_response("tickets", names, stmt, format)
+
+@app.get("/exports/service_sheets")
+def export_service_sheets(
+    format: Literal["csv", "xlsx"] = "csv",
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    status: Optional[List[str]] = Query(None), # Estado del ticket de la planilla
+):
+    names, stmt = exports.service_sheets_export_select(date_from, date_to, status)
+    return exports.export_response("planillas", names, stmt, format)
+
+# Catálogo de planes (también cacheado)
+@app.get("/plans", response_model=List[PlanCatalogSchema])
+def get_plans(request: Request, db: Session = Depends(get_db)):
+    key = catalog_key("plans", db.execute(CATALOG_VERSION_SQL).scalar())
+    hit = cache.get(key)
+    if hit is None:
+        plans = db.execute(select(models.Plan).order_by(models.Plan.name)).scalars().all()
+        hit = cache.set(key, dump_json(plans_adapter, plans), *data_version("plans", len(plans), [plan.updated_at for plan in plans]))
+    return cached_response(request, *hit)
+
+# Servicio con cliente y plan tal como lo muestra TicketResponse, desde caché (misma versión que el combo)
+def service_summary(db: Session, service_id: int):
+    key = catalog_key(str(service_id), db.execute(CATALOG_VERSION_SQL).scalar())
+    hit = service_cache.get(key)
+    if hit is None:
+        service = db.execute(
+            services_options_select().where(models.ClientService.id == service_id)
+        ).scalar_one_or_none()
+        if service is None:
+            return None
+        hit = service_cache.set(key, dump_json(service_adapter, service))
+    return orjson.loads(hit[1])
 
 # NUEVO: Endpoint para CREAR el ticket
 @app.post("/tickets", response_model=TicketResponse)
-def create_ticket(ticket: TicketCreate, db: Session = Depends(get_db)):
-    # 1. Creamos el objeto DB
-    db_ticket = models.Ticket(
-        title=ticket.title,
-        description=ticket.description,
-        priority=ticket.priority,
-        service_id=ticket.service_id,
-        status="open",          # Por defecto
-        creator_id=1,           # HARDCODE: Asumimos que lo crea el Admin (ID 1)
-        created_at=datetime.now()
-    )
-    # 2. Guardamos
-    db.add(db_ticket)
+def create_ticket(
+    ticket: TicketCreate, db: Session = Depends(get_db),
+    user: Optional[auth.CurrentUser] = Depends(auth.authenticate),
+):
+    # 1. Servicio/cliente/plan para la respuesta (normalmente ya en caché: sin ir a la base)
+    service = service_summary(db, ticket.service_id)
+    if service is None:
+        raise HTTPException(status_code=400, detail="Servicio inexistente")
+
+    # 2. INSERT ... RETURNING: id y created_at (lo pone la base) vuelven en el mismo viaje
+    row = db.execute(
+        insert(models.Ticket).values(
+            title=ticket.title,
+            description=ticket.description,
+            priority=ticket.priority,
+            service_id=ticket.service_id,
+            status="open",          # Por defecto
+            creator_id=user.id if user else 1, # Sin token (AUTH_REQUIRED=0): el Admin (ID 1), como antes
+        ).returning(models.Ticket.id, models.Ticket.created_at)
+    ).one()
+    queue_ticket_events(db, [row.id], "created") # El INSERT directo no pasa por el flush
     db.commit()
-    db.refresh(db_ticket)
-    
-    # 3. Importante: Recargamos relaciones para devolver el JSON completo con Cliente/Plan
-    # Si no hacemos esto, el frontend recibe el ticket pero con "service: null" y explota
-    ticket_con_datos = db.query(models.Ticket).options(
-        joinedload(models.Ticket.service).joinedload(models.ClientService.client),
-        joinedload(models.Ticket.service).joinedload(models.ClientService.plan)
-    ).filter(models.Ticket.id == db_ticket.id).first()
-    
-    return ticket_con_datos
\ No newline at end of file
+
+    # 3. Armamos la respuesta en memoria: nada de refresh ni de volver a consultar con joins
+    return orjson_response({
+        "id": row.id,
+        "title": ticket.title,
+        "priority": ticket.priority,
+        "status": "open",
+        "category": None,
+        "description": ticket.description,
+        "created_at": row.created_at,
+        "service": service,
+    })
+
+# Alta masiva: un INSERT multi-fila con RETURNING y una sola consulta para devolver los tickets completos
+@app.post("/tickets/batch", response_model=TicketBatchResult)
+def create_tickets_batch(
+    batch: TicketBatchCreate, db: Session = Depends(get_db),
+    user: Optional[auth.CurrentUser] = Depends(auth.authenticate),
+):
+    service_ids = {t.service_id for t in batch.tickets}
+    existing = set(db.execute(
+        select(models.ClientService.id).where(models.ClientService.id.in_(service_ids))
+    ).scalars())
+
+    results, rows = [], []
+    for index, t in enumerate(batch.tickets):
+        if t.service_id not in existing:
+            results.append({"index": index, "ok": False, "error": "Servicio inexistente"})
+            continue
+        results.append({"index": index, "ok": True})
+        rows.append({
+            "title": t.title,
+            "description": t.description,
+            "priority": t.priority,
+            "service_id": t.service_id,
+            "status": "open",
+            "creator_id": user.id if user else 1, # Igual que POST /tickets
+        })
+
+    if rows:
+        # created_at lo pone la base (server_default); RETURNING respeta el orden del pedido
+        inserted = db.execute(
+            insert(models.Ticket).returning(models.Ticket.id, models.Ticket.created_at, sort_by_parameter_order=True), rows
+        ).all()
+        ids = [row.id for row in inserted]
+        queue_ticket_events(db, ids, "created") # El INSERT masivo no pasa por el flush
+        created = [row.created_at for row in inserted]
+        tickets = ticket_dicts(db, ids, (min(created), max(created)))
+        for item, ticket_id in zip((r for r in results if r["ok"]), ids):
+            item["id"] = ticket_id
+            item["ticket"] = tickets[ticket_id]
+    db.commit()
+
+    return orjson_response({"ok_count": len(rows), "error_count": len(results) - len(rows), "results": results})
+
+# Cambio masivo de estado y/o técnico asignado: un UPDATE ... WHERE id IN (...) RETURNING
+@app.patch("/tickets/batch", response_model=TicketBatchResult)
+def update_tickets_batch(batch: TicketBatchUpdate, db: Session = Depends(get_db)):
+    values = {}
+    if batch.status is not None:
+        values["status"] = batch.status
+    if "assigned_id" in batch.model_fields_set:
+        if batch.assigned_id is not None and db.get(models.User, batch.assigned_id) is None:
+            raise HTTPException(status_code=400, detail="Técnico inexistente")
+        values["assigned_id"] = batch.assigned_id
+    if not values:
+        raise HTTPException(status_code=400, detail="Nada para actualizar: indicar status y/o assigned_id")
+
+    ticket_ids = list(dict.fromkeys(batch.ticket_ids)) # Sin repetidos, en el orden del pedido
+    returned = db.execute(
+        update(models.Ticket)
+        .where(models.Ticket.id.in_(ticket_ids))
+        .values(**values)
+        .returning(models.Ticket.id, models.Ticket.created_at)
+        .execution_options(synchronize_session=False)
+    ).all()
+    updated = {row.id for row in returned}
+    queue_ticket_events(db, updated)
+    created = [row.created_at for row in returned]
+    tickets = ticket_dicts(db, updated, (min(created), max(created))) if updated else {}
+    db.commit()
+
+    results = [
+        {"id": ticket_id, "ok": True, "ticket": tickets[ticket_id]} if ticket_id in updated
+        else {"id": ticket_id, "ok": False, "error": "Ticket inexistente"}
+        for ticket_id in ticket_ids
+    ]
+    return orjson_response({"ok_count": len(updated), "error_count": len(ticket_ids) - len(updated), "results": results})
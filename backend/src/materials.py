@@ -0,0 +1,156 @@
+# backend/src/materials.py
+# Consumo de materiales de las planillas (GET /reports/materials).
+#
+# materials_used es un JSON libre que carga el técnico ({"cable_drop_m": 120, "onu": 1, ...}). Unos
+# triggers, en la misma transacción que escribe la planilla, mantienen:
+#   - service_sheet_materials:       una fila por (planilla, ítem) con la cantidad, el técnico y la fecha
+#   - service_sheet_materials_daily: totales por (día, técnico, ítem), de donde sale el reporte
+# Así "cuántos metros de drop y cuántas ONUs se usaron por mes y por técnico" suma unos miles de filas
+# en vez de recorrer cada JSON en Python (ni el detalle de cada planilla).
+#
+# Las filas de las planillas archivadas (partitions.py archive) se quedan: el historial de consumo
+# sigue disponible aunque la planilla ya no esté en la tabla activa.
+#
+# Mantenimiento:
+#   python src/materials.py backfill [--batch 5000]   # desarma las planillas existentes, de a lotes
+#   python src/materials.py check                     # compara el detalle contra el JSON y los totales contra el detalle
+#   python src/materials.py rebuild                   # recalcula los totales diarios desde el detalle
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+
+BACKFILL_BATCH = int(os.getenv("MATERIALS_BACKFILL_BATCH", "5000"))
+
+# Los triggers y funciones están en la migración e7a2c4f9b016. Ítem normalizado (minúsculas, sin
+# espacios en los bordes) y cantidad: números o textos numéricos ("12", "2,5"); lo demás (notas,
+# listas, negativos) no cuenta como consumo. Si dos claves quedan iguales al normalizar ("ONU" y
+# "onu") se suman.
+
+# Detalle por (período, técnico, ítem) y total por (período, ítem) en la misma pasada (GROUPING SETS),
+# desde los totales diarios: un mes son a lo sumo días x técnicos x ítems filas
+REPORT_SQL = text("""
+SELECT period, author_id, username, item, sum(quantity)::float8 AS quantity, sum(sheets)::int AS sheets,
+       GROUPING(author_id) = 1 AS is_total
+FROM (
+    SELECT date_trunc(:period, d.day::timestamp)::date AS period, NULLIF(d.author_id, 0) AS author_id, u.username,
+           d.item, d.quantity, d.sheets
+    FROM service_sheet_materials_daily d
+    LEFT JOIN users u ON u.id = d.author_id
+    WHERE d.sheets > 0
+      AND (CAST(:date_from AS date) IS NULL OR d.day >= :date_from)
+      AND (CAST(:date_to AS date) IS NULL OR d.day < :date_to)
+      AND (CAST(:author_id AS integer) IS NULL OR d.author_id = :author_id)
+      AND (CAST(:item AS text) IS NULL OR d.item = lower(btrim(:item)))
+) d
+GROUP BY GROUPING SETS ((period, author_id, username, item), (period, item))
+ORDER BY period, item, author_id
+""")
+
+# Backfill por rangos de id: cada lote es una transacción corta (no bloquea las planillas por minutos)
+BATCH_END_SQL = text("SELECT max(id), count(*) FROM (SELECT id FROM service_sheets WHERE id > :after ORDER BY id LIMIT :batch) b")
+DELETE_RANGE_SQL = text("DELETE FROM service_sheet_materials WHERE sheet_id > :after AND sheet_id <= :last")
+INSERT_RANGE_SQL = text("""
+INSERT INTO service_sheet_materials (sheet_id, item, quantity, author_id, used_at)
+SELECT s.id, i.item, i.quantity, s.author_id, COALESCE(s.started_at, s.created_at)
+  FROM service_sheets s, materials_items(s.materials_used) i
+ WHERE s.id > :after AND s.id <= :last
+""")
+
+# Planillas cuyo detalle no coincide con su JSON actual (las archivadas no se comparan)
+CHECK_SQL = text("""
+WITH fresh AS (
+    SELECT s.id AS sheet_id, i.item, i.quantity, s.author_id, COALESCE(s.started_at, s.created_at) AS used_at
+      FROM service_sheets s, materials_items(s.materials_used) i
+), stored AS (
+    SELECT m.sheet_id, m.item, m.quantity, m.author_id, m.used_at
+      FROM service_sheet_materials m JOIN service_sheets s ON s.id = m.sheet_id
+)
+SELECT DISTINCT sheet_id FROM ((SELECT * FROM fresh EXCEPT SELECT * FROM stored)
+                               UNION ALL (SELECT * FROM stored EXCEPT SELECT * FROM fresh)) d
+ORDER BY sheet_id
+""")
+
+
+def materials_report(conn, period="month", date_from=None, date_to=None, author_id=None, item=None):
+    rows = conn.execute(REPORT_SQL, {
+        "period": period, "date_from": date_from, "date_to": date_to, "author_id": author_id, "item": item,
+    }).all()
+    report = {"period": period, "rows": [], "totals": []}
+    for row in rows:
+        if row.is_total:
+            report["totals"].append({"period": row.period, "item": row.item, "quantity": row.quantity, "sheets": row.sheets})
+        else:
+            report["rows"].append({
+                "period": row.period, "author_id": row.author_id, "technician": row.username,
+                "item": row.item, "quantity": row.quantity, "sheets": row.sheets,
+            })
+    return report
+
+
+def backfill(engine, batch=BACKFILL_BATCH):
+    # Se puede repetir: cada rango se borra y se vuelve a armar desde el JSON
+    after, sheets = 0, 0
+    while True:
+        with engine.begin() as conn:
+            last, count = conn.execute(BATCH_END_SQL, {"after": after, "batch": batch}).one()
+            if last is None:
+                return sheets
+            conn.execute(DELETE_RANGE_SQL, {"after": after, "last": last})
+            conn.execute(INSERT_RANGE_SQL, {"after": after, "last": last})
+        sheets += count
+        print(f"   ... hasta la planilla {last} ({sheets} planillas)")
+        after = last
+
+
+# Totales diarios que no coinciden con la suma del detalle
+CHECK_DAILY_SQL = text("""
+SELECT day, author_id, item FROM (
+    (SELECT day, author_id, item, quantity, sheets FROM service_sheet_materials_daily WHERE sheets <> 0
+     EXCEPT
+     SELECT used_at::date, COALESCE(author_id, 0), item, sum(quantity), count(*)
+       FROM service_sheet_materials WHERE used_at IS NOT NULL GROUP BY 1, 2, 3)
+    UNION ALL
+    (SELECT used_at::date, COALESCE(author_id, 0), item, sum(quantity), count(*)
+       FROM service_sheet_materials WHERE used_at IS NOT NULL GROUP BY 1, 2, 3
+     EXCEPT
+     SELECT day, author_id, item, quantity, sheets FROM service_sheet_materials_daily WHERE sheets <> 0)
+) d
+ORDER BY 1, 2, 3
+""")
+
+
+def check(conn):
+    # (planillas con el detalle distinto a su JSON, totales diarios distintos al detalle)
+    return conn.execute(CHECK_SQL).scalars().all(), conn.execute(CHECK_DAILY_SQL).all()
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    parser = argparse.ArgumentParser(description="Mantenimiento del detalle de materiales de las planillas.")
+    parser.add_argument("command", choices=["backfill", "check", "rebuild"])
+    parser.add_argument("--batch", type=int, default=BACKFILL_BATCH, help="Planillas por transacción")
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        print(f"✅ {backfill(engine, args.batch)} planillas procesadas.")
+    elif args.command == "rebuild":
+        with engine.begin() as conn:
+            conn.execute(text("LOCK TABLE service_sheet_materials IN SHARE ROW EXCLUSIVE MODE")) # Que nadie escriba mientras tanto
+            conn.execute(text("SELECT materials_daily_rebuild()"))
+        print("✅ Totales diarios recalculados.")
+    else:
+        with engine.connect() as conn:
+            sheet_ids, days = check(conn)
+        if sheet_ids:
+            shown = ", ".join(map(str, sheet_ids[:20])) + (" ..." if len(sheet_ids) > 20 else "")
+            print(f"⚠️  {len(sheet_ids)} planillas con materiales distintos a su JSON: {shown} (correr backfill)")
+        if days:
+            print(f"⚠️  {len(days)} totales diarios distintos al detalle, ej: {tuple(days[0])} (correr rebuild)")
+        if sheet_ids or days:
+            sys.exit(1)
+        print("✅ El detalle de materiales coincide con las planillas y los totales con el detalle.")
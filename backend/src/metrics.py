@@ -0,0 +1,182 @@
+# backend/src/metrics.py
+# Instrumentación de requests y de SQL: cuánto tarda cada endpoint, cuántas consultas hace,
+# cuánto tiempo pasa en la base y cuántas filas trae. Se expone en formato Prometheus en /metrics.
+# Las métricas viven en memoria de cada worker (Prometheus suma los workers al scrapear cada uno).
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10")) # Misma sentencia repetida N veces
+
+log = logging.getLogger("emerald.perf")
+
+
+class RequestStats:
+    def __init__(self):
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.rows = 0
+        self.slow_queries = 0
+        self.by_statement = Counter()
+
+# Estadísticas del request en curso (el threadpool de Starlette copia el contexto, así que los
+# endpoints sync también escriben sobre el mismo objeto)
+current_request: ContextVar[RequestStats | None] = ContextVar("current_request", default=None)
+
+
+# --- MÉTRICAS EN FORMATO PROMETHEUS ---
+class Histogram:
+    def __init__(self, name, help_text, buckets, labels):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = sorted(buckets)
+        self.labels = labels
+        self._series = {} # valores de labels -> [conteo por bucket..., suma, total]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.setdefault(label_values, [0] * len(self.buckets) + [0.0, 0])
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for label_values, series in items:
+            labels = ",".join(f'{k}="{v}"' for k, v in zip(self.labels, label_values))
+            sep = "," if labels else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{bound:g}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels}{sep}le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{{{labels}}} {series[-1]}")
+        return lines
+
+
+class CounterMetric:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            labels = ",".join(f'{k}="{v}"' for k, v in zip(self.labels, label_values))
+            lines.append(f"{self.name}{{{labels}}} {value}")
+        return lines
+
+
+SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+REQUEST_LATENCY = Histogram("emerald_http_request_duration_seconds", "Latencia total del request", SECONDS, ("method", "route", "status"))
+REQUEST_SQL_TIME = Histogram("emerald_http_request_sql_duration_seconds", "Tiempo en la base por request", SECONDS, ("route",))
+REQUEST_SQL_STATEMENTS = Histogram("emerald_http_request_sql_statements", "Sentencias SQL por request", (0, 1, 2, 3, 5, 10, 25, 50, 100), ("route",))
+REQUEST_SQL_ROWS = Histogram("emerald_http_request_sql_rows", "Filas devueltas por la base por request", (0, 1, 10, 100, 1000, 10000, 100000), ("route",))
+SLOW_QUERIES = CounterMetric("emerald_sql_slow_queries_total", "Consultas por encima de SLOW_QUERY_MS", ("route",))
+N_PLUS_ONE = CounterMetric("emerald_sql_n_plus_one_total", "Requests con la misma sentencia repetida muchas veces", ("route",))
+
+ALL_METRICS = (REQUEST_LATENCY, REQUEST_SQL_TIME, REQUEST_SQL_STATEMENTS, REQUEST_SQL_ROWS, SLOW_QUERIES, N_PLUS_ONE)
+
+def render_metrics() -> str:
+    lines = []
+    for metric in ALL_METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- HOOKS DE SQLALCHEMY ---
+def instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        stats = current_request.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.sql_seconds += elapsed
+            stats.rows += max(cursor.rowcount, 0)
+            stats.by_statement[statement] += 1
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            if stats is not None:
+                stats.slow_queries += 1 # Se cuenta al cerrar el request, cuando ya sabemos la ruta
+            else:
+                SLOW_QUERIES.inc("-")
+            log.warning("Consulta lenta (%.0f ms): %s", elapsed * 1000, " ".join(statement.split())[:500])
+
+
+# --- MIDDLEWARE ---
+class MetricsMiddleware:
+    """Middleware ASGI puro (no envuelve el body, así no rompe respuestas en streaming)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request.reset(token)
+            route = scope.get("route")
+            # Usamos la plantilla de la ruta ("/technicians/{id}/queue"), no la URL: cardinalidad acotada
+            self.record(scope["method"], getattr(route, "path", "unmatched"), status, elapsed, stats)
+
+    def record(self, method, route, status, elapsed, stats):
+        if route in ("/metrics", "/health", "/tickets/stream"): # El stream dura lo que dure la conexión
+            return
+        REQUEST_LATENCY.observe(elapsed, method, route, str(status))
+        REQUEST_SQL_TIME.observe(stats.sql_seconds, route)
+        REQUEST_SQL_STATEMENTS.observe(stats.statements, route)
+        REQUEST_SQL_ROWS.observe(stats.rows, route)
+        if stats.slow_queries:
+            SLOW_QUERIES.inc(route, amount=stats.slow_queries)
+
+        if stats.by_statement:
+            statement, repeats = stats.by_statement.most_common(1)[0]
+            if repeats >= N_PLUS_ONE_THRESHOLD:
+                N_PLUS_ONE.inc(route)
+                log.warning("Posible N+1 en %s %s: %d veces la misma consulta: %s",
+                            method, route, repeats, " ".join(statement.split())[:300])
+        if elapsed * 1000 >= SLOW_REQUEST_MS:
+            log.warning("Request lento %s %s: %.0f ms total, %d consultas, %.0f ms en SQL, %d filas",
+                        method, route, elapsed * 1000, stats.statements, stats.sql_seconds * 1000, stats.rows)
@@ -1,9 +1,16 @@
 # backend/src/models.py
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Text, Float, JSON
+from sqlalchemy import Column, Integer, SmallInteger, BigInteger, String, Boolean, ForeignKey, DateTime, Date, Text, Float, Numeric, JSON, Index, Sequence, Computed, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
 
+# El esquema lo crean las migraciones de Alembic (alembic/versions); lo que no se puede declarar en
+# los modelos (extensiones, triggers, funciones, columnas generadas sin mapear) está solo ahí.
+
+# Los índices trigram (búsqueda tipo "typeahead") necesitan la extensión pg_trgm (migración b41d0e6f8a27)
+def trgm_index(name, column):
+    return Index(name, column, postgresql_using="gin", postgresql_ops={column: "gin_trgm_ops"})
+
 class User(Base):
     __tablename__ = "users"
     
@@ -17,13 +24,18 @@ class User(Base):
 
 class Client(Base):
     __tablename__ = "clients"
+    __table_args__ = (
+        trgm_index("ix_clients_name_trgm", "name"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
+    external_id = Column(String, unique=True, index=True, nullable=True) # ID en el sistema anterior (importación)
     name = Column(String, index=True)
     billing_address = Column(String)
     phone = Column(String)
     email = Column(String)
     cuit = Column(String)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True) # ETag de los listados
     
     services = relationship("ClientService", back_populates="client")
 
@@ -34,43 +46,81 @@ class Plan(Base):
     bandwidth_down = Column(Integer) # Bajada (Mbps)
     bandwidth_up = Column(Integer)   # Subida (Mbps) - AGREGADO
     price = Column(Float, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
 class ClientService(Base):
     __tablename__ = "client_services"
+    __table_args__ = (
+        trgm_index("ix_client_services_ip_address_trgm", "ip_address"),
+        trgm_index("ix_client_services_mac_address_trgm", "mac_address"),
+        trgm_index("ix_client_services_installation_address_trgm", "installation_address"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    client_id = Column(Integer, ForeignKey("clients.id"))
-    plan_id = Column(Integer, ForeignKey("plans.id")) 
+    external_id = Column(String, unique=True, index=True, nullable=True)
+    client_id = Column(Integer, ForeignKey("clients.id"), index=True)
+    plan_id = Column(Integer, ForeignKey("plans.id"), index=True)
     
     ip_address = Column(String, nullable=True)
     mac_address = Column(String, nullable=True)
     installation_address = Column(String)
-    geolocation = Column(String)
+    geolocation = Column(String) # "lat,lon" tal como lo carga el operador
+    # Coordenadas numéricas para ordenar por cercanía sin parsear texto en cada consulta
+    latitude = Column(Float, nullable=True)  # Las completa un trigger a partir de geolocation (migración b6d2f9a4c813)
+    longitude = Column(Float, nullable=True) # (NULL si no tiene o no se entiende)
     site_contact_name = Column(String, nullable=True)
     site_contact_phone = Column(String, nullable=True)
+    onu_sn = Column(String, nullable=True, index=True) # ONU de la última planilla (trigger, ver telemetry.py)
+    nap_box = Column(String, nullable=True, index=True) # Caja NAP normalizada de la última planilla (trigger, ver incidents.py)
+    subnet = Column(String, nullable=True, index=True)  # /24 de ip_address (trigger, ver incidents.py)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True)
 
     client = relationship("Client", back_populates="services")
     plan = relationship("Plan") # Relación con el Plan
     tickets = relationship("Ticket", back_populates="service")
 
+PRIORITY_RANK_SQL = "CASE priority WHEN 'critical' THEN 4 WHEN 'high' THEN 3 WHEN 'medium' THEN 2 WHEN 'low' THEN 1 ELSE 0 END"
+
 class Ticket(Base):
+    # Con la migración e2b7f90c4d16 la tabla se particiona por mes de created_at (ver partitions.py):
+    # allí la clave es (id, created_at) y external_id queda con un índice común, sin UNIQUE
     __tablename__ = "tickets"
+    __table_args__ = (
+        # Bandeja filtrada por estado, paginada por ID descendente (GET /tickets?status=...)
+        Index("ix_tickets_status_id", "status", text("id DESC")),
+        # "Mis tickets abiertos" por técnico, ordenados por fecha (índice parcial: solo lo pendiente)
+        Index(
+            "ix_tickets_assigned_open_created",
+            "assigned_id", "created_at",
+            postgresql_where=text("status IN ('open', 'in_progress')"),
+        ),
+        # Cola de trabajo de cada técnico: lo pendiente, más urgente y más viejo primero (top-K por índice)
+        Index(
+            "ix_tickets_queue",
+            "assigned_id", text("priority_rank DESC"), "created_at",
+            postgresql_where=text("status IN ('open', 'in_progress')"),
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    service_id = Column(Integer, ForeignKey("client_services.id"))
+    external_id = Column(String, unique=True, index=True, nullable=True)
+    service_id = Column(Integer, ForeignKey("client_services.id"), index=True)
     creator_id = Column(Integer, ForeignKey("users.id"))
     assigned_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     
     category = Column(String) # "Tecnico", "Admin", "Ventas"
     status = Column(String, default="open") 
     priority = Column(String, default="medium")
+    # Prioridad como número para ordenar e indexar (critical > high > medium > low); la calcula Postgres
+    priority_rank = Column(SmallInteger, Computed(PRIORITY_RANK_SQL, persisted=True))
     
     title = Column(String)
     description = Column(Text)
     public_note = Column(Text, nullable=True)
     
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), index=True) # NULL = nunca se editó
+    resolved_at = Column(DateTime(timezone=True), nullable=True) # Lo completa un trigger al pasar a resolved/closed
 
     service = relationship("ClientService", back_populates="tickets")
     work_orders = relationship("ServiceSheet", back_populates="ticket")
@@ -78,10 +128,11 @@ class Ticket(Base):
     assigned = relationship("User", foreign_keys=[assigned_id])
 
 class ServiceSheet(Base):
+    # También particionada por mes con la migración e2b7f90c4d16 (sin FK real hacia tickets)
     __tablename__ = "service_sheets"
     
     id = Column(Integer, primary_key=True, index=True)
-    ticket_id = Column(Integer, ForeignKey("tickets.id"))
+    ticket_id = Column(Integer, ForeignKey("tickets.id"), index=True)
     author_id = Column(Integer, ForeignKey("users.id"))
     
     started_at = Column(DateTime(timezone=True))
@@ -93,5 +144,154 @@ class ServiceSheet(Base):
     tech_notes = Column(Text)
     photos_url = Column(JSON, default=[])
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now()) # Conflictos al subir desde la app
+    client_ref = Column(String, nullable=True, index=True) # Id que le puso la app offline: los reintentos no duplican
+
+    ticket = relationship("Ticket", back_populates="work_orders")
+
+# --- CONSUMO DE MATERIALES (los mantienen triggers, ver materials.py) ---
+# Detalle de materials_used, una fila por ítem. Sin FK a service_sheets: las filas de planillas
+# archivadas quedan para el historial de consumo.
+class ServiceSheetMaterial(Base):
+    __tablename__ = "service_sheet_materials"
+
+    sheet_id = Column(Integer, primary_key=True)
+    item = Column(String, primary_key=True) # Clave del JSON normalizada (minúsculas, sin espacios)
+    quantity = Column(Numeric(14, 3), nullable=False)
+    author_id = Column(Integer, nullable=True) # Técnico de la planilla
+    used_at = Column(DateTime(timezone=True), nullable=True) # started_at de la planilla (o created_at)
+
+class ServiceSheetMaterialDaily(Base):
+    __tablename__ = "service_sheet_materials_daily"
+
+    day = Column(Date, primary_key=True)
+    author_id = Column(Integer, primary_key=True) # 0 = sin técnico
+    item = Column(String, primary_key=True)
+    quantity = Column(Numeric(14, 3), nullable=False, default=0)
+    sheets = Column(Integer, nullable=False, default=0) # Planillas del día con ese ítem
+
+# --- POTENCIA ÓPTICA DE LAS ONUs (POST /telemetry/onu_readings, ver telemetry.py) ---
+# Lecturas crudas particionadas por día y resúmenes por hora (particionado por mes) y por día.
+# Sin FK a client_services: el COPY del poller no paga un chequeo por fila (se valida al insertar)
+# y borrar un servicio no obliga a recorrer su historial.
+class OnuReading(Base):
+    __tablename__ = "onu_readings"
+    __table_args__ = {"postgresql_partition_by": "RANGE (read_at)"}
+
+    service_id = Column(Integer, primary_key=True)
+    read_at = Column(DateTime(timezone=True), primary_key=True)
+    rx_dbm = Column(Float(24), nullable=False) # Potencia recibida por la ONU
+    tx_dbm = Column(Float(24), nullable=True)
+
+class OnuReadingHourly(Base):
+    __tablename__ = "onu_readings_hourly"
+    __table_args__ = {"postgresql_partition_by": "RANGE (bucket)"}
+
+    service_id = Column(Integer, primary_key=True)
+    bucket = Column(DateTime(timezone=True), primary_key=True) # Inicio de la hora (UTC)
+    samples = Column(Integer, nullable=False)
+    rx_min = Column(Float(24), nullable=False)
+    rx_max = Column(Float(24), nullable=False)
+    rx_sum = Column(Float, nullable=False) # Promedio = rx_sum / samples (se puede seguir sumando)
+
+class OnuReadingDaily(Base):
+    __tablename__ = "onu_readings_daily"
+
+    service_id = Column(Integer, primary_key=True)
+    bucket = Column(DateTime(timezone=True), primary_key=True) # Inicio del día (UTC)
+    samples = Column(Integer, nullable=False)
+    rx_min = Column(Float(24), nullable=False)
+    rx_max = Column(Float(24), nullable=False)
+    rx_sum = Column(Float, nullable=False)
+
+# --- INCIDENTES: TICKETS DE LA MISMA CAJA NAP O SUBRED (GET /incidents, ver incidents.py) ---
+class Incident(Base):
+    __tablename__ = "incidents"
+    __table_args__ = (
+        # Un solo incidente abierto por caja/subred: el upsert del trigger se apoya en este índice
+        Index("ix_incidents_open_key", "kind", "key", unique=True, postgresql_where=text("status = 'open'")),
+        Index("ix_incidents_status_id", "status", text("id DESC")),
+    )
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False) # nap o subnet
+    key = Column(String, nullable=False) # Caja NAP normalizada o red ("10.1.2.0/24")
+    status = Column(String, nullable=False, default="open") # open: sigue sumando tickets; closed
+    opened_at = Column(DateTime(timezone=True), nullable=False) # Primer ticket
+    last_ticket_at = Column(DateTime(timezone=True), nullable=False)
+    closed_at = Column(DateTime(timezone=True), nullable=True)
+    tickets_count = Column(Integer, nullable=False, default=0)
+    open_count = Column(Integer, nullable=False, default=0) # Tickets todavía pendientes
+
+# Sin FK a tickets (particionada, clave (id, created_at)): lo mantienen los triggers
+class IncidentTicket(Base):
+    __tablename__ = "incident_tickets"
+
+    incident_id = Column(Integer, ForeignKey("incidents.id"), primary_key=True)
+    ticket_id = Column(Integer, primary_key=True, index=True)
+
+# --- BÚSQUEDA DE TEXTO COMPLETO (GET /search, ver search.py) ---
+# Columna tsvector generada por Postgres (configuración 'spanish') con índice GIN: se mantiene sola
+# en cada INSERT/UPDATE. La crea la migración f4a9c2d81e37 en tickets y service_sheets; no se mapea
+# en los modelos: solo la lee la búsqueda y no viaja en cada SELECT.
+
+# --- RESÚMENES PARA EL TABLERO (los mantienen triggers, ver ticket_stats.py) ---
+class TicketStat(Base):
+    __tablename__ = "ticket_stats"
+
+    status = Column(String, primary_key=True)
+    priority = Column(String, primary_key=True)
+    category = Column(String, primary_key=True)  # '' = sin categoría
+    assigned_id = Column(Integer, primary_key=True)  # 0 = sin asignar
+    count = Column(Integer, nullable=False, default=0)
+
+class TicketOpenDay(Base):
+    __tablename__ = "ticket_open_days"
+
+    created_day = Column(Date, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class TicketResolutionStat(Base):
+    __tablename__ = "ticket_resolution_stats"
+
+    category = Column(String, primary_key=True)
+    resolved_count = Column(Integer, nullable=False, default=0)
+    total_seconds = Column(Float, nullable=False, default=0)
+
+# Versión de GET /tickets para el ETag (ver main.py): un contador de cambios que suben triggers por
+# sentencia en cada tabla que muestra la bandeja. Se lee como la suma de sus filas, así que un cambio
+# cuenta recién cuando su transacción confirma y en el orden en que confirman. Un max(updated_at) no
+# sirve: now() es la hora de inicio de la transacción y una que confirma tarde no movía el ETag.
+# Una fila por backend (su pid módulo 16): escritores concurrentes no se esperan en la misma fila.
+# Funciones y triggers (en tickets, client_services, clients y plans): migración e5b2d8f4a173.
+# La caché del catálogo usa otro nombre, 'catalog' (triggers en f8d3b6a2c957, ver cache.py).
+
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+
+    name = Column(String, primary_key=True) # Listado: tickets, catalog (caché, ver cache.py)
+    slot = Column(SmallInteger, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+# --- CAMBIOS PARA LA APP OFFLINE DE LOS TÉCNICOS (GET /sync, ver sync.py) ---
+# Un trigger (migración c3f8a6d1e947) deja una fila por cada INSERT/UPDATE/DELETE de tickets, clients,
+# client_services y service_sheets, con la transacción que la escribió: el token de /sync avanza por
+# transacción terminada, no por id (ver sync.py). Es por sentencia: un lote de 1000 filas es un solo
+# INSERT al log. Las filas DELETE son las "lápidas" que le avisan al cliente que borre su copia.
+
+class SyncChange(Base):
+    __tablename__ = "sync_changes"
+    __table_args__ = (
+        Index("ix_sync_changes_txid_id", "txid", "id"),
+        Index("ix_sync_changes_entity", "entity", "entity_id"), # Compactación (sync.py compact)
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    txid = Column(BigInteger, nullable=False) # pg_current_xact_id() de la transacción que hizo el cambio
+    entity = Column(String, nullable=False) # Tabla: tickets, clients, client_services, service_sheets
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String, nullable=False) # INSERT, UPDATE o DELETE
+    changed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
 
-    ticket = relationship("Ticket", back_populates="work_orders")
\ No newline at end of file
+# Ids de los eventos de /tickets/stream compartidos entre workers (ver ticket_events.py)
+ticket_events_id_seq = Sequence("ticket_events_id_seq", metadata=Base.metadata)
@@ -0,0 +1,230 @@
+# backend/src/partitions.py
+# Mantenimiento de las particiones mensuales de tickets y service_sheets (ver la migración e2b7f90c4d16).
+#
+# Ambas tablas están particionadas por rango de created_at, una partición por mes (UTC):
+# tickets_y2026m01, service_sheets_y2026m01, ... Las consultas acotadas por fecha solo leen los
+# meses que corresponden (partition pruning) y el historial viejo se puede sacar de la tabla activa.
+#
+# Los meses que vienen los crea cada worker de la API al arrancar (ensure_on_startup, solo si falta
+# alguno). Si aun así llega una fila sin su mes (API sin reiniciar por meses, fecha mal cargada), cae
+# en la partición DEFAULT (tickets_default, ...) en vez de fallar el INSERT; create_monthly_partitions
+# la pasa a su mes cuando se crea. `list` muestra cuántas filas hay en la DEFAULT: debería ser 0.
+#
+# Costo conocido: lo que busca por id sin fecha revisa el índice de cada partición (un descenso por
+# mes; con 40 meses, 40). Donde se conoce la fecha se acota: altas y cambios masivos (RETURNING
+# created_at), detalle de incidentes (entre opened_at y last_ticket_at). Quedan sin acotar, porque
+# el id es lo único que llega: el cursor de GET /tickets (id < cursor, un Merge Append que lee una
+# o dos filas por partición), PATCH /tickets/batch (ids del pedido), los eventos de /tickets/stream,
+# los hits de /search y los triggers de service_sheets que buscan su ticket. Del orden de 1 ms con
+# unos años de historial; si crece, archivar meses viejos (`archive`) achica la cuenta.
+#
+# Uso:
+#   python src/partitions.py ensure [--months-ahead 3] [--from 2019-01]  # crea las particiones que falten
+#   python src/partitions.py archive [--older-than 24] [--dry-run]       # mueve meses viejos y cerrados al esquema archive
+#   python src/partitions.py check                                      # verifica con EXPLAIN que haya pruning
+#   python src/partitions.py list
+import argparse
+import logging
+import os
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+
+PARTITIONED_TABLES = ("tickets", "service_sheets")
+MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+ARCHIVE_AFTER_MONTHS = int(os.getenv("PARTITION_ARCHIVE_AFTER_MONTHS", "24"))
+ARCHIVE_SCHEMA = "archive"
+DEFAULT_SUFFIX = "_default"
+
+log = logging.getLogger("emerald.partitions")
+
+# create_monthly_partitions (migración b9e4d7a2c615) crea las particiones mensuales (meses UTC) que
+# falten entre dos fechas; la usan también la importación masiva y la telemetría. Si el padre tiene
+# partición DEFAULT con filas de un mes que se está creando, las mueve: se desengancha la DEFAULT
+# (sin triggers), se arma el mes con sus filas y se vuelven a enganchar las dos. Así los contadores
+# que mantienen los triggers no cambian.
+
+_MONTH = re.compile(r"_y(\d{4})m(\d{2})$")
+
+
+def month_start(year, month):
+    # Normaliza meses fuera de rango (ej: mes 0 = diciembre del año anterior)
+    year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+    return datetime(year, month, 1, tzinfo=timezone.utc)
+
+
+def is_partitioned(conn, table):
+    return conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"
+    ), {"table": table}).scalar()
+
+
+def list_partitions(conn, table):
+    # [(nombre, inicio del mes)] de las particiones adjuntas, de la más vieja a la más nueva
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:table) ORDER BY c.relname"
+    ), {"table": table}).scalars()
+    partitions = []
+    for name in names:
+        match = _MONTH.search(name)
+        if match:
+            partitions.append((name, month_start(int(match.group(1)), int(match.group(2)))))
+    return partitions
+
+
+def default_rows(conn, table):
+    # Filas que cayeron en la partición DEFAULT (None si la tabla no tiene)
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": table + DEFAULT_SUFFIX}).scalar() is None:
+        return None
+    return conn.execute(text(f'SELECT count(*) FROM "{table}{DEFAULT_SUFFIX}"')).scalar()
+
+
+def missing_months(conn, months_ahead=MONTHS_AHEAD):
+    # {tabla: [meses sin partición]} entre el mes actual y months_ahead meses adelante
+    now = datetime.now(timezone.utc)
+    wanted = [month_start(now.year, now.month + offset) for offset in range(months_ahead + 1)]
+    missing = {}
+    for table in PARTITIONED_TABLES:
+        have = {start for _, start in list_partitions(conn, table)}
+        months = [month for month in wanted if month not in have]
+        if months:
+            missing[table] = months
+    return missing
+
+
+def ensure(conn, months_ahead=MONTHS_AHEAD, from_month=None):
+    # Crea lo que falte desde from_month (o el mes actual) hasta months_ahead meses adelante
+    created = {}
+    for table in PARTITIONED_TABLES:
+        created[table] = conn.execute(text(
+            "SELECT create_monthly_partitions(:table, COALESCE(:from_month, now()), now() + make_interval(months => :ahead))"
+        ), {"table": table, "from_month": from_month, "ahead": months_ahead}).scalar()
+    return created
+
+
+def ensure_on_startup(engine, months_ahead=MONTHS_AHEAD):
+    # Arranque de cada worker: casi siempre no falta nada y no se toca el esquema. Si falta un mes,
+    # lo crea un solo worker (los demás siguen de largo) y sin esperar más de 5 s por el lock de la tabla.
+    if engine.dialect.name != "postgresql":
+        return {}
+    with engine.begin() as conn:
+        if not all(is_partitioned(conn, table) for table in PARTITIONED_TABLES):
+            return {}
+        if not missing_months(conn, months_ahead):
+            return {}
+        if not conn.execute(text("SELECT pg_try_advisory_xact_lock(hashtext('partitions.ensure'))")).scalar():
+            return {}
+        conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+        created = ensure(conn, months_ahead)
+    log.warning("Particiones nuevas: %s", ", ".join(f"{table} {count}" for table, count in created.items()))
+    return created
+
+
+def archive(conn, older_than_months=ARCHIVE_AFTER_MONTHS, dry_run=False):
+    # Saca de la tabla activa los meses terminados hace más de N meses. Un mes de tickets solo se
+    # archiva si no le queda nada pendiente; las planillas son registros cerrados y se archivan siempre.
+    now = datetime.now(timezone.utc)
+    cutoff = month_start(now.year, now.month - older_than_months)
+    archived, skipped = [], []
+    conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+    for table in PARTITIONED_TABLES:
+        for name, start in list_partitions(conn, table):
+            if start >= cutoff:
+                continue
+            if table == "tickets":
+                pending = conn.execute(text(
+                    f'SELECT count(*) FROM "{name}" '
+                    "WHERE status IS NULL OR status NOT IN ('resolved', 'closed')"
+                )).scalar()
+                if pending:
+                    skipped.append((name, pending))
+                    continue
+            if not dry_run:
+                # DETACH tampoco pasa por el log de /sync (sync.py): una lápida por fila, así la app
+                # offline borra su copia en vez de quedarse con tickets y planillas que ya no ve la API
+                conn.execute(text(
+                    "INSERT INTO sync_changes (txid, entity, entity_id, op) "
+                    f"SELECT pg_current_xact_id()::text::bigint, '{table}', id, 'DELETE' FROM \"{name}\" ORDER BY id"
+                ))
+                conn.execute(text(f'ALTER TABLE {table} DETACH PARTITION "{name}"'))
+                conn.execute(text(f'ALTER TABLE "{name}" SET SCHEMA {ARCHIVE_SCHEMA}'))
+            archived.append(name)
+    if not dry_run and any(name.startswith("tickets_") for name in archived):
+        # DETACH no dispara los triggers: recalculamos el resumen del tablero en la misma transacción
+        # y movemos la versión de GET /tickets (ETag) a mano
+        conn.execute(text("SELECT ticket_stats_rebuild()"))
+        conn.execute(text("SELECT bump_data_version('tickets')"))
+    return archived, skipped
+
+
+def scanned_partitions(conn, sql, params=None):
+    # Particiones que el planificador decide leer para una consulta (EXPLAIN, sin ejecutarla)
+    plan = conn.execute(text("EXPLAIN (FORMAT JSON) " + sql), params or {}).scalar()
+    relations = set()
+    stack = [plan[0]["Plan"]]
+    while stack:
+        node = stack.pop()
+        if "Relation Name" in node:
+            relations.add(node["Relation Name"])
+        stack.extend(node.get("Plans", []))
+    return relations
+
+
+def check(conn, days=30):
+    # Consultas de los últimos N días: tienen que leer solo las particiones de esos meses
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    problems = []
+    for table in PARTITIONED_TABLES:
+        partitions = dict(list_partitions(conn, table))
+        expected = {name for name, start in partitions.items() if start >= month_start(since.year, since.month)}
+        scanned = scanned_partitions(conn, f"SELECT id FROM {table} WHERE created_at >= :since", {"since": since}) & partitions.keys()
+        if not scanned <= expected:
+            problems.append((table, sorted(scanned - expected)))
+    return problems
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    parser = argparse.ArgumentParser(description="Mantenimiento de particiones mensuales.")
+    parser.add_argument("command", choices=["ensure", "archive", "check", "list"])
+    parser.add_argument("--months-ahead", type=int, default=MONTHS_AHEAD)
+    parser.add_argument("--from", dest="from_month", help="YYYY-MM: crear también meses pasados (cargas históricas)")
+    parser.add_argument("--older-than", type=int, default=ARCHIVE_AFTER_MONTHS, help="Meses")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    with engine.begin() as conn:
+        missing = [table for table in PARTITIONED_TABLES if not is_partitioned(conn, table)]
+        if missing:
+            sys.exit(f"Tablas sin particionar: {', '.join(missing)} (correr alembic upgrade head)")
+
+        if args.command == "ensure":
+            from_month = datetime.strptime(args.from_month, "%Y-%m").replace(tzinfo=timezone.utc) if args.from_month else None
+            for table, created in ensure(conn, args.months_ahead, from_month).items():
+                print(f"✅ {table}: {created} particiones nuevas")
+        elif args.command == "archive":
+            archived, skipped = archive(conn, args.older_than, args.dry_run)
+            for name in archived:
+                print(("   (dry-run) " if args.dry_run else "📦 ") + f"{name} -> {ARCHIVE_SCHEMA}.{name}")
+            for name, pending in skipped:
+                print(f"⚠️  {name}: {pending} tickets sin cerrar, no se archiva")
+            print(f"✅ {len(archived)} particiones archivadas, {len(skipped)} salteadas.")
+        elif args.command == "check":
+            problems = check(conn)
+            if problems:
+                for table, extra in problems:
+                    print(f"⚠️  {table}: la consulta de los últimos 30 días lee además {', '.join(extra)}")
+                sys.exit(1)
+            print("✅ Las consultas por fecha reciente solo leen las particiones de esos meses.")
+        else:
+            for table in PARTITIONED_TABLES:
+                print(f"{table}: " + ", ".join(name for name, _ in list_partitions(conn, table)))
+                stray = default_rows(conn, table)
+                if stray:
+                    print(f"⚠️  {table}{DEFAULT_SUFFIX}: {stray} filas sin su mes (correr ensure con --from)")
@@ -5,13 +5,10 @@ from datetime import datetime
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from database import SessionLocal, engine
+from database import SessionLocal
 import models
 
-# --- ESTA ES LA LÍNEA MÁGICA QUE FALTABA ---
-# Asegura que las tablas existan antes de insertar nada
-models.Base.metadata.create_all(bind=engine)
-# -------------------------------------------
+# Las tablas tienen que existir: se crean con `alembic upgrade head` (ya no las crea la app)
 
 db = SessionLocal()
 
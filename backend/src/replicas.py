@@ -0,0 +1,204 @@
+# backend/src/replicas.py
+# Réplicas de lectura: los endpoints de solo lectura pesados (listados, reportes, búsquedas,
+# exportaciones) pueden ir a réplicas de Postgres y no competir con las escrituras de tickets.
+#
+#   DATABASE_REPLICA_URLS=postgresql://...@replica1/emerald,postgresql://...@replica2/emerald
+#
+# Sin réplicas configuradas todo sigue yendo a la primaria, igual que antes. Con réplicas:
+#   - get_read_db reparte las sesiones entre las réplicas sanas (round-robin); si no hay ninguna,
+#     usa la primaria. Un thread de cada worker chequea las réplicas cada DB_REPLICA_CHECK_SECONDS
+#     (conexión y atraso de replicación) y deja afuera las caídas o atrasadas más de DB_REPLICA_MAX_LAG s.
+#   - Leer lo que uno acaba de escribir: cada escritura exitosa devuelve X-DB-Position (y la cookie
+#     db_position) con la posición del WAL de su commit, leída en la misma conexión que escribió.
+#     Si el cliente la reenvía en la próxima lectura (el frontend lo hace con el header; la cookie
+#     solo viaja si la API está en el mismo origen), solo se usa una réplica que ya la haya
+#     reproducido; si no, la primaria.
+#   - Las escrituras, /sync y lo que llena cachés del proceso (combo de servicios, planes) siguen en la
+#     primaria: una lectura atrasada dejaría la caché vieja hasta la próxima invalidación.
+#
+# Para probar sin replicación se puede apuntar a otra base cualquiera (otro Postgres o un SQLite
+# con los mismos datos): sin LSN, la lectura propia se resuelve por tiempo (DB_READ_YOUR_WRITES_SECONDS).
+# Conviene poner connect_timeout en la URL de cada réplica (?connect_timeout=2): una réplica caída
+# demora el chequeo de las demás hasta ese timeout.
+import itertools
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from fastapi import Request
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import POOL_SETTINGS, SessionLocal, engine
+from metrics import instrument_engine
+
+REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_CHECK_SECONDS = float(os.getenv("DB_REPLICA_CHECK_SECONDS", "5"))
+REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "30")) # Segundos
+READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "10")) # Sin LSN (SQLite / otra base)
+
+POSITION_HEADER = "X-DB-Position"
+POSITION_COOKIE = "db_position"
+
+log = logging.getLogger("emerald.db")
+
+# Atraso (0 si ya reprodujo todo lo recibido: sin escrituras en la primaria no hay atraso aunque
+# el último replay sea viejo) y posición reproducida. En una base que no es réplica, el LSN es NULL.
+REPLICA_STATUS_SQL = """
+SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END,
+       pg_last_wal_replay_lsn()::text
+"""
+
+
+def parse_lsn(value):
+    # "16/B374D848" -> entero comparable
+    high, _, low = value.partition("/")
+    return (int(high, 16) << 32) | int(low, 16)
+
+
+def parse_position(value):
+    # "1760751234.125" o "1760751234.125:16/B374D848" -> (momento de la escritura, LSN o None)
+    if not value:
+        return None
+    try:
+        written_at, _, lsn = value.partition(":")
+        return float(written_at), parse_lsn(lsn) if lsn else None
+    except ValueError:
+        return None # Posición inválida: como si no viniera
+
+
+class Replica:
+    def __init__(self, url):
+        self.engine = create_engine(url, **POOL_SETTINGS)
+        instrument_engine(self.engine)
+        self.name = make_url(url).render_as_string(hide_password=True)
+        self.postgres = self.engine.dialect.name == "postgresql"
+        self.healthy = False # Hasta el primer chequeo las lecturas van a la primaria
+        self.lag = None
+        self.replay_lsn = None
+
+    def check(self):
+        try:
+            with self.engine.connect() as conn:
+                lag, lsn = conn.execute(text(REPLICA_STATUS_SQL if self.postgres else "SELECT 0, NULL")).one()
+            lag = float(lag)
+            healthy, problem = lag <= REPLICA_MAX_LAG, f"atrasada {lag:.1f} s"
+        except SQLAlchemyError as exc:
+            lag, lsn, healthy, problem = None, None, False, f"sin conexión ({exc.__class__.__name__})"
+        if healthy != self.healthy:
+            if healthy:
+                log.warning("Réplica %s en uso", self.name)
+            else:
+                log.warning("Réplica %s fuera de uso: %s", self.name, problem)
+        self.healthy, self.lag = healthy, lag
+        self.replay_lsn = parse_lsn(lsn) if lsn else None
+
+    def has_caught_up(self, position):
+        if position is None:
+            return True
+        written_at, lsn = position
+        if lsn is not None and self.replay_lsn is not None:
+            return self.replay_lsn >= lsn
+        return time.time() - written_at >= READ_YOUR_WRITES_SECONDS
+
+
+class ReadRouter:
+    def __init__(self, primary, urls):
+        self.primary = primary
+        self.replicas = [Replica(url) for url in urls]
+        self._turn = itertools.count()
+        self._monitor_pid = None
+        self._monitor_lock = threading.Lock()
+
+    def start_monitor(self):
+        # Un thread por worker chequea las réplicas cada DB_REPLICA_CHECK_SECONDS, así ningún request
+        # espera el timeout de una réplica caída. Arranca con la primera lectura (después del fork).
+        with self._monitor_lock:
+            if self._monitor_pid != os.getpid():
+                self._monitor_pid = os.getpid()
+                threading.Thread(target=self._monitor, name="replica-monitor", daemon=True).start()
+
+    def _monitor(self):
+        while True:
+            for replica in self.replicas:
+                replica.check()
+            time.sleep(REPLICA_CHECK_SECONDS)
+
+    def pick(self, position=None):
+        # Engine para una lectura: una réplica sana que ya tenga la escritura del cliente, o la primaria
+        if not self.replicas:
+            return self.primary
+        if self._monitor_pid != os.getpid():
+            self.start_monitor()
+        candidates = [r for r in self.replicas if r.healthy and r.has_caught_up(position)]
+        if not candidates:
+            return self.primary
+        return candidates[next(self._turn) % len(candidates)].engine
+
+router = ReadRouter(engine, REPLICA_URLS)
+
+# LSN de los commits del request en curso (lo llena la sesión, lo lee ReadYourWritesMiddleware).
+# Es una lista y no un valor: el endpoint corre en el threadpool con una copia del contexto, así
+# que lo que agrega se ve desde el middleware solo si comparten el mismo objeto.
+_commit_positions = ContextVar("commit_positions", default=None)
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _keep_commit_connection(session):
+    if _commit_positions.get() is not None and session.get_bind() is engine and engine.dialect.name == "postgresql":
+        session.info["commit_connection"] = session.connection()
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _remember_commit_position(session):
+    # Después del COMMIT y en la misma conexión: el LSN ya incluye el registro del commit
+    conn = session.info.pop("commit_connection", None)
+    if conn is not None:
+        _commit_positions.get().append(conn.exec_driver_sql("SELECT pg_current_wal_lsn()::text").scalar())
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _forget_commit_connection(session, previous_transaction):
+    session.info.pop("commit_connection", None)
+
+
+# Dependencia para los endpoints de solo lectura (FastAPI); misma sesión que get_db, otro engine
+def get_read_db(request: Request):
+    position = parse_position(request.headers.get(POSITION_HEADER) or request.cookies.get(POSITION_COOKIE))
+    db = SessionLocal(bind=router.pick(position))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+class ReadYourWritesMiddleware:
+    """Middleware ASGI puro: agrega X-DB-Position a las escrituras exitosas (solo con réplicas)."""
+
+    def __init__(self, app, read_router=router):
+        self.app = app
+        self.router = read_router
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.router.replicas or scope["method"] in ("GET", "HEAD", "OPTIONS"):
+            return await self.app(scope, receive, send)
+        commits = []
+        _commit_positions.set(commits)
+
+        async def send_wrapper(message):
+            # El endpoint ya hizo commit cuando arranca la respuesta; sin LSN (SQLite, otra base o
+            # un endpoint que no escribió) la lectura propia se resuelve por tiempo
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                position = f"{time.time():.3f}" + (f":{commits[-1]}" if commits else "")
+                cookie = f"{POSITION_COOKIE}={position}; Max-Age={int(max(READ_YOUR_WRITES_SECONDS, REPLICA_MAX_LAG))}; Path=/; HttpOnly; SameSite=Lax"
+                message["headers"] = list(message.get("headers", [])) + [
+                    (POSITION_HEADER.lower().encode(), position.encode()),
+                    (b"set-cookie", cookie.encode()),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
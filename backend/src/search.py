@@ -0,0 +1,103 @@
+# backend/src/search.py
+# Búsqueda de texto completo de "problemas parecidos" (GET /search).
+#
+# Busca en título, descripción y nota pública del ticket y en las notas del técnico de sus planillas,
+# con las columnas search_vector (tsvector generado + índice GIN, ver models.py): la consulta usa
+# el índice en lugar de recorrer la tabla como un ILIKE. Cada ticket aparece una sola vez, con el
+# mejor puntaje entre él y sus planillas, y con fragmentos resaltados de donde coincidió.
+#
+# La consulta se escribe como en un buscador: "luz roja" -onu, "corte de fibra" (frase), a or b.
+import base64
+import html
+import json
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam, text
+
+# Separadores que no aparecen en el texto: se reemplazan por <mark> después de escapar el HTML
+_START, _STOP = "\x02", "\x03"
+HEADLINE_SHORT = f"StartSel={_START}, StopSel={_STOP}, HighlightAll=true"
+HEADLINE_FRAGMENTS = f"StartSel={_START}, StopSel={_STOP}, MaxFragments=2, MaxWords=20, MinWords=8"
+
+# Puntaje de cada ticket: el mejor entre sus propios campos y las notas de sus planillas.
+# ts_rank se pasa a float8 para que el cursor (puntaje, id) compare exacto entre páginas.
+HITS_SQL = text("""
+SELECT ticket_id, max(rank)::float8 AS rank
+FROM (
+    SELECT id AS ticket_id, ts_rank(search_vector, websearch_to_tsquery('spanish', :q)) AS rank
+    FROM tickets WHERE search_vector @@ websearch_to_tsquery('spanish', :q)
+    UNION ALL
+    SELECT ticket_id, ts_rank(search_vector, websearch_to_tsquery('spanish', :q))
+    FROM service_sheets WHERE search_vector @@ websearch_to_tsquery('spanish', :q) AND ticket_id IS NOT NULL
+) hits
+GROUP BY ticket_id
+HAVING CAST(:after_rank AS float8) IS NULL OR (max(rank)::float8, ticket_id) < (:after_rank, :after_id)
+ORDER BY rank DESC, ticket_id DESC
+LIMIT :limit
+""")
+
+# Fragmentos resaltados, solo para los tickets de la página (ts_headline relee el texto: es lo caro)
+TICKET_HEADLINES_SQL = text(f"""
+SELECT id,
+       ts_headline('spanish', coalesce(title, ''), websearch_to_tsquery('spanish', :q), '{HEADLINE_SHORT}'),
+       ts_headline('spanish', coalesce(description, ''), websearch_to_tsquery('spanish', :q), '{HEADLINE_FRAGMENTS}'),
+       ts_headline('spanish', coalesce(public_note, ''), websearch_to_tsquery('spanish', :q), '{HEADLINE_FRAGMENTS}')
+FROM tickets WHERE id IN :ids AND search_vector @@ websearch_to_tsquery('spanish', :q)
+""").bindparams(bindparam("ids", expanding=True))
+
+SHEET_HEADLINES_SQL = text(f"""
+SELECT DISTINCT ON (ticket_id) ticket_id,
+       ts_headline('spanish', tech_notes, websearch_to_tsquery('spanish', :q), '{HEADLINE_FRAGMENTS}')
+FROM service_sheets
+WHERE ticket_id IN :ids AND search_vector @@ websearch_to_tsquery('spanish', :q)
+ORDER BY ticket_id, ts_rank(search_vector, websearch_to_tsquery('spanish', :q)) DESC
+""").bindparams(bindparam("ids", expanding=True))
+
+
+def encode_cursor(rank: float, ticket_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"rank": rank, "id": ticket_id}).encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(data["rank"]), int(data["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def highlight(fragment):
+    # El texto del ticket se escapa; solo nuestras marcas pasan a ser HTML
+    if not fragment or _START not in fragment:
+        return None # Ese campo no coincidió
+    return html.escape(fragment).replace(_START, "<mark>").replace(_STOP, "</mark>")
+
+
+def search_tickets(db, q: str, limit: int, cursor=None):
+    """[(ticket_id, puntaje, {campo: fragmento})] de una página y el cursor de la siguiente."""
+    after_rank, after_id = decode_cursor(cursor) if cursor else (None, None)
+    # Pedimos uno de más para saber si existe otra página sin hacer un COUNT
+    hits = db.execute(HITS_SQL, {
+        "q": q, "after_rank": after_rank, "after_id": after_id, "limit": limit + 1,
+    }).all()
+    next_cursor = None
+    if len(hits) > limit:
+        hits = hits[:limit]
+        next_cursor = encode_cursor(hits[-1].rank, hits[-1].ticket_id)
+    if not hits:
+        return [], None
+
+    ids = [hit.ticket_id for hit in hits]
+    highlights = {ticket_id: {} for ticket_id in ids}
+    rows = [
+        (row[0], zip(("title", "description", "public_note"), row[1:]))
+        for row in db.execute(TICKET_HEADLINES_SQL, {"q": q, "ids": ids})
+    ] + [
+        (ticket_id, [("tech_notes", notes)])
+        for ticket_id, notes in db.execute(SHEET_HEADLINES_SQL, {"q": q, "ids": ids})
+    ]
+    for ticket_id, fields in rows:
+        for field, fragment in fields:
+            marked = highlight(fragment)
+            if marked:
+                highlights[ticket_id][field] = marked
+    return [(hit.ticket_id, hit.rank, highlights[hit.ticket_id]) for hit in hits], next_cursor
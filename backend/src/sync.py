@@ -0,0 +1,255 @@
+# backend/src/sync.py
+# Sincronización incremental de la app offline de los técnicos (GET /sync y POST /sync/service_sheets).
+#
+# Cada INSERT/UPDATE/DELETE de tickets, clientes, servicios y planillas deja una fila en sync_changes
+# (trigger, ver models.py) con el id de la transacción que lo hizo. El token que recibe la app es la
+# posición (txid, id) hasta donde ya leyó: la próxima vez recibe solo lo que cambió después.
+#
+# El token no avanza por el id de la fila sino por transacción terminada: una transacción que empezó
+# antes pero confirma después de otra tiene un id menor y la app ya lo habría salteado. Por eso solo se
+# entregan cambios de transacciones anteriores al xmin del snapshot (todas ya confirmadas o abortadas).
+#
+# La respuesta trae el estado actual de cada fila que cambió (no el historial): si ya no existe, va en
+# "deleted" (también lo archivado con `partitions.py archive`, que deja sus lápidas). Sin token se
+# arranca desde el principio del log: la migración dejó una fila por cada registro existente y
+# `compact` conserva solo el último cambio de cada uno, así la descarga inicial tiene el tamaño de
+# las tablas y no de su historia.
+#
+# Uso (cron diario):
+#   python src/sync.py compact [--tombstone-days 30]
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import HTTPException
+from sqlalchemy import ARRAY, Integer, any_, bindparam, insert, select, text, update
+
+import models
+
+SYNC_PAGE_MAX = int(os.getenv("SYNC_PAGE_MAX", "5000")) # Cambios del log por página
+SYNC_UPLOAD_MAX = int(os.getenv("SYNC_UPLOAD_MAX", "500")) # Planillas por subida
+# Las lápidas (borrados) se guardan estos días: una app que no sincroniza hace más tiempo vuelve a bajar todo
+SYNC_TOMBSTONE_DAYS = int(os.getenv("SYNC_TOMBSTONE_DAYS", "30"))
+
+T, C, S, H = models.Ticket, models.Client, models.ClientService, models.ServiceSheet
+
+SHEET_COLUMNS = (
+    H.id, H.ticket_id, H.author_id, H.started_at, H.ended_at, H.signal_power, H.onu_sn, H.nap_box_data,
+    H.materials_used, H.tech_notes, H.photos_url, H.client_ref, H.created_at, H.updated_at,
+)
+
+# Tabla del log -> (modelo, clave en la respuesta, columnas que viajan). Las filas van planas (ids de
+# servicio, cliente y plan en vez de anidados): cada cambio del log es exactamente una fila de la
+# respuesta. Los planes se toman de GET /plans (con ETag).
+ENTITIES = {
+    "tickets": (T, "tickets", (
+        T.id, T.service_id, T.assigned_id, T.title, T.description, T.priority, T.status, T.category,
+        T.public_note, T.created_at, T.updated_at, T.resolved_at,
+    )),
+    "clients": (C, "clients", (C.id, C.name, C.billing_address, C.phone, C.email, C.cuit, C.updated_at)),
+    "client_services": (S, "services", (
+        S.id, S.client_id, S.plan_id, S.ip_address, S.mac_address, S.installation_address, S.geolocation,
+        S.latitude, S.longitude, S.site_contact_name, S.site_contact_phone, S.onu_sn, S.updated_at,
+    )),
+    "service_sheets": (H, "service_sheets", SHEET_COLUMNS),
+}
+
+# Transacciones con id menor a este ya terminaron: sus cambios no pueden aparecer más tarde
+HORIZON_SQL = text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+
+CHANGES_SQL = text("""
+SELECT txid, id, entity, entity_id FROM sync_changes
+WHERE (txid, id) > (:txid, :id) AND txid < :horizon
+ORDER BY txid, id
+LIMIT :limit
+""")
+
+# Mismo client_ref subido dos veces a la vez (reintento con el primero en curso): el segundo espera.
+# No hay UNIQUE: en la tabla particionada tendría que incluir created_at.
+LOCK_REFS_SQL = text("""
+SELECT pg_advisory_xact_lock(h) FROM (
+    SELECT DISTINCT hashtext(ref) AS h FROM unnest(CAST(:refs AS text[])) AS ref ORDER BY h
+) refs
+""")
+
+# Se borran los cambios que ya tienen otro más nuevo de la misma fila (la app solo necesita el último)
+# y las lápidas viejas
+COMPACT_SQL = text("""
+DELETE FROM sync_changes c USING sync_changes n
+WHERE n.entity = c.entity AND n.entity_id = c.entity_id AND (n.txid, n.id) > (c.txid, c.id)
+""")
+PRUNE_TOMBSTONES_SQL = text("""
+DELETE FROM sync_changes WHERE op = 'DELETE' AND changed_at < now() - make_interval(days => :days)
+""")
+
+
+# --- TOKEN ---
+# base64 de la posición en el log y de cuándo la app estuvo al día por última vez (para saber si se
+# perdió lápidas que ya se borraron)
+def encode_token(txid: int, change_id: int, synced_at: float) -> str:
+    data = {"tx": txid, "id": change_id, "at": int(synced_at)}
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+def decode_token(token: str):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return int(data["tx"]), int(data["id"]), float(data["at"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Token de sincronización inválido")
+
+
+def load_rows(db, entity, ids):
+    model, _, columns = ENTITIES[entity]
+    # = ANY(array) y no IN (...): una página trae miles de ids y no vale la pena un parámetro por cada uno
+    ids = bindparam("ids", list(ids), type_=ARRAY(Integer))
+    rows = db.execute(select(*columns).where(model.id == any_(ids)).order_by(model.id)).all()
+    return [row._asdict() for row in rows]
+
+
+def read_changes(db, since=None, limit=500):
+    """Estado actual de lo que cambió después del token, el token siguiente y si quedan más páginas."""
+    now = time.time()
+    txid, change_id, synced_at = decode_token(since) if since else (0, 0, now)
+    if synced_at < now - SYNC_TOMBSTONE_DAYS * 86400:
+        raise HTTPException(status_code=410, detail="Token vencido: volver a sincronizar desde cero (sin since)")
+
+    horizon = db.execute(HORIZON_SQL).scalar()
+    changes = db.execute(CHANGES_SQL, {"txid": txid, "id": change_id, "horizon": horizon, "limit": limit}).all()
+
+    changed = {}
+    for change in changes:
+        changed.setdefault(change.entity, set()).add(change.entity_id)
+
+    payload = {key: {"upserted": [], "deleted": []} for _, key, _ in ENTITIES.values()}
+    for entity, ids in changed.items():
+        if entity not in ENTITIES:
+            continue
+        rows = load_rows(db, entity, ids)
+        key = ENTITIES[entity][1]
+        payload[key]["upserted"] = rows
+        payload[key]["deleted"] = sorted(ids - {row["id"] for row in rows}) # Ya no existen: la app las borra
+
+    if len(changes) == limit:
+        # Página llena: se sigue desde el último cambio entregado (la app todavía no está al día)
+        last = changes[-1]
+        payload["next_token"] = encode_token(last.txid, last.id, synced_at)
+        payload["has_more"] = True
+    else:
+        # Se leyó todo lo confirmado hasta el horizonte: lo próximo tiene txid >= horizon
+        payload["next_token"] = encode_token(horizon, 0, now)
+        payload["has_more"] = False
+    return payload
+
+
+# --- SUBIDA DE PLANILLAS CARGADAS OFFLINE ---
+SHEET_FIELDS = (
+    "ticket_id", "author_id", "started_at", "ended_at", "signal_power", "onu_sn", "nap_box_data",
+    "materials_used", "tech_notes", "photos_url",
+)
+
+def upload_service_sheets(db, sheets):
+    """Altas y ediciones de planillas en lote, en el orden del pedido (sin commit).
+
+    Cada planilla trae client_ref (el id que le puso la app): si ya se había subido, no se duplica.
+    Las ediciones traen id y base_updated_at (el updated_at de la copia que editó la app): si en el
+    servidor cambió desde entonces es un conflicto y se devuelve la versión del servidor sin pisarla.
+    """
+    refs = sorted({sheet["client_ref"] for sheet in sheets})
+    db.execute(LOCK_REFS_SQL, {"refs": refs})
+
+    ticket_ids = {sheet["ticket_id"] for sheet in sheets}
+    tickets = set(db.execute(select(T.id).where(T.id.in_(ticket_ids))).scalars())
+    author_ids = {sheet["author_id"] for sheet in sheets if sheet["author_id"] is not None}
+    authors = set(db.execute(select(models.User.id).where(models.User.id.in_(author_ids))).scalars()) if author_ids else set()
+    uploaded = dict(db.execute(select(H.client_ref, H.id).where(H.client_ref.in_(refs))).all())
+    edit_ids = {sheet["id"] for sheet in sheets if sheet["id"] is not None}
+    current = {
+        row.id: row._asdict()
+        for row in db.execute(select(*SHEET_COLUMNS).where(H.id.in_(edit_ids)).with_for_update())
+    } if edit_ids else {}
+
+    results, inserts, updates, repeated = [], [], [], []
+    pending = {} # client_ref -> resultado del alta de este mismo lote
+    for index, sheet in enumerate(sheets):
+        ref = sheet["client_ref"]
+        values = {field: sheet[field] for field in SHEET_FIELDS}
+        item = {"index": index, "client_ref": ref, "id": sheet["id"], "status": "error"}
+        results.append(item)
+
+        if values["ticket_id"] not in tickets:
+            item["error"] = "Ticket inexistente"
+        elif values["author_id"] is not None and values["author_id"] not in authors:
+            item["error"] = "Técnico inexistente"
+        elif sheet["id"] is None:
+            if ref in uploaded:
+                item.update(status="duplicate", id=uploaded[ref]) # Reintento de una subida que ya entró
+            elif ref in pending:
+                item["status"] = "duplicate"
+                repeated.append((item, pending[ref]))
+            else:
+                item["status"] = "created"
+                pending[ref] = item
+                inserts.append((item, {**values, "client_ref": ref}))
+        else:
+            server = current.get(sheet["id"])
+            if server is None:
+                item["error"] = "Planilla inexistente"
+            elif server["updated_at"] == sheet["base_updated_at"]:
+                item["status"] = "updated"
+                updates.append({"id": sheet["id"], **values})
+            elif all(server[field] == values[field] for field in SHEET_FIELDS):
+                item["status"] = "duplicate" # Reintento de una edición que ya se aplicó
+            else:
+                item["status"] = "conflict"
+
+    if inserts:
+        ids = db.execute(
+            insert(H).returning(H.id, sort_by_parameter_order=True), [values for _, values in inserts]
+        ).scalars().all()
+        for (item, _), sheet_id in zip(inserts, ids):
+            item["id"] = sheet_id
+        for item, original in repeated:
+            item["id"] = original["id"]
+    if updates:
+        # UPDATE por clave primaria, uno por planilla en un solo executemany (updated_at lo renueva el onupdate)
+        db.execute(update(H), updates)
+
+    # Versión del servidor de cada planilla (la nueva, o la que ganó en un conflicto)
+    sheet_ids = {item["id"] for item in results if item["status"] != "error"}
+    sheets_by_id = {row["id"]: row for row in load_rows(db, "service_sheets", sheet_ids)} if sheet_ids else {}
+    for item in results:
+        item["ok"] = item["status"] in ("created", "updated", "duplicate")
+        item["sheet"] = sheets_by_id.get(item["id"]) if item["status"] != "error" else None
+
+    conflicts = sum(item["status"] == "conflict" for item in results)
+    errors = sum(item["status"] == "error" for item in results)
+    return {
+        "ok_count": len(results) - conflicts - errors,
+        "conflict_count": conflicts,
+        "error_count": errors,
+        "results": results,
+    }
+
+
+def compact(conn, tombstone_days=SYNC_TOMBSTONE_DAYS):
+    superseded = conn.execute(COMPACT_SQL).rowcount
+    tombstones = conn.execute(PRUNE_TOMBSTONES_SQL, {"days": tombstone_days}).rowcount
+    return superseded, tombstones
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    parser = argparse.ArgumentParser(description="Mantenimiento del log de cambios de /sync.")
+    parser.add_argument("command", choices=["compact"])
+    parser.add_argument("--tombstone-days", type=int, default=SYNC_TOMBSTONE_DAYS)
+    args = parser.parse_args()
+
+    with engine.begin() as conn:
+        superseded, tombstones = compact(conn, args.tombstone_days)
+    print(f"✅ {superseded} cambios reemplazados por otros más nuevos y {tombstones} lápidas viejas borrados.")
@@ -0,0 +1,363 @@
+# backend/src/telemetry.py
+# Potencia óptica de las ONUs (POST /telemetry/onu_readings y GET /services/{id}/signal).
+#
+# El poller de las OLTs manda cada 5 minutos un lote con la lectura de cada ONU (CSV o JSON lines).
+# Con ~20k servicios son ~6M filas por día, así que:
+#   - onu_readings:        lecturas crudas, particionada por día (onu_readings_y2026m10d18); se
+#                          guardan TELEMETRY_RAW_DAYS días y lo viejo se borra con DROP de la partición
+#   - onu_readings_hourly: min/max/suma/cantidad por servicio y hora, particionada por mes
+#   - onu_readings_daily:  lo mismo por día, sin vencimiento (historia larga de cada servicio)
+# El lote entra por COPY a una tabla temporal y un solo INSERT ... ON CONFLICT DO NOTHING lo pasa a
+# la tabla cruda; los resúmenes se actualizan en la misma sentencia solo con lo que realmente se
+# insertó, así un lote reenviado no cuenta dos veces.
+#
+# Las lecturas identifican el servicio por service_id o por el número de serie de la ONU
+# (client_services.onu_sn, que se toma de la última planilla de servicio que lo cargó).
+#
+# Mantenimiento (cron diario):
+#   python src/telemetry.py maintain [--days-ahead 3]   # crea particiones y borra las vencidas
+#   python src/telemetry.py list
+import argparse
+import csv
+import io
+import os
+import re
+import sys
+import zlib
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import orjson
+from fastapi import HTTPException
+from sqlalchemy import text
+
+from database import copy_rows
+from partitions import list_partitions, month_start
+
+RAW_DAYS = int(os.getenv("TELEMETRY_RAW_DAYS", "14"))
+HOURLY_MONTHS = int(os.getenv("TELEMETRY_HOURLY_MONTHS", "6"))
+DAYS_AHEAD = int(os.getenv("TELEMETRY_DAYS_AHEAD", "3"))
+MAX_ROWS = int(os.getenv("TELEMETRY_MAX_ROWS", "200000")) # Por request
+# Cuerpo ya descomprimido: ~100 bytes por lectura. Un gzip chico puede inflarse a gigas (zip bomb)
+MAX_BYTES = int(os.getenv("TELEMETRY_MAX_BYTES", str(32 * 1024 * 1024)))
+INT4_RANGE = (-2**31, 2**31 - 1) # service_id es integer: fuera de esto el COPY falla con todo el lote
+RAW_MAX_SPAN = timedelta(days=7) # Más que esto en crudo se pide por hora o por día
+
+# Rangos físicamente posibles; lo que cae afuera es un error de lectura del poller
+RX_RANGE = (-50.0, 10.0)
+TX_RANGE = (-20.0, 15.0)
+MAX_ERRORS = 20 # Errores que se devuelven con detalle
+
+# La migración f3b9d2e6a741 crea create_daily_partitions (la versión por día de create_monthly_partitions)
+# y el trigger que mantiene client_services.onu_sn con la ONU de la última planilla cargada; si la
+# ONU estaba asociada a otro servicio (equipo reutilizado), se la saca de ese.
+
+STAGING_SQL = (
+    "CREATE TEMP TABLE IF NOT EXISTS onu_readings_staging "
+    "(service_id integer, onu_sn text, read_at timestamptz, rx_dbm real, tx_dbm real) ON COMMIT DELETE ROWS"
+)
+STAGING_COLUMNS = ("service_id", "onu_sn", "read_at", "rx_dbm", "tx_dbm")
+
+RESOLVE_SN_SQL = """
+UPDATE onu_readings_staging r SET service_id = s.id
+  FROM client_services s
+ WHERE r.service_id IS NULL AND s.onu_sn = r.onu_sn
+"""
+
+ENSURE_BATCH_SQL = """
+SELECT create_daily_partitions('onu_readings', min(read_at), max(read_at)),
+       create_monthly_partitions('onu_readings_hourly', min(read_at), max(read_at))
+  FROM onu_readings_staging
+HAVING count(*) > 0
+"""
+
+# Los resúmenes se suman en orden de clave: dos lotes simultáneos de los mismos servicios
+# bloquean las filas en el mismo orden y no se traban entre sí
+ROLLUP_SQL = """
+{name} AS (
+    INSERT INTO {table} AS r (service_id, bucket, samples, rx_min, rx_max, rx_sum)
+    SELECT service_id, date_trunc('{unit}', read_at, 'UTC'), count(*), min(rx_dbm), max(rx_dbm), sum(rx_dbm)
+      FROM inserted
+     GROUP BY 1, 2
+     ORDER BY 1, 2
+    ON CONFLICT (service_id, bucket) DO UPDATE
+       SET samples = r.samples + EXCLUDED.samples,
+           rx_min = least(r.rx_min, EXCLUDED.rx_min),
+           rx_max = greatest(r.rx_max, EXCLUDED.rx_max),
+           rx_sum = r.rx_sum + EXCLUDED.rx_sum
+)"""
+
+INGEST_SQL = f"""
+WITH known AS (
+    SELECT r.service_id, r.read_at, r.rx_dbm, r.tx_dbm
+      FROM onu_readings_staging r
+      JOIN client_services s ON s.id = r.service_id
+), inserted AS (
+    INSERT INTO onu_readings (service_id, read_at, rx_dbm, tx_dbm)
+    SELECT DISTINCT ON (service_id, read_at) * FROM known
+    ON CONFLICT DO NOTHING
+    RETURNING service_id, read_at, rx_dbm
+),{ROLLUP_SQL.format(name="hourly", table="onu_readings_hourly", unit="hour")},{ROLLUP_SQL.format(name="daily", table="onu_readings_daily", unit="day")}
+SELECT (SELECT count(*) FROM known), (SELECT count(*) FROM inserted)
+"""
+
+RAW_SQL = """
+SELECT read_at, 1, rx_dbm, rx_dbm, rx_dbm, tx_dbm
+  FROM onu_readings
+ WHERE service_id = :service_id AND read_at >= :date_from AND read_at < :date_to
+ ORDER BY read_at
+"""
+
+ROLLUP_READ_SQL = """
+SELECT bucket, samples, rx_min, (rx_sum / samples)::real, rx_max, NULL
+  FROM {table}
+ WHERE service_id = :service_id AND bucket >= date_trunc('{unit}', CAST(:date_from AS timestamptz), 'UTC') AND bucket < :date_to
+ ORDER BY bucket
+"""
+
+HISTORY_SQL = {
+    "raw": RAW_SQL,
+    "hour": ROLLUP_READ_SQL.format(table="onu_readings_hourly", unit="hour"),
+    "day": ROLLUP_READ_SQL.format(table="onu_readings_daily", unit="day"),
+}
+
+
+# --- LECTURA DEL LOTE ---
+
+def parse_time(value):
+    # ISO 8601 o segundos epoch; sin zona se toma como UTC (el poller corre en UTC)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return datetime.fromtimestamp(value, timezone.utc)
+    value = str(value).strip()
+    if re.fullmatch(r"\d+(\.\d+)?", value):
+        return datetime.fromtimestamp(float(value), timezone.utc)
+    return as_utc(datetime.fromisoformat(value))
+
+
+def as_utc(value):
+    return value if value is None or value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def parse_dbm(name, value, bounds, required):
+    if value is None or str(value).strip() == "":
+        if required:
+            raise ValueError(f"falta {name}")
+        return None
+    try:
+        number = float(str(value).strip().replace(",", "."))
+    except ValueError:
+        raise ValueError(f"{name} inválido: {value!r}")
+    if not bounds[0] <= number <= bounds[1]:
+        raise ValueError(f"{number} dBm fuera de rango ({bounds[0]} a {bounds[1]})")
+    return number
+
+
+def parse_reading(record, oldest, newest):
+    service_id = record.get("service_id")
+    try:
+        service_id = int(service_id) if service_id not in (None, "") else None
+    except ValueError:
+        raise ValueError(f"service_id inválido: {service_id!r}")
+    if service_id is not None and not INT4_RANGE[0] <= service_id <= INT4_RANGE[1]:
+        raise ValueError(f"service_id fuera de rango: {service_id}")
+    onu_sn = (record.get("onu_sn") or "").strip().upper() or None
+    if service_id is None and onu_sn is None:
+        raise ValueError("falta service_id u onu_sn")
+    if record.get("read_at") in (None, ""):
+        raise ValueError("falta read_at")
+    try:
+        read_at = parse_time(record["read_at"])
+    except ValueError:
+        raise ValueError(f"read_at inválido: {record['read_at']!r}")
+    if not oldest <= read_at <= newest:
+        raise ValueError(f"read_at {read_at.isoformat()} fuera de la ventana de retención o en el futuro")
+    return (
+        service_id, onu_sn, read_at,
+        parse_dbm("rx_dbm", record.get("rx_dbm"), RX_RANGE, True),
+        parse_dbm("tx_dbm", record.get("tx_dbm"), TX_RANGE, False),
+    )
+
+
+def records(body, ndjson):
+    # (número de línea, dict o error de formato) por cada lectura del cuerpo
+    try:
+        lines = io.StringIO(body.decode("utf-8-sig"))
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="El cuerpo no es UTF-8")
+    if ndjson:
+        for number, line in enumerate(lines, 1):
+            if line.strip():
+                try:
+                    record = orjson.loads(line)
+                except orjson.JSONDecodeError as exc:
+                    yield number, ValueError(f"JSON inválido: {exc}")
+                    continue
+                yield number, record if isinstance(record, dict) else ValueError("se esperaba un objeto JSON")
+    else:
+        reader = csv.DictReader(lines) # Encabezado con service_id/onu_sn, read_at, rx_dbm, tx_dbm
+        for record in reader:
+            yield reader.line_num, record
+
+
+def too_large():
+    return HTTPException(status_code=413, detail=f"Más de {MAX_BYTES} bytes descomprimido: partir el lote")
+
+
+def gunzip(body, limit=MAX_BYTES):
+    # Como gzip.decompress (también con varios miembros seguidos) pero sin pasar de `limit` bytes
+    out = bytearray()
+    while body:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            out += decompressor.decompress(body, limit + 1 - len(out))
+        except zlib.error:
+            raise HTTPException(status_code=400, detail="Cuerpo gzip inválido")
+        if len(out) > limit:
+            raise too_large()
+        if not decompressor.eof:
+            raise HTTPException(status_code=400, detail="Cuerpo gzip inválido (cortado)")
+        body = decompressor.unused_data
+    return bytes(out)
+
+
+def parse_body(body, content_type="", content_encoding=None):
+    # -> (filas para el COPY, cantidad de lecturas, [errores])
+    if (content_encoding or "").lower() == "gzip":
+        body = gunzip(body)
+    elif len(body) > MAX_BYTES:
+        raise too_large()
+    ndjson = any(kind in (content_type or "") for kind in ("ndjson", "jsonl", "json"))
+    now = datetime.now(timezone.utc)
+    oldest, newest = now - timedelta(days=RAW_DAYS), now + timedelta(minutes=5)
+    rows, errors, received = [], [], 0
+    for number, record in records(body, ndjson):
+        received += 1
+        if received > MAX_ROWS:
+            raise HTTPException(status_code=413, detail=f"Más de {MAX_ROWS} lecturas: partir el lote")
+        try:
+            if isinstance(record, Exception):
+                raise record
+            rows.append(parse_reading(record, oldest, newest))
+        except (ValueError, TypeError, OverflowError, OSError) as exc:
+            errors.append({"line": number, "error": str(exc)})
+    return rows, received, errors
+
+
+# --- INGESTA ---
+
+def ingest(db, rows):
+    # -> (lecturas de servicios conocidos, insertadas). No hace commit.
+    if not rows:
+        return 0, 0
+    db.execute(text(STAGING_SQL))
+    copy_rows(db, "onu_readings_staging", STAGING_COLUMNS, rows)
+    if any(service_id is None for service_id, *_ in rows):
+        db.execute(text(RESOLVE_SN_SQL))
+    db.execute(text(ENSURE_BATCH_SQL))
+    known, inserted = db.execute(text(INGEST_SQL)).one()
+    return known, inserted
+
+
+def ingest_body(db, body, content_type="", content_encoding=None):
+    rows, received, errors = parse_body(body, content_type, content_encoding)
+    known, inserted = ingest(db, rows)
+    return {
+        "received": received,
+        "inserted": inserted,
+        "duplicates": known - inserted, # Ya estaban (lote reenviado) o repetidas dentro del lote
+        "unknown": len(rows) - known, # Servicio u ONU que no existe
+        "rejected": len(errors),
+        "errors": errors[:MAX_ERRORS],
+    }
+
+
+# --- HISTORIAL ---
+
+def pick_resolution(date_from, date_to, resolution="auto"):
+    if resolution != "auto":
+        return resolution
+    span = date_to - date_from
+    if span <= timedelta(days=2):
+        return "raw"
+    return "hour" if span <= timedelta(days=60) else "day"
+
+
+def signal_history(conn, service_id, date_from, date_to, resolution):
+    rows = conn.execute(text(HISTORY_SQL[resolution]), {
+        "service_id": service_id, "date_from": date_from, "date_to": date_to,
+    })
+    return {
+        "service_id": service_id,
+        "resolution": resolution,
+        "date_from": date_from,
+        "date_to": date_to,
+        "points": [
+            {"at": at, "samples": samples, "rx_min": rx_min, "rx_avg": rx_avg, "rx_max": rx_max, "tx_dbm": tx_dbm}
+            for at, samples, rx_min, rx_avg, rx_max, tx_dbm in rows
+        ],
+    }
+
+
+# --- MANTENIMIENTO ---
+
+_DAY = re.compile(r"_y(\d{4})m(\d{2})d(\d{2})$")
+
+
+def list_daily_partitions(conn, table="onu_readings"):
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:table) ORDER BY c.relname"
+    ), {"table": table}).scalars()
+    partitions = []
+    for name in names:
+        match = _DAY.search(name)
+        if match:
+            partitions.append((name, datetime(*map(int, match.groups()), tzinfo=timezone.utc)))
+    return partitions
+
+
+def maintain(conn, days_ahead=DAYS_AHEAD, raw_days=RAW_DAYS, hourly_months=HOURLY_MONTHS):
+    # Particiones para los próximos días/meses y DROP de lo vencido (no se archiva: está resumido)
+    now = datetime.now(timezone.utc)
+    created = conn.execute(text(
+        "SELECT create_daily_partitions('onu_readings', now() - make_interval(days => :back), now() + make_interval(days => :ahead)), "
+        "create_monthly_partitions('onu_readings_hourly', now(), now() + make_interval(days => :ahead))"
+    ), {"back": raw_days, "ahead": days_ahead}).one()
+
+    dropped = []
+    raw_cutoff = datetime(now.year, now.month, now.day, tzinfo=timezone.utc) - timedelta(days=raw_days)
+    for name, start in list_daily_partitions(conn):
+        if start < raw_cutoff:
+            conn.execute(text(f'DROP TABLE "{name}"'))
+            dropped.append(name)
+    hourly_cutoff = month_start(now.year, now.month - hourly_months)
+    for name, start in list_partitions(conn, "onu_readings_hourly"):
+        if start < hourly_cutoff:
+            conn.execute(text(f'DROP TABLE "{name}"'))
+            dropped.append(name)
+    return created, dropped
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    parser = argparse.ArgumentParser(description="Particiones de la telemetría de ONUs.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_maintain = sub.add_parser("maintain", help="Crea las particiones que falten y borra las vencidas")
+    p_maintain.add_argument("--days-ahead", type=int, default=DAYS_AHEAD)
+    sub.add_parser("list", help="Lista las particiones")
+    args = parser.parse_args()
+
+    if args.command == "maintain":
+        with engine.begin() as conn:
+            (daily, hourly), dropped = maintain(conn, args.days_ahead)
+        print(f"Particiones creadas: {daily} diarias, {hourly} mensuales (resumen por hora)")
+        for name in dropped:
+            print(f"  borrada {name}")
+    else:
+        with engine.connect() as conn:
+            for name, start in list_daily_partitions(conn):
+                print(f"onu_readings         {name}  {start:%Y-%m-%d}")
+            for name, start in list_partitions(conn, "onu_readings_hourly"):
+                print(f"onu_readings_hourly  {name}  {start:%Y-%m}")
@@ -0,0 +1,265 @@
+# backend/src/ticket_events.py
+# Novedades de tickets en tiempo real para las pantallas de la mesa de ayuda (GET /tickets/stream).
+#
+# Cada alta o cambio de un ticket hecho con una sesión de SQLAlchemy se publica, al confirmarse el
+# commit, en un hub en memoria que reparte el evento (un mensaje SSE con el ticket) a todas las
+# pantallas conectadas al worker. Con TICKETS_STREAM_NOTIFY=1 los eventos viajan por NOTIFY de
+# Postgres dentro de la misma transacción y cada worker los recibe con LISTEN: todos los workers
+# ven todos los cambios y con el mismo id de evento. Va un NOTIFY por commit con todos sus eventos
+# (en tandas de NOTIFY_CHUNK, lejos del límite de 8000 bytes del payload), no uno por ticket.
+#
+# Los últimos eventos quedan en un buffer circular: un cliente que se reconecta con Last-Event-ID
+# recibe lo que se perdió. Si ese id ya no está en el buffer, se le manda "reset" para que recargue.
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from itertools import count
+
+import orjson
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+import models
+
+STREAM_NOTIFY = os.getenv("TICKETS_STREAM_NOTIFY", "0").lower() in ("1", "true", "yes", "on")
+STREAM_BUFFER = int(os.getenv("TICKETS_STREAM_BUFFER", "1000"))      # Eventos guardados para reanudar
+STREAM_QUEUE_SIZE = int(os.getenv("TICKETS_STREAM_QUEUE_SIZE", "256")) # Pendientes por cliente antes de cortarlo
+STREAM_KEEPALIVE = float(os.getenv("TICKETS_STREAM_KEEPALIVE", "20"))  # Segundos; evita que un proxy corte la conexión
+CHANNEL = "ticket_events"
+NOTIFY_CHUNK = 100 # Eventos por NOTIFY: [id, "updated", ticket_id] ocupa menos de 50 bytes
+
+# Un NOTIFY con una tanda de eventos; el payload es [[id, tipo, ticket_id], ...]. Los binds van
+# con CAST: psycopg 3 manda los parámetros sin tipo y Postgres no puede deducirlo dentro de unnest
+NOTIFY_SQL = text(
+    "SELECT pg_notify(CAST(:channel AS text), jsonb_agg("
+    "jsonb_build_array(nextval('ticket_events_id_seq'), e.type, e.ticket_id) ORDER BY e.n)::text) "
+    "FROM unnest(CAST(:types AS text[]), CAST(:ticket_ids AS integer[])) WITH ORDINALITY AS e(type, ticket_id, n)"
+)
+
+log = logging.getLogger("emerald.stream")
+
+
+def format_sse(event_id, event_type, data: bytes) -> bytes:
+    # Sin id (reset) el navegador conserva el último Last-Event-ID que recibió
+    head = b"id: %d\n" % event_id if event_id is not None else b""
+    return head + b"event: %s\ndata: %s\n\n" % (event_type.encode(), data)
+
+
+class TicketHub:
+    """Reparte eventos de tickets a los clientes SSE conectados a este worker."""
+
+    def __init__(self, buffer_size=STREAM_BUFFER, queue_size=STREAM_QUEUE_SIZE):
+        self.buffer = deque(maxlen=buffer_size) # (id, tipo, data) en orden de llegada
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.loader = None # ids de ticket -> {id: dict del ticket}; lo define main.py
+        self.loop = None
+        self.pending = None
+        self._tasks = []
+        # Ids locales: arrancan en la hora actual en ms para no repetirse entre reinicios del proceso
+        self._ids = count(int(time.time() * 1000))
+
+    # --- Ciclo de vida (lifespan de la app) ---
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        # Con gunicorn --preload los workers heredan el contador del master: cada uno arranca el suyo
+        self._ids = count(int(time.time() * 1000))
+        self.pending = asyncio.Queue()
+        self._tasks.append(asyncio.create_task(self._dispatcher()))
+        if STREAM_NOTIFY:
+            self._tasks.append(asyncio.create_task(self._listener()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        self.loop = None
+
+    # --- Entrada de eventos ---
+    def next_id(self):
+        return next(self._ids)
+
+    def publish(self, events):
+        # Se llama desde el threadpool (endpoints sync) o desde el propio loop: nunca bloquea
+        if self.loop is None or self.loop.is_closed():
+            return # Sin app corriendo (scripts, importación masiva): nadie escucha
+        for item in events:
+            self.loop.call_soon_threadsafe(self.pending.put_nowait, item)
+
+    async def _dispatcher(self):
+        # Un solo consumidor: los eventos salen en orden y los tickets se cargan de a lotes
+        while True:
+            batch = [await self.pending.get()]
+            while not self.pending.empty():
+                batch.append(self.pending.get_nowait())
+            try:
+                tickets = await self.loop.run_in_executor(None, self.loader, {item[2] for item in batch})
+            except Exception:
+                log.exception("No se pudieron cargar los tickets de %d eventos", len(batch))
+                self.broadcast_reset()
+                continue
+            for event_id, event_type, ticket_id in batch:
+                ticket = tickets.get(ticket_id)
+                if ticket is None:
+                    continue # Se borró antes de que llegáramos a mandarlo
+                data = orjson.dumps({"type": event_type, "ticket": ticket}, option=orjson.OPT_UTC_Z)
+                self._dispatch((event_id, "ticket", data))
+
+    def _dispatch(self, item, keep=True):
+        if keep:
+            self.buffer.append(item)
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(item)
+            except asyncio.QueueFull:
+                # Cliente demasiado lento: lo cortamos; al reconectar se pone al día con Last-Event-ID
+                self.subscribers.discard(queue)
+                queue.get_nowait()
+                queue.put_nowait(None)
+
+    def broadcast_reset(self):
+        # Perdimos eventos (fallo de carga o de LISTEN): que todos recarguen la lista
+        self.buffer.clear() # Quien se reconecte tampoco puede ponerse al día
+        self._dispatch((None, "reset", b"{}"), keep=False)
+
+    # --- LISTEN/NOTIFY (varios workers) ---
+    async def _listener(self):
+        from database import engine
+
+        while True:
+            raw = None
+            try:
+                raw = engine.raw_connection()
+                conn = raw.driver_connection
+                raw.detach() # Conexión propia para siempre: no vuelve al pool
+                conn.rollback() # El pre-ping pudo dejar una transacción abierta
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {CHANNEL}")
+                lost = asyncio.Event()
+                self.loop.add_reader(conn.fileno(), self._on_notify, conn, lost)
+                log.info("Escuchando NOTIFY en el canal %s", CHANNEL)
+                try:
+                    await lost.wait()
+                finally:
+                    self.loop.remove_reader(conn.fileno())
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("Error en LISTEN %s", CHANNEL)
+            finally:
+                if raw is not None:
+                    raw.close()
+            self.broadcast_reset()
+            await asyncio.sleep(5) # Reintentamos la conexión
+
+    def _on_notify(self, conn, lost):
+        try:
+            payloads = read_notifies(conn)
+        except Exception:
+            log.exception("Se perdió la conexión de LISTEN")
+            lost.set()
+            return
+        for payload in payloads:
+            for event_id, event_type, ticket_id in json.loads(payload):
+                self.pending.put_nowait((event_id, event_type, ticket_id))
+
+    # --- Salida hacia cada cliente ---
+    def since(self, last_event_id):
+        # Eventos posteriores a last_event_id, o None si ya no está en el buffer (hay que recargar)
+        items = list(self.buffer)
+        for index in range(len(items) - 1, -1, -1):
+            if items[index][0] == last_event_id:
+                return items[index + 1:]
+        return None
+
+    async def stream(self, request, last_event_id=None):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(queue) # Antes de mirar el buffer, así no se pierde nada en el medio
+        try:
+            yield b"retry: 3000\n\n"
+            sent = set()
+            if last_event_id is not None:
+                missed = self.since(last_event_id)
+                if missed is None:
+                    yield format_sse(None, "reset", b"{}")
+                else:
+                    for item in missed:
+                        sent.add(item[0])
+                        yield format_sse(*item)
+
+            while not await request.is_disconnected():
+                try:
+                    item = await asyncio.wait_for(queue.get(), STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+                    continue
+                if item is None:
+                    return # Desbordado: el cliente reconecta solo
+                if item[0] in sent:
+                    sent.discard(item[0]) # Ya salió en la puesta al día
+                    continue
+                yield format_sse(*item)
+        finally:
+            self.subscribers.discard(queue)
+
+
+hub = TicketHub()
+
+
+def read_notifies(conn):
+    # Payloads que ya llegaron a la conexión de LISTEN, sin bloquear
+    if hasattr(conn, "poll"): # psycopg2
+        conn.poll()
+        payloads = [notify.payload for notify in conn.notifies]
+        conn.notifies.clear()
+        return payloads
+    return [notify.payload for notify in conn.notifies(timeout=0)] # psycopg 3
+
+
+# --- CAPTURA DE CAMBIOS POR EVENTOS DE SESIÓN ---
+# Igual que la caché: juntamos los tickets tocados en cada flush y publicamos recién al confirmar.
+
+@event.listens_for(Session, "after_flush")
+def _collect_ticket_changes(session, flush_context):
+    changes = session.info.setdefault("ticket_events", {})
+    for obj in session.new:
+        if isinstance(obj, models.Ticket):
+            changes[obj.id] = "created"
+    for obj in session.dirty:
+        if isinstance(obj, models.Ticket) and session.is_modified(obj, include_collections=False):
+            changes.setdefault(obj.id, "updated")
+
+def queue_ticket_events(session, ticket_ids, event_type="updated"):
+    # Para UPDATE masivos (session.execute(update(...))), que no pasan por el flush
+    changes = session.info.setdefault("ticket_events", {})
+    for ticket_id in ticket_ids:
+        changes.setdefault(ticket_id, event_type)
+
+@event.listens_for(Session, "before_commit")
+def _notify_ticket_changes(session):
+    if not STREAM_NOTIFY:
+        return
+    session.flush() # Que el after_flush vea también lo que todavía no se mandó a la base
+    changes = list(session.info.pop("ticket_events", {}).items())
+    for start in range(0, len(changes), NOTIFY_CHUNK):
+        # NOTIFY es transaccional: solo llega a los workers si el commit sale bien
+        chunk = changes[start:start + NOTIFY_CHUNK]
+        session.execute(NOTIFY_SQL, {
+            "channel": CHANNEL,
+            "types": [event_type for _, event_type in chunk],
+            "ticket_ids": [ticket_id for ticket_id, _ in chunk],
+        })
+
+@event.listens_for(Session, "after_commit")
+def _publish_ticket_changes(session):
+    changes = session.info.pop("ticket_events", None)
+    if changes:
+        hub.publish([(hub.next_id(), event_type, ticket_id) for ticket_id, event_type in changes.items()])
+
+@event.listens_for(Session, "after_rollback")
+def _discard_ticket_changes(session):
+    session.info.pop("ticket_events", None)
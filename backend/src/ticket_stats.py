@@ -0,0 +1,116 @@
+# backend/src/ticket_stats.py
+# Estadísticas del tablero de tickets mantenidas de forma incremental.
+#
+# En vez de un GROUP BY sobre toda la tabla tickets en cada request, unos triggers de Postgres
+# actualizan tres tablas chicas en la misma transacción que escribe el ticket (una vez por sentencia,
+# con las filas de toda la sentencia: un lote de 1000 tickets son tres upserts, no 3000):
+#   - ticket_stats:            cantidad por (estado, prioridad, categoría, técnico)
+#   - ticket_open_days:        tickets pendientes por día de creación (para los rangos de antigüedad)
+#   - ticket_resolution_stats: tickets resueltos y segundos totales de resolución por categoría (MTTR)
+# Al ser triggers, también cubren la importación masiva (COPY / INSERT ... SELECT) y los UPDATE masivos.
+#
+# Mantenimiento:
+#   python src/ticket_stats.py check     # compara el resumen contra la tabla tickets
+#   python src/ticket_stats.py rebuild   # lo recalcula desde cero
+import os
+import sys
+from datetime import date
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+
+OPEN_STATUSES = ("open", "in_progress")
+
+# Rangos de antigüedad de lo pendiente: (etiqueta, desde días, hasta días)
+AGE_BUCKETS = [("<1d", 0, 1), ("1-3d", 1, 3), ("3-7d", 3, 7), ("7-30d", 7, 30), (">30d", 30, None)]
+
+# Las funciones y triggers que mantienen el resumen están en la migración c3f8a6d1e947 (por sentencia;
+# la primera versión, por fila, es 5a8f3e1c7b92).
+
+
+def get_ticket_stats(conn, today=None):
+    # Todo sale de las tablas resumen: cientos de filas como mucho, no la tabla tickets
+    today = today or date.today()
+    rows = conn.execute(text(
+        "SELECT status, priority, category, assigned_id, count FROM ticket_stats WHERE count > 0"
+    )).all()
+
+    stats = {"total": 0, "by_status": {}, "by_priority": {}, "by_category": {}}
+    by_assignee = {} # assigned_id (0 = sin asignar) -> [total, pendientes]
+    for status, priority, category, assigned_id, count in rows:
+        stats["total"] += count
+        for key, value in (("by_status", status), ("by_priority", priority), ("by_category", category)):
+            stats[key][value or "sin_dato"] = stats[key].get(value or "sin_dato", 0) + count
+        totals = by_assignee.setdefault(assigned_id, [0, 0])
+        totals[0] += count
+        if status in OPEN_STATUSES:
+            totals[1] += count
+    stats["by_assignee"] = [
+        {"assigned_id": assigned_id or None, "count": total, "open_count": pending}
+        for assigned_id, (total, pending) in sorted(by_assignee.items(), key=lambda item: -item[1][1])
+    ]
+
+    buckets = {label: 0 for label, _, _ in AGE_BUCKETS}
+    for created_day, count in conn.execute(text("SELECT created_day, count FROM ticket_open_days WHERE count > 0")):
+        age = (today - created_day).days
+        for label, low, high in AGE_BUCKETS:
+            if age >= low and (high is None or age < high):
+                buckets[label] += count
+                break
+    stats["open_age_buckets"] = buckets
+
+    stats["mttr_hours_by_category"] = {
+        (category or "sin_dato"): round(total_seconds / resolved / 3600, 2)
+        for category, resolved, total_seconds in conn.execute(text(
+            "SELECT category, resolved_count, total_seconds FROM ticket_resolution_stats WHERE resolved_count > 0"
+        ))
+    }
+    return stats
+
+
+def check(conn):
+    # Compara cada tabla resumen contra un recálculo completo; devuelve las diferencias (vacío = consistente)
+    comparisons = [
+        ("ticket_stats",
+         "SELECT status, priority, category, assigned_id, count FROM ticket_stats",
+         "SELECT COALESCE(status, ''), COALESCE(priority, ''), COALESCE(category, ''), COALESCE(assigned_id, 0), count(*) "
+         "FROM tickets GROUP BY 1, 2, 3, 4"),
+        ("ticket_open_days",
+         "SELECT created_day, count FROM ticket_open_days",
+         "SELECT created_at::date, count(*) FROM tickets WHERE status IN ('open', 'in_progress') GROUP BY 1"),
+        ("ticket_resolution_stats",
+         "SELECT category, resolved_count, round(total_seconds) FROM ticket_resolution_stats",
+         "SELECT COALESCE(category, ''), count(*), round(sum(EXTRACT(EPOCH FROM resolved_at - created_at))) "
+         "FROM tickets WHERE resolved_at IS NOT NULL GROUP BY 1"),
+    ]
+    diffs = []
+    for table, summary_sql, fresh_sql in comparisons:
+        key_size = 1 if table != "ticket_stats" else 4
+        summary = {tuple(r[:key_size]): tuple(r[key_size:]) for r in conn.execute(text(summary_sql)) if r[key_size]}
+        fresh = {tuple(r[:key_size]): tuple(r[key_size:]) for r in conn.execute(text(fresh_sql))}
+        for key in summary.keys() | fresh.keys():
+            if summary.get(key) != fresh.get(key):
+                diffs.append((table, key, summary.get(key), fresh.get(key)))
+    return diffs
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "check"
+    with engine.begin() as conn:
+        if command == "rebuild":
+            conn.execute(text("LOCK TABLE tickets IN SHARE ROW EXCLUSIVE MODE")) # Que nadie escriba mientras tanto
+            conn.execute(text("SELECT ticket_stats_rebuild()"))
+            print("✅ Estadísticas recalculadas.")
+        elif command == "check":
+            diffs = check(conn)
+            if diffs:
+                print(f"⚠️  {len(diffs)} diferencias entre el resumen y la tabla tickets:")
+                for diff in diffs:
+                    print("   ", tuple(diff))
+                sys.exit(1)
+            print("✅ El resumen coincide con la tabla tickets.")
+        else:
+            sys.exit(f"Comando desconocido: {command} (usar check o rebuild)")
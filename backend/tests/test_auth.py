@@ -0,0 +1,170 @@
+# backend/tests/test_auth.py
+# Tokens, usuarios deshabilitados, caché de usuarios y cola del pool de bcrypt (auth.py).
+# No necesitan Postgres: la caché se prueba con la tabla users en un SQLite en memoria.
+import asyncio
+from concurrent.futures.process import BrokenProcessPool
+from types import SimpleNamespace
+
+import orjson
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+
+import auth
+import models
+
+NOW = 1_800_000_000
+
+
+def bearer_request(token, path="/tickets"):
+    return Request({
+        "type": "http", "method": "GET", "path": path, "query_string": b"",
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+    })
+
+
+def signed(claims: bytes):
+    payload = auth._b64encode(claims)
+    return f"{payload}.{auth._sign(payload)}"
+
+
+@pytest.fixture(autouse=True)
+def empty_user_cache():
+    auth.user_cache.clear()
+    yield
+    auth.user_cache.clear()
+
+
+# --- TOKENS ---
+def test_token_round_trip():
+    token, expires_at = auth.issue_token(42, now=NOW)
+    assert expires_at == NOW + auth.AUTH_TOKEN_TTL
+    assert auth.verify_token(token, now=NOW) == 42
+
+
+def test_tampered_signature_is_rejected():
+    token, _ = auth.issue_token(42, now=NOW)
+    payload, _, signature = token.partition(".")
+    assert auth.verify_token(f"{payload}.{signature[:-1]}{'A' if signature[-1] != 'A' else 'B'}", now=NOW) is None
+    # Otro usuario con la firma del original
+    other = auth._b64encode(orjson.dumps({"sub": 1, "exp": NOW + auth.AUTH_TOKEN_TTL}))
+    assert auth.verify_token(f"{other}.{signature}", now=NOW) is None
+    assert auth.verify_token(payload, now=NOW) is None # Sin firma
+
+
+def test_expired_token_is_rejected():
+    token, expires_at = auth.issue_token(42, now=NOW)
+    assert auth.verify_token(token, now=expires_at - 1) == 42
+    assert auth.verify_token(token, now=expires_at) is None
+
+
+@pytest.mark.parametrize("claims", [b"no es json", b"[]", b'{"sub": 42}', b'{"exp": 1900000000}', b'{"sub": "x", "exp": 1900000000}'])
+def test_malformed_payload_is_rejected(claims):
+    # Firma válida sobre un contenido que no es un token: None, no una excepción
+    assert auth.verify_token(signed(claims), now=NOW) is None
+
+
+def test_invalid_token_is_401():
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(auth.authenticate(bearer_request("basura.firma")))
+    assert error.value.status_code == 401
+
+
+# --- USUARIOS DESHABILITADOS ---
+def test_disabled_user_token_is_401():
+    auth.user_cache.set(auth.CurrentUser(7, "baja", "tecnico", False))
+    token, _ = auth.issue_token(7)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(auth.authenticate(bearer_request(token)))
+    assert error.value.status_code == 401
+
+    auth.user_cache.set(auth.CurrentUser(7, "baja", "tecnico", True))
+    assert asyncio.run(auth.authenticate(bearer_request(token))).id == 7
+
+
+def test_disabled_user_login_is_403(monkeypatch):
+    row = SimpleNamespace(id=7, username="baja", role="tecnico", is_active=False, password_hash="x")
+    monkeypatch.setattr(auth, "_find_login_user", lambda username: row)
+
+    async def verify(password, password_hash):
+        return True # Contraseña correcta
+    monkeypatch.setattr(auth.hash_pool, "verify", verify)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(auth.login("baja", "clave"))
+    assert error.value.status_code == 403
+
+
+# --- CACHÉ DE USUARIOS ---
+@pytest.fixture
+def users_db():
+    engine = create_engine("sqlite://")
+    models.User.__table__.create(engine)
+    with Session(engine) as session:
+        session.add_all([models.User(id=1, username="ana", role="admin"), models.User(id=2, username="beto", role="tecnico")])
+        session.commit()
+        yield session
+    engine.dispose()
+
+
+def cache_users():
+    for user_id, username in ((1, "ana"), (2, "beto")):
+        auth.user_cache.set(auth.CurrentUser(user_id, username, "admin", True))
+
+
+def test_commit_evicts_changed_user(users_db):
+    cache_users()
+    users_db.get(models.User, 2).is_active = False
+    users_db.flush()
+    assert auth.user_cache.get(2) is not None # Hasta el commit sigue la versión confirmada
+    users_db.commit()
+    assert auth.user_cache.get(2) is None
+    assert auth.user_cache.get(1) is not None
+
+
+def test_rollback_keeps_cache(users_db):
+    cache_users()
+    users_db.get(models.User, 2).role = "admin"
+    users_db.flush()
+    users_db.rollback()
+    users_db.commit() # Un commit posterior no arrastra lo descartado
+    assert auth.user_cache.get(2) is not None
+
+
+def test_bulk_update_clears_cache(users_db):
+    cache_users()
+    users_db.execute(update(models.User).where(models.User.id == 1).values(role="tecnico"))
+    users_db.commit()
+    assert auth.user_cache.get(1) is None and auth.user_cache.get(2) is None
+
+
+# --- POOL DE BCRYPT ---
+def test_full_queue_is_503():
+    pool = auth.HashPool(workers=1, max_pending=2)
+    pool.pending = 2 # Dos logins ya esperando
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(pool.verify("clave", None))
+    assert error.value.status_code == 503
+    assert error.value.headers["Retry-After"] == "1"
+    assert pool.pending == 2
+    assert pool._executor is None # Ni siquiera levanta procesos
+
+
+def test_broken_pool_is_503_and_recreated(monkeypatch):
+    pool = auth.HashPool(workers=1, max_pending=2)
+
+    class Broken:
+        def submit(self, *args):
+            raise BrokenProcessPool("se murió un proceso")
+
+        def shutdown(self, **kwargs):
+            pass
+
+    monkeypatch.setattr(pool, "executor", lambda: Broken())
+    pool._executor, pool._pid = Broken(), auth.os.getpid()
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(pool.verify("clave", None))
+    assert error.value.status_code == 503
+    assert pool.pending == 0
+    assert pool._executor is None # El próximo login arma uno nuevo
@@ -0,0 +1,65 @@
+# backend/tests/test_bulk_import.py
+# bulk_import.py: los servicios sin cliente y los tickets sin servicio se descartan (no quedan
+# huérfanos) y un archivo sin las columnas obligatorias se rechaza antes de importar nada.
+import csv
+import uuid
+
+import pytest
+from sqlalchemy import select
+
+import bulk_import
+import models
+from database import SessionLocal
+
+
+def write_csv(path, header, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return str(path)
+
+
+def test_orphans_are_rejected_and_reported(seeded, tmp_path, capsys):
+    run = uuid.uuid4().hex[:8]
+    clients = write_csv(tmp_path / "clients.csv", ["external_id", "name"], [[f"{run}-c1", "Cliente importado"]])
+    services = write_csv(tmp_path / "services.csv", ["external_id", "client_external_id", "installation_address"], [
+        [f"{run}-s1", f"{run}-c1", "Calle 1"],
+        [f"{run}-s2", f"{run}-no-existe", "Calle 2"],
+        [f"{run}-s3", "", "Calle 3"],
+    ])
+    tickets = write_csv(tmp_path / "tickets.csv", ["external_id", "service_external_id", "title"], [
+        [f"{run}-t1", f"{run}-s1", "Sin señal"],
+        [f"{run}-t2", f"{run}-s2", "Servicio descartado"],
+    ])
+    bulk_import.main(["clients", clients, "services", services, "tickets", tickets])
+    out = capsys.readouterr()
+    assert "2 descartadas (2 sin cliente)" in out.out
+    assert "1 descartadas (1 sin servicio)" in out.out
+    assert f"{run}-s2, {run}-s3" in out.err
+
+    db = SessionLocal()
+    try:
+        service_ids = db.scalars(select(models.ClientService.external_id)
+                                 .where(models.ClientService.external_id.like(f"{run}-%"))).all()
+        ticket = db.execute(select(models.Ticket.external_id, models.Ticket.service_id, models.Ticket.created_at)
+                            .where(models.Ticket.external_id.like(f"{run}-%"))).one()
+    finally:
+        db.close()
+    assert service_ids == [f"{run}-s1"]
+    assert ticket.external_id == f"{run}-t1" and ticket.service_id is not None
+    assert ticket.created_at.tzinfo is not None
+
+
+def test_missing_columns_fail_before_importing(seeded, tmp_path, capsys):
+    run = uuid.uuid4().hex[:8]
+    clients = write_csv(tmp_path / "clients.csv", ["external_id", "name"], [[f"{run}-c1", "No se importa"]])
+    services = write_csv(tmp_path / "services.csv", ["external_id", "installation_address"], [[f"{run}-s1", "Calle 1"]])
+    with pytest.raises(SystemExit):
+        bulk_import.main(["clients", clients, "services", services])
+    assert "faltan las columnas client_external_id" in capsys.readouterr().err
+    db = SessionLocal()
+    try:
+        assert db.scalar(select(models.Client.id).where(models.Client.external_id == f"{run}-c1")) is None
+    finally:
+        db.close()
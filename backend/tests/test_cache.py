@@ -0,0 +1,41 @@
+# backend/tests/test_cache.py
+# La caché del catálogo (cache.py) no depende de que escriba el mismo proceso: un cambio confirmado
+# por otra conexión (otro worker, el CLI, psql) cambia la versión y la próxima lectura no acierte.
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+import main
+
+RENAME_SQL = text("UPDATE plans SET name = :name WHERE id = (SELECT min(id) FROM plans) RETURNING name")
+
+
+def plan_names(client):
+    response = client.get("/plans")
+    assert response.status_code == 200
+    return {plan["name"] for plan in response.json()}
+
+
+def test_write_from_another_connection_misses_the_cache(seeded):
+    client = TestClient(main.app)
+    with seeded.connect() as conn:
+        old = conn.execute(text("SELECT name FROM plans WHERE id = (SELECT min(id) FROM plans)")).scalar()
+        assert old in plan_names(client) # Queda en caché
+        try:
+            conn.execute(RENAME_SQL, {"name": old + " (renombrado)"})
+            conn.commit()
+            assert old + " (renombrado)" in plan_names(client)
+            options = client.get("/services_options").json()
+            assert any(service["plan"]["name"] == old + " (renombrado)" for service in options if service.get("plan"))
+        finally:
+            conn.execute(RENAME_SQL, {"name": old})
+            conn.commit()
+    assert old in plan_names(client)
+
+
+def test_uncommitted_write_keeps_the_cache(seeded):
+    client = TestClient(main.app)
+    with seeded.connect() as conn:
+        before = client.get("/plans").headers["etag"]
+        conn.execute(text("UPDATE plans SET price = price + 1"))
+        assert client.get("/plans").headers["etag"] == before
+        conn.rollback()
@@ -0,0 +1,43 @@
+# backend/tests/test_exports.py
+# XLSX armado a mano (exports.XlsxWriter): la hoja tiene que ser XML válido para Excel aunque vengan
+# NaN o infinitos, y no pasar del máximo de filas de una hoja. No necesitan Postgres.
+import io
+import math
+import zipfile
+from xml.etree import ElementTree
+
+import exports
+
+NS = {"x": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+def sheet_rows(writer, rows):
+    data = writer.header(["ID", "Potencia (dBm)"]) + writer.rows(rows) + writer.close()
+    with zipfile.ZipFile(io.BytesIO(data)) as xlsx:
+        root = ElementTree.fromstring(xlsx.read("xl/worksheets/sheet1.xml"))
+    return [
+        [(cell.get("t"), "".join(cell.itertext())) for cell in row.findall("x:c", NS)]
+        for row in root.findall("x:sheetData/x:row", NS)
+    ]
+
+
+def test_non_finite_floats_are_text():
+    rows = sheet_rows(exports.XlsxWriter(), [(1, -21.5), (2, math.nan), (3, math.inf), (4, -math.inf)])
+    assert rows[1] == [(None, "1"), (None, "-21.5")]
+    assert [row[1] for row in rows[2:]] == [("inlineStr", "nan"), ("inlineStr", "inf"), ("inlineStr", "-inf")]
+
+
+def test_exactly_max_rows_fit(monkeypatch):
+    monkeypatch.setattr(exports, "XLSX_MAX_ROWS", 4)
+    rows = sheet_rows(exports.XlsxWriter(), [(1, 0.0), (2, 0.0), (3, 0.0)])
+    assert [row[0][1] for row in rows] == ["ID", "1", "2", "3"]
+
+
+def test_more_than_max_rows_end_with_marker(monkeypatch):
+    monkeypatch.setattr(exports, "XLSX_MAX_ROWS", 4)
+    writer = exports.XlsxWriter()
+    rows = sheet_rows(writer, [(i, 0.0) for i in range(1, 10)])
+    assert writer.truncated
+    assert len(rows) == 4
+    assert [row[0][1] for row in rows[:3]] == ["ID", "1", "2"]
+    assert rows[3] == [("inlineStr", exports.XLSX_TRUNCATED.format(rows=2))]
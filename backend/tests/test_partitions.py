@@ -0,0 +1,83 @@
+# backend/tests/test_partitions.py
+# Particiones mensuales de tickets y service_sheets (partitions.py): pruning en las consultas por
+# fecha, meses que vienen creados al arrancar, filas sin su mes en la DEFAULT hasta que se crea y
+# lápidas de /sync para lo que se archiva.
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+import partitions
+import ticket_stats
+
+# Un mes sin partición (el dataset de prueba arranca en 2023)
+STRAY_AT = datetime(2015, 6, 15, 12, tzinfo=timezone.utc)
+
+
+def indexes(conn, name):
+    return conn.execute(text("SELECT count(*) FROM pg_indexes WHERE tablename = :name"), {"name": name}).scalar()
+
+
+def test_recent_queries_prune_partitions(seeded):
+    with seeded.connect() as conn:
+        assert partitions.check(conn) == []
+
+
+def test_ensure_on_startup_is_idempotent(seeded):
+    partitions.ensure_on_startup(seeded)
+    assert partitions.ensure_on_startup(seeded) == {}
+    with seeded.connect() as conn:
+        assert partitions.missing_months(conn) == {}
+
+
+def test_stray_rows_wait_in_default_and_move_to_their_month(seeded):
+    with seeded.connect() as conn:
+        try:
+            before = {table: partitions.default_rows(conn, table) for table in partitions.PARTITIONED_TABLES}
+            ticket_id = conn.execute(text(
+                "INSERT INTO tickets (title, status, priority, category, creator_id, created_at) "
+                "VALUES ('Fecha mal cargada', 'open', 'low', 'Admin', 1, :at) RETURNING id"
+            ), {"at": STRAY_AT}).scalar()
+            conn.execute(text(
+                "INSERT INTO service_sheets (ticket_id, author_id, tech_notes, created_at) VALUES (:ticket_id, 1, '', :at)"
+            ), {"ticket_id": ticket_id, "at": STRAY_AT})
+            for table in partitions.PARTITIONED_TABLES:
+                assert partitions.default_rows(conn, table) == before[table] + 1
+
+            for table in partitions.PARTITIONED_TABLES:
+                assert conn.execute(text("SELECT create_monthly_partitions(:table, :at, :at)"),
+                                    {"table": table, "at": STRAY_AT}).scalar() == 1
+                assert partitions.default_rows(conn, table) == before[table]
+                month = f"{table}_y2015m06"
+                assert conn.execute(text(f"SELECT count(*) FROM {month}")).scalar() == 1
+                assert indexes(conn, month) == indexes(conn, partitions.list_partitions(conn, table)[-1][0])
+
+            # Mover las filas no pasa por los triggers: el resumen no las cuenta dos veces
+            assert ticket_stats.check(conn) == []
+        finally:
+            conn.rollback()
+
+
+def test_archive_leaves_sync_tombstones(seeded):
+    now = datetime.now(timezone.utc)
+    older_than = (now.year - STRAY_AT.year - 1) * 12 + now.month - 1 # Corte en enero del año siguiente
+    with seeded.connect() as conn:
+        try:
+            ticket_id = conn.execute(text(
+                "INSERT INTO tickets (title, status, priority, category, creator_id, created_at) "
+                "VALUES ('Cerrado hace años', 'closed', 'low', 'Admin', 1, :at) RETURNING id"
+            ), {"at": STRAY_AT}).scalar()
+            sheet_id = conn.execute(text(
+                "INSERT INTO service_sheets (ticket_id, author_id, tech_notes, created_at) "
+                "VALUES (:ticket_id, 1, '', :at) RETURNING id"
+            ), {"ticket_id": ticket_id, "at": STRAY_AT}).scalar()
+            for table in partitions.PARTITIONED_TABLES:
+                conn.execute(text("SELECT create_monthly_partitions(:table, :at, :at)"), {"table": table, "at": STRAY_AT})
+
+            archived, _ = partitions.archive(conn, older_than)
+            assert archived == ["tickets_y2015m06", "service_sheets_y2015m06"]
+            tombstones = conn.execute(text(
+                "SELECT entity, entity_id FROM sync_changes WHERE op = 'DELETE' AND txid = pg_current_xact_id()::text::bigint"
+            )).all()
+            assert set(tombstones) == {("tickets", ticket_id), ("service_sheets", sheet_id)}
+        finally:
+            conn.rollback()
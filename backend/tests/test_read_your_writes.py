@@ -0,0 +1,56 @@
+# backend/tests/test_read_your_writes.py
+# Con réplicas, cada escritura devuelve X-DB-Position con el LSN de su commit (ver replicas.py),
+# leído en la misma conexión que escribió: sin abrir otra conexión a la primaria.
+from fastapi.testclient import TestClient
+from sqlalchemy import event, text
+
+from conftest import TEST_DATABASE_URL
+from replicas import POSITION_HEADER, ReadRouter, ReadYourWritesMiddleware, parse_lsn, parse_position
+import main
+
+
+
+def current_lsn(engine):
+    with engine.connect() as conn:
+        return parse_lsn(conn.execute(text("SELECT pg_current_wal_lsn()::text")).scalar())
+
+
+def new_ticket(engine):
+    with engine.connect() as conn:
+        service_id = conn.execute(text("SELECT min(id) FROM client_services")).scalar()
+    return {"title": "Corte de fibra", "description": "Prueba de lectura propia", "priority": "low",
+            "service_id": service_id}
+
+
+def checkouts_for_post(engine, app):
+    count = [0]
+
+    def on_checkout(*args):
+        count[0] += 1
+
+    event.listen(engine, "checkout", on_checkout)
+    try:
+        response = TestClient(app).post("/tickets", json=new_ticket(engine))
+    finally:
+        event.remove(engine, "checkout", on_checkout)
+    assert response.status_code == 200
+    return response, count[0]
+
+
+def test_write_returns_its_commit_position(seeded):
+    app = ReadYourWritesMiddleware(main.app, ReadRouter(seeded, [TEST_DATABASE_URL]))
+    before = current_lsn(seeded)
+    response, checkouts = checkouts_for_post(seeded, app)
+    _, lsn = parse_position(response.headers[POSITION_HEADER])
+    assert before < lsn <= current_lsn(seeded)
+
+    _, without_replicas = checkouts_for_post(seeded, main.app)
+    assert checkouts == without_replicas
+
+
+def test_reads_and_failed_writes_get_no_position(seeded):
+    client = TestClient(ReadYourWritesMiddleware(main.app, ReadRouter(seeded, [TEST_DATABASE_URL])))
+    assert POSITION_HEADER.lower() not in client.get("/tickets/stats").headers
+    response = client.post("/tickets", json={"title": "Sin descripción"})
+    assert response.status_code == 422
+    assert POSITION_HEADER.lower() not in response.headers
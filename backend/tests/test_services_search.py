@@ -0,0 +1,29 @@
+# backend/tests/test_services_search.py
+# GET /services/search: cada columna se busca con su índice GIN trgm (ver services_search_select),
+# sin recorrer clients ni client_services. Necesita pg_trgm en el servidor de prueba: si no está,
+# conftest.py migra sin b41d0e6f8a27 y estas pruebas se saltean.
+import pytest
+from sqlalchemy import text
+
+from conftest import plan_nodes
+import main
+
+TRGM_INDEXES = {"ix_clients_name_trgm", "ix_client_services_installation_address_trgm",
+                "ix_client_services_ip_address_trgm", "ix_client_services_mac_address_trgm"}
+
+
+@pytest.fixture(scope="module")
+def trgm(seeded):
+    with seeded.connect() as conn:
+        if not conn.execute(text("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")).scalar():
+            pytest.skip("El servidor de prueba no trae pg_trgm (migrado sin b41d0e6f8a27)")
+    return seeded
+
+
+@pytest.mark.parametrize("q", ["pérez", "Farmacia Gómez", "San Martín 12", "10.0.1", "0A:1B"])
+def test_search_uses_trgm_indexes(trgm, q):
+    with trgm.connect() as conn:
+        nodes = plan_nodes(conn, main.services_search_select(q, 20))
+    assert [n["Relation Name"] for n in nodes if n["Node Type"] == "Seq Scan"
+            and n["Relation Name"] in ("clients", "client_services")] == []
+    assert {n.get("Index Name") for n in nodes} >= TRGM_INDEXES
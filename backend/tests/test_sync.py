@@ -0,0 +1,121 @@
+# backend/tests/test_sync.py
+# Sincronización de la app offline (sync.py): subidas idempotentes por client_ref, conflictos por
+# base_updated_at, el horizonte xmin con una transacción que confirma tarde y el token vencido.
+import time
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import text
+
+import sync
+from database import SessionLocal
+
+TOUCH_SQL = text("UPDATE tickets SET title = title WHERE id = (SELECT min(id) FROM tickets WHERE id > :after) RETURNING id")
+BACKEND_PID_SQL = text("SELECT pg_backend_pid()")
+
+
+def sheet(ticket_id, client_ref, **values):
+    return {
+        "client_ref": client_ref, "id": None, "base_updated_at": None, "ticket_id": ticket_id, "author_id": None,
+        "started_at": None, "ended_at": None, "signal_power": None, "onu_sn": None, "nap_box_data": None,
+        "materials_used": {}, "tech_notes": "", "photos_url": [], **values,
+    }
+
+
+@pytest.fixture
+def db(seeded):
+    # Cada subida confirma como en POST /sync/service_sheets (un reintento llega en otra transacción)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.execute(text("DELETE FROM service_sheets WHERE client_ref LIKE 'test-sync-%'"))
+        session.commit()
+        session.close()
+
+
+def upload(db, *sheets):
+    result = sync.upload_service_sheets(db, list(sheets))
+    db.commit()
+    return result
+
+
+@pytest.fixture
+def ticket_id(db):
+    return db.execute(text("SELECT min(id) FROM tickets")).scalar()
+
+
+def test_retry_with_same_client_ref_is_duplicate(db, ticket_id):
+    first = upload(db, sheet(ticket_id, "test-sync-retry", tech_notes="ONU cambiada"))
+    assert first["results"][0]["status"] == "created"
+    sheet_id = first["results"][0]["id"]
+
+    retry = upload(db, sheet(ticket_id, "test-sync-retry", tech_notes="ONU cambiada"))
+    assert retry["results"][0]["status"] == "duplicate"
+    assert retry["results"][0]["id"] == sheet_id
+    assert retry["ok_count"] == 1
+    assert db.execute(text("SELECT count(*) FROM service_sheets WHERE client_ref = 'test-sync-retry'")).scalar() == 1
+
+    # El mismo client_ref dos veces en un lote: una sola alta
+    batch = upload(db, sheet(ticket_id, "test-sync-batch"), sheet(ticket_id, "test-sync-batch"))
+    assert [item["status"] for item in batch["results"]] == ["created", "duplicate"]
+    assert batch["results"][0]["id"] == batch["results"][1]["id"]
+
+
+def test_stale_base_updated_at_is_conflict(db, ticket_id):
+    created = upload(db, sheet(ticket_id, "test-sync-edit", tech_notes="original"))["results"][0]
+    base = created["sheet"]["updated_at"]
+    edit = {"id": created["id"], "tech_notes": "editada offline"}
+
+    stale = upload(db, sheet(ticket_id, "test-sync-edit", **edit,
+                             base_updated_at=datetime(2020, 1, 1, tzinfo=timezone.utc)))
+    assert stale["conflict_count"] == 1
+    assert stale["results"][0]["sheet"]["tech_notes"] == "original" # La versión del servidor, sin pisar
+
+    fresh = upload(db, sheet(ticket_id, "test-sync-edit", **edit, base_updated_at=base))
+    assert fresh["results"][0]["status"] == "updated"
+    assert fresh["results"][0]["sheet"]["tech_notes"] == "editada offline"
+
+    # Reintento de la misma edición con la base vieja: ya está aplicada, no es conflicto
+    retry = upload(db, sheet(ticket_id, "test-sync-edit", **edit, base_updated_at=base))
+    assert retry["results"][0]["status"] == "duplicate"
+
+
+def changed_tickets(token):
+    with SessionLocal() as session:
+        page = sync.read_changes(session, token, limit=sync.SYNC_PAGE_MAX)
+    return {row["id"] for row in page["tickets"]["upserted"]}, page["next_token"]
+
+
+def test_late_commit_is_not_skipped(seeded):
+    with SessionLocal() as session:
+        token = sync.encode_token(session.execute(sync.HORIZON_SQL).scalar(), 0, time.time())
+    slow, fast = seeded.connect(), seeded.connect()
+    try:
+        # Cada backend sube su propia fila de data_versions (pid módulo 16): con la misma, fast esperaría a slow
+        while fast.execute(BACKEND_PID_SQL).scalar() % 16 == slow.execute(BACKEND_PID_SQL).scalar() % 16:
+            fast.close()
+            fast = seeded.connect()
+        slow_id = slow.execute(TOUCH_SQL, {"after": 0}).scalar() # Empieza primero (txid menor), confirma último
+        fast_id = fast.execute(TOUCH_SQL, {"after": 1000}).scalar()
+        fast.commit()
+
+        # fast ya confirmó, pero slow sigue abierta: no se entrega nada después de su txid
+        seen, token = changed_tickets(token)
+        assert fast_id not in seen and slow_id not in seen
+
+        slow.commit()
+        seen, _ = changed_tickets(token)
+        assert {slow_id, fast_id} <= seen
+    finally:
+        slow.close()
+        fast.close()
+
+
+def test_expired_token_is_gone(seeded):
+    expired = sync.encode_token(0, 0, time.time() - (sync.SYNC_TOMBSTONE_DAYS + 1) * 86400)
+    with SessionLocal() as session, pytest.raises(HTTPException) as error:
+        sync.read_changes(session, expired)
+    assert error.value.status_code == 410
@@ -0,0 +1,53 @@
+# backend/tests/test_telemetry.py
+# Lectura de los lotes del poller (telemetry.parse_body): gzip con tope de tamaño y service_id que
+# no entra en integer. No necesitan Postgres.
+import gzip
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+import telemetry
+
+
+def csv_body(*lines):
+    read_at = datetime.now(timezone.utc).isoformat()
+    rows = [f"{service_id},{read_at},-20.5" for service_id in lines]
+    return ("service_id,read_at,rx_dbm\n" + "\n".join(rows) + "\n").encode()
+
+
+def test_gzip_round_trip_with_several_members():
+    body = csv_body(1, 2)
+    rows, received, errors = telemetry.parse_body(gzip.compress(body[:30]) + gzip.compress(body[30:]), "text/csv", "gzip")
+    assert (received, errors) == (2, [])
+    assert [row[0] for row in rows] == [1, 2]
+
+
+def test_gzip_bomb_is_413(monkeypatch):
+    monkeypatch.setattr(telemetry, "MAX_BYTES", 1024 * 1024)
+    bomb = gzip.compress(b"0" * (64 * 1024 * 1024)) # ~64 KB comprimido
+    with pytest.raises(HTTPException) as error:
+        telemetry.parse_body(bomb, "text/csv", "gzip")
+    assert error.value.status_code == 413
+
+
+def test_plain_body_over_limit_is_413(monkeypatch):
+    monkeypatch.setattr(telemetry, "MAX_BYTES", 100)
+    with pytest.raises(HTTPException) as error:
+        telemetry.parse_body(csv_body(*range(1, 10)), "text/csv")
+    assert error.value.status_code == 413
+
+
+@pytest.mark.parametrize("body", [b"no es gzip", gzip.compress(b"service_id,read_at,rx_dbm\n")[:-6]])
+def test_invalid_gzip_is_400(body):
+    with pytest.raises(HTTPException) as error:
+        telemetry.parse_body(body, "text/csv", "gzip")
+    assert error.value.status_code == 400
+
+
+def test_service_id_out_of_int4_is_line_error():
+    rows, received, errors = telemetry.parse_body(csv_body(7, 2**31, -2**31 - 1, 2**31 - 1), "text/csv")
+    assert received == 4
+    assert [row[0] for row in rows] == [7, 2**31 - 1]
+    assert [error["line"] for error in errors] == [3, 4]
+    assert all("fuera de rango" in error["error"] for error in errors)
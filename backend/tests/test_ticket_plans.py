@@ -0,0 +1,54 @@
+# backend/tests/test_ticket_plans.py
+# Las consultas de GET /tickets (listado, filtros y paginación por cursor) tienen que salir por índice:
+# ningún Seq Scan sobre tickets ni sus particiones (ver la migración 7c2e4b1a9d30).
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import text
+
+from conftest import plan_nodes
+import main
+
+SINCE = datetime(2025, 11, 1, tzinfo=timezone.utc)
+
+FILTERS = {
+    "listado": {},
+    "estado": {"status": "open"},
+    "estado cerrado": {"status": "closed"},
+    "prioridad": {"priority": "critical"},
+    "categoría": {"category": "Ventas"},
+    "técnico": {"assigned_id": 2},
+    "estado y técnico": {"status": "in_progress", "assigned_id": 2},
+    "rango de fechas": {"created_from": SINCE, "created_to": SINCE + timedelta(days=30)},
+    "desde una fecha": {"created_from": SINCE},
+    "estado y fechas": {"status": "resolved", "created_from": SINCE, "created_to": SINCE + timedelta(days=7)},
+}
+
+
+def ticket_filters(cursor=None, **values):
+    # Todos los argumentos explícitos: los defaults de TicketFilters son Query(...) de FastAPI
+    values = {"status": None, "priority": None, "category": None, "assigned_id": None,
+              "created_from": None, "created_to": None, **values}
+    return main.TicketFilters(cursor=cursor, limit=50, **values)
+
+
+def seq_scans(conn, stmt):
+    return [node["Relation Name"] for node in plan_nodes(conn, stmt)
+            if node["Node Type"] == "Seq Scan" and node["Relation Name"].startswith("tickets")]
+
+
+@pytest.fixture(scope="module")
+def cursor(seeded):
+    # Un cursor de la mitad de la tabla: la página siguiente no empieza en la punta del índice
+    with seeded.connect() as conn:
+        middle = conn.execute(text("SELECT percentile_disc(0.5) WITHIN GROUP (ORDER BY id) FROM tickets")).scalar()
+    return main.encode_cursor(middle)
+
+
+@pytest.mark.parametrize("name", FILTERS)
+@pytest.mark.parametrize("with_cursor", [False, True], ids=["primera página", "con cursor"])
+@pytest.mark.parametrize("select", [main.tickets_rows_select, main.tickets_select], ids=["filas", "orm"])
+def test_tickets_list_uses_indexes(seeded, cursor, select, with_cursor, name):
+    stmt = select(ticket_filters(cursor if with_cursor else None, **FILTERS[name]))
+    with seeded.connect() as conn:
+        assert seq_scans(conn, stmt) == []
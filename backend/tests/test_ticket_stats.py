@@ -0,0 +1,114 @@
+# backend/tests/test_ticket_stats.py
+# Las tablas resumen de GET /tickets/stats (ticket_stats.py) y los contadores de incidentes
+# (incidents.py) los mantienen triggers por sentencia: después de cada tanda de altas, cambios,
+# reasignaciones y bajas, por la API o por el ORM, tienen que coincidir con un recálculo completo.
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete, select, text, update
+
+import incidents
+import main
+import models
+import ticket_stats
+from database import SessionLocal
+
+MOVED_AT = datetime(2025, 12, 15, 12, tzinfo=timezone.utc) # Mes con partición en el dataset de prueba
+
+
+def assert_consistent(engine):
+    with engine.connect() as conn:
+        assert ticket_stats.check(conn) == []
+        assert incidents.check(conn) == []
+
+
+@pytest.fixture(scope="module")
+def client(seeded):
+    return TestClient(main.app) # Sin lifespan: no hace falta el hub de /tickets/stream ni el pool de bcrypt
+
+
+@pytest.fixture(scope="module")
+def service_ids(seeded):
+    with seeded.connect() as conn:
+        return conn.execute(text("SELECT id FROM client_services ORDER BY id LIMIT 40")).scalars().all()
+
+
+@pytest.fixture(scope="module")
+def technician_ids(seeded):
+    with seeded.connect() as conn:
+        return conn.execute(text("SELECT id FROM users WHERE role = 'tecnico' ORDER BY id")).scalars().all()
+
+
+def create_batch(client, service_ids, count):
+    # Varios tickets por servicio (arman incidentes) y algunos con un servicio inexistente
+    tickets = [{"title": f"Sin servicio {i}", "description": "Prueba de estadísticas", "priority": "high",
+                "service_id": service_ids[i % len(service_ids)] if i % 25 else 0} for i in range(count)]
+    response = client.post("/tickets/batch", json={"tickets": tickets})
+    assert response.status_code == 200
+    return [item["id"] for item in response.json()["results"] if item["ok"]]
+
+
+def patch_batch(client, ticket_ids, **values):
+    response = client.patch("/tickets/batch", json={"ticket_ids": ticket_ids, **values})
+    assert response.status_code == 200
+    assert response.json()["ok_count"] == len(set(ticket_ids))
+
+
+def test_seeded_data_is_consistent(seeded):
+    assert_consistent(seeded)
+
+
+def test_api_creates(seeded, client, service_ids):
+    response = client.post("/tickets", json={"title": "Latencia alta", "description": "Prueba de estadísticas",
+                                             "priority": "medium", "service_id": service_ids[0]})
+    assert response.status_code == 200
+    assert len(create_batch(client, service_ids, 300)) == 288
+    assert_consistent(seeded)
+
+
+def test_api_status_changes_and_reassignments(seeded, client, service_ids, technician_ids):
+    ids = create_batch(client, service_ids, 200)
+    with seeded.connect() as conn:
+        ids += conn.execute(text("SELECT id FROM tickets WHERE id % 97 = 0 ORDER BY id LIMIT 150")).scalars().all()
+
+    patch_batch(client, ids[:250], status="in_progress", assigned_id=technician_ids[0])
+    patch_batch(client, ids[100:], status="resolved")
+    patch_batch(client, ids[::3], assigned_id=technician_ids[1])
+    patch_batch(client, ids[::5], assigned_id=None) # Desasignar
+    patch_batch(client, ids[50:150] + ids[50:60], status="closed") # Repetidos en el pedido
+    patch_batch(client, ids[::7], status="open") # Reabrir lo resuelto y lo cerrado
+    assert_consistent(seeded)
+
+
+def test_orm_changes_and_deletes(seeded, client, service_ids, technician_ids):
+    ids = create_batch(client, service_ids, 200)
+    db = SessionLocal()
+    try:
+        # Cambios objeto por objeto (flush del ORM): categoría, prioridad, estado y fecha de alta
+        tickets = db.scalars(select(models.Ticket).where(models.Ticket.id.in_(ids[:40]))).all()
+        for i, ticket in enumerate(tickets):
+            ticket.category = ("Soporte Técnico", "Admin", None)[i % 3]
+            ticket.priority = "critical" if i % 2 else "low"
+            ticket.status = ("resolved", "closed", "in_progress", "open")[i % 4]
+            ticket.assigned_id = technician_ids[i % len(technician_ids)]
+        db.commit()
+        for ticket in tickets[::4]:
+            ticket.created_at = MOVED_AT # Pasa a otra partición mensual
+        db.commit()
+
+        # UPDATE masivo y bajas: objeto por objeto y DELETE ... WHERE id IN (...)
+        db.execute(update(models.Ticket).where(models.Ticket.id.in_(ids[40:120]))
+                   .values(status="resolved", assigned_id=technician_ids[-1]))
+        for ticket in tickets[:10]:
+            db.delete(ticket)
+        db.execute(delete(models.Ticket).where(models.Ticket.id.in_(ids[100:160])))
+        db.commit()
+
+        # Lo que se deshace no tiene que dejar rastro en los contadores
+        db.execute(update(models.Ticket).where(models.Ticket.id.in_(ids[160:])).values(status="closed"))
+        db.execute(delete(models.Ticket).where(models.Ticket.id.in_(ids[180:])))
+        db.rollback()
+    finally:
+        db.close()
+    assert_consistent(seeded)
@@ -0,0 +1,39 @@
+# backend/tests/test_tickets_etag.py
+# El ETag de GET /tickets cambia con cada transacción confirmada que toca lo que muestra la bandeja,
+# también con la que empezó antes y confirma después de otra (su now() es más viejo).
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+import main
+
+TOUCH_SQL = text("UPDATE tickets SET title = title WHERE id = (SELECT min(id) FROM tickets WHERE id > :after)")
+
+
+def etag(client):
+    response = client.get("/tickets", params={"limit": 1})
+    assert response.status_code == 200
+    return response.headers["etag"]
+
+
+def test_late_commit_changes_etag(seeded):
+    client = TestClient(main.app)
+    with seeded.connect() as slow, seeded.connect() as fast:
+        slow.execute(TOUCH_SQL, {"after": 0}) # Empieza primero y confirma último
+        fast.execute(TOUCH_SQL, {"after": 1000})
+        fast.commit()
+        before = etag(client)
+        slow.commit()
+    after = etag(client)
+    assert after != before
+    assert client.get("/tickets", params={"limit": 1}, headers={"If-None-Match": after}).status_code == 304
+
+
+def test_service_and_plan_changes_change_etag(seeded):
+    client = TestClient(main.app)
+    with seeded.connect() as conn:
+        for sql in ("UPDATE clients SET phone = phone WHERE id = (SELECT min(id) FROM clients)",
+                    "UPDATE plans SET price = price WHERE id = (SELECT min(id) FROM plans)"):
+            before = etag(client)
+            conn.execute(text(sql))
+            conn.commit()
+            assert etag(client) != before
@@ -1,16 +1,21 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import './App.css'
 
 function App() {
   const [tickets, setTickets] = useState([])
   const [loading, setLoading] = useState(true)
+  const [nextCursor, setNextCursor] = useState(null) // Cursor de la próxima página (null = no hay más)
+  const [loadingMore, setLoadingMore] = useState(false)
+  const [stats, setStats] = useState(null) // KPIs calculados en el backend (/tickets/stats)
+  const statsTimer = useRef(null)
   
   // MODAL DETALLE (VER)
   const [selectedTicket, setSelectedTicket] = useState(null)
   
   // MODAL CREACIÓN (NUEVO)
   const [showCreateModal, setShowCreateModal] = useState(false)
-  const [servicesList, setServicesList] = useState([]) 
+  const [servicesList, setServicesList] = useState([]) // Resultados de la búsqueda (no la lista completa)
+  const [serviceQuery, setServiceQuery] = useState('')
   const [newTicketData, setNewTicketData] = useState({
     title: '',
     description: '',
@@ -20,6 +25,19 @@ function App() {
   
   const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:4000';
 
+  // LEER LO QUE ACABAMOS DE ESCRIBIR: con réplicas, cada alta devuelve X-DB-Position y la reenviamos
+  // en las lecturas; el backend no usa una réplica que todavía no tenga nuestro cambio
+  const dbPosition = useRef(null)
+  const apiFetch = (path, options = {}) => {
+    const headers = { ...options.headers }
+    if (dbPosition.current) headers['X-DB-Position'] = dbPosition.current
+    return fetch(`${API_URL}${path}`, { ...options, headers }).then(res => {
+      const position = res.headers.get('X-DB-Position')
+      if (position) dbPosition.current = position
+      return res
+    })
+  }
+
   // DICCIONARIOS
   const statusMap = { 'open': 'Abierto', 'in_progress': 'En Progreso', 'resolved': 'Resuelto', 'closed': 'Cerrado' }
   const priorityMap = { 'low': 'Baja', 'medium': 'Media', 'high': 'Alta', 'critical': 'Crítica' }
@@ -27,21 +45,86 @@ function App() {
   // CARGA INICIAL
   useEffect(() => {
     fetchTickets()
-    fetchServices()
+    fetchStats()
+  }, [])
+
+  // NOVEDADES EN VIVO: el backend empuja cada alta o cambio (SSE); no recargamos la lista entera.
+  // Si se corta, EventSource reconecta solo y el backend reenvía lo perdido (Last-Event-ID).
+  useEffect(() => {
+    const source = new EventSource(`${API_URL}/tickets/stream`)
+    source.addEventListener('ticket', (e) => {
+      const { type, ticket } = JSON.parse(e.data)
+      setTickets(prev => upsertTicket(prev, ticket, type === 'created'))
+      refreshStatsSoon()
+    })
+    // El backend no pudo ponernos al día: recargamos una vez
+    source.addEventListener('reset', () => {
+      fetchTickets()
+      fetchStats()
+    })
+    return () => source.close()
   }, [])
 
+  // Reemplaza el ticket si ya está en la lista; si es nuevo, lo agrega arriba
+  const upsertTicket = (list, ticket, isNew) => {
+    if (list.some(t => t.id === ticket.id)) return list.map(t => t.id === ticket.id ? ticket : t)
+    return isNew ? [ticket, ...list] : list
+  }
+
+  // Varios cambios seguidos = una sola consulta de KPIs
+  const refreshStatsSoon = () => {
+    clearTimeout(statsTimer.current)
+    statsTimer.current = setTimeout(fetchStats, 2000)
+  }
+
+  // BUSCADOR DE SERVICIOS: esperamos a que el operador deje de tipear antes de consultar
+  useEffect(() => {
+    if (serviceQuery.trim().length < 2) {
+      setServicesList([])
+      return
+    }
+    const timer = setTimeout(() => searchServices(serviceQuery.trim()), 250)
+    return () => clearTimeout(timer)
+  }, [serviceQuery])
+
   const fetchTickets = () => {
-    fetch(`${API_URL}/tickets`)
+    apiFetch('/tickets')
       .then(res => res.json())
       .then(data => {
-        setTickets(data)
+        setTickets(data.items)
+        setNextCursor(data.next_cursor)
         setLoading(false)
       })
       .catch(err => console.error("Error:", err))
   }
 
-  const fetchServices = () => {
-    fetch(`${API_URL}/services_options`)
+  // KPIS: ya no se cuentan sobre la página cargada, vienen resumidos del backend
+  const fetchStats = () => {
+    apiFetch('/tickets/stats')
+      .then(res => res.json())
+      .then(data => setStats(data))
+      .catch(err => console.error("Error:", err))
+  }
+
+  // PAGINACIÓN: pedimos la siguiente página usando el cursor que devolvió el backend
+  const fetchMoreTickets = () => {
+    if (!nextCursor) return
+    setLoadingMore(true)
+    apiFetch(`/tickets?cursor=${encodeURIComponent(nextCursor)}`)
+      .then(res => res.json())
+      .then(data => {
+        setTickets(prev => [...prev, ...data.items])
+        setNextCursor(data.next_cursor)
+        setLoadingMore(false)
+      })
+      .catch(err => {
+        console.error("Error:", err)
+        setLoadingMore(false)
+      })
+  }
+
+  const searchServices = (q) => {
+    apiFetch(`/services/search?q=${encodeURIComponent(q)}`)
       .then(res => res.json())
       .then(data => setServicesList(data))
       .catch(err => console.error("Error services:", err))
@@ -63,16 +146,17 @@ function App() {
         service_id: parseInt(newTicketData.service_id)
     }
 
-    fetch(`${API_URL}/tickets`, {
+    apiFetch('/tickets', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(payload)
     })
     .then(res => res.json())
     .then(savedTicket => {
-        setTickets([savedTicket, ...tickets]) 
+        setTickets(prev => upsertTicket(prev, savedTicket, true)) // El stream también lo trae: sin duplicados
         setShowCreateModal(false)
         setNewTicketData({ title: '', description: '', priority: 'medium', service_id: '' }) 
+        setServiceQuery('')
     })
     .catch(err => alert("Error creando ticket: " + err))
   }
@@ -96,13 +180,13 @@ function App() {
           <div className="col-md-3 mb-3">
             <div className="kpi-card kpi-success">
               <div className="kpi-title">Tickets Pendientes</div>
-              <div className="kpi-value">{tickets.filter(t => t.status === 'open').length}</div>
+              <div className="kpi-value">{stats ? (stats.by_status.open || 0) : '-'}</div>
             </div>
           </div>
           <div className="col-md-3 mb-3">
             <div className="kpi-card kpi-warning">
               <div className="kpi-title">En Atención</div>
-              <div className="kpi-value">{tickets.filter(t => t.status === 'in_progress').length}</div>
+              <div className="kpi-value">{stats ? (stats.by_status.in_progress || 0) : '-'}</div>
             </div>
           </div>
         </div>
@@ -151,6 +235,13 @@ function App() {
                   ))}
                 </tbody>
               </table>
+              {nextCursor && (
+                <div className="p-3 text-center">
+                  <button className="btn btn-secondary btn-sm" onClick={fetchMoreTickets} disabled={loadingMore}>
+                    {loadingMore ? 'Cargando...' : 'Cargar más'}
+                  </button>
+                </div>
+              )}
             </div>
           )}
         </div>
@@ -246,13 +337,20 @@ function App() {
                     
                     <div className="mb-3">
                         <label className="form-label small fw-bold text-muted">CLIENTE / SERVICIO AFECTADO</label>
+                        <input 
+                            type="text" 
+                            className="form-control mb-2"
+                            placeholder="Buscar por nombre, IP, MAC o dirección..."
+                            value={serviceQuery}
+                            onChange={(e) => setServiceQuery(e.target.value)}
+                        />
                         <select 
                             className="form-select" 
                             value={newTicketData.service_id}
                             onChange={(e) => setNewTicketData({...newTicketData, service_id: e.target.value})}
                             required
                         >
-                            <option value="">Seleccione un cliente...</option>
+                            <option value="">{servicesList.length ? 'Seleccione un cliente...' : 'Escriba al menos 2 letras para buscar'}</option>
                             {servicesList.map(svc => (
                                 <option key={svc.id} value={svc.id}>
                                     {svc.client.name} — {svc.installation_address} ({svc.ip_address})